@@ -0,0 +1,30 @@
+from django.contrib.auth.backends import ModelBackend
+from django.db.models import Q
+from .models import User
+
+
+class UsernameOrPhoneBackend(ModelBackend):
+    """
+    تسجيل الدخول باسم المستخدم أو رقم الهاتف باستعلام واحد (كلا الحقلين فريد ومفهرس)
+    وتشغيل دالة التجزئة مرة واحدة فقط في كل محاولة.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+
+        candidates = list(User._default_manager.filter(Q(username=username) | Q(phone_number=username))[:2])
+        # إذا طابق اسم مستخدم لشخص رقم هاتف لشخص آخر، فالأولوية لاسم المستخدم (نفس سلوك LoginView السابق)
+        user = next((u for u in candidates if u.username == username), candidates[0] if candidates else None)
+
+        if user is None:
+            # تشغيل التجزئة مرة لتقليل فرق التوقيت بين مستخدم موجود وغير موجود
+            User().set_password(password)
+            return None
+
+        # check_password يعيد تجزئة كلمة المرور تلقائياً إذا تغيرت الخوارزمية أو معاملاتها
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
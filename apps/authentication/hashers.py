@@ -0,0 +1,27 @@
+"""
+خوارزميات تجزئة كلمات المرور بمعاملات قابلة للضبط من الإعدادات.
+الأولى في PASSWORD_HASHERS تُستخدم للكلمات الجديدة، والباقي للتحقق فقط؛
+وعند تسجيل الدخول بكلمة مجزأة بخوارزمية/معاملات قديمة يتم إعادة تجزئتها تلقائياً.
+"""
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, ScryptPasswordHasher
+
+
+class TunedScryptPasswordHasher(ScryptPasswordHasher):
+    """scrypt بمعاملات من PASSWORD_SCRYPT_PARAMS (work_factor, block_size, parallelism)"""
+
+    def __init__(self):
+        params = getattr(settings, 'PASSWORD_SCRYPT_PARAMS', {})
+        self.work_factor = params.get('work_factor', ScryptPasswordHasher.work_factor)
+        self.block_size = params.get('block_size', ScryptPasswordHasher.block_size)
+        self.parallelism = params.get('parallelism', ScryptPasswordHasher.parallelism)
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """Argon2 (يتطلب الحزمة argon2-cffi) بمعاملات من PASSWORD_ARGON2_PARAMS"""
+
+    def __init__(self):
+        params = getattr(settings, 'PASSWORD_ARGON2_PARAMS', {})
+        self.time_cost = params.get('time_cost', Argon2PasswordHasher.time_cost)
+        self.memory_cost = params.get('memory_cost', Argon2PasswordHasher.memory_cost)
+        self.parallelism = params.get('parallelism', Argon2PasswordHasher.parallelism)
@@ -0,0 +1,20 @@
+from django.db import transaction
+
+from saifi.jobs.tasks import task
+from .models import User, Notification, BroadcastNotification
+
+
+@task(max_attempts=3, timeout=900)
+def fan_out_broadcast(broadcast_id, batch_size=2000):
+    """إنشاء إشعار لكل مستخدم نشط (معاملة واحدة حتى لا تتكرر الإشعارات عند إعادة المحاولة)"""
+    broadcast = BroadcastNotification.objects.filter(id=broadcast_id).first()
+    if broadcast is None:
+        return
+    with transaction.atomic():
+        batch = []
+        for user_id in User.objects.filter(is_active=True).values_list('id', flat=True).iterator(chunk_size=batch_size):
+            batch.append(Notification(user_id=user_id, title=broadcast.title, message=broadcast.message))
+            if len(batch) >= batch_size:
+                Notification.objects.bulk_create(batch)
+                batch = []
+        Notification.objects.bulk_create(batch)
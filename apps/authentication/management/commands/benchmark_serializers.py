@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from apps.authentication.models import User
+from apps.authentication.serializers import UserRegistrationSerializer, UserReadSerializer, wallets_by_user
+from saifi.renderers import ORJSONRenderer
+
+
+class Command(BaseCommand):
+    help = 'قياس تكلفة تمثيل المستخدم لكل عنصر: UserRegistrationSerializer + JSONRenderer مقابل UserReadSerializer + ORJSONRenderer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500, help='عدد المستخدمين المؤقتين')
+        parser.add_argument('--rounds', type=int, default=5)
+
+    def handle(self, *args, **options):
+        count = options['users']
+        rounds = options['rounds']
+
+        # بيانات مؤقتة داخل معاملة يتم التراجع عنها في النهاية
+        with transaction.atomic():
+            User.objects.bulk_create([
+                User(username=f'bench_{i}', phone_number=f'bench_{i}', first_name='مستخدم', last_name=str(i), is_active=True)
+                for i in range(count)
+            ])
+            users = list(User.objects.filter(username__startswith='bench_'))
+
+            def before():
+                data = UserRegistrationSerializer(users, many=True).data
+                return JSONRenderer().render(data)
+
+            def after():
+                data = UserReadSerializer(users, many=True, context={'wallets': wallets_by_user(users)}).data
+                return ORJSONRenderer().render(data)
+
+            results = {}
+            for name, func in (('before', before), ('after', after)):
+                timings = []
+                for _ in range(rounds):
+                    started = time.perf_counter()
+                    func()
+                    timings.append(time.perf_counter() - started)
+                results[name] = min(timings) / count * 1e6
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"users={count} rounds={rounds} (best round)")
+        self.stdout.write(f"before: {results['before']:.1f} µs/object")
+        self.stdout.write(f"after:  {results['after']:.1f} µs/object")
+        self.stdout.write(self.style.SUCCESS(f"speedup: x{results['before'] / results['after']:.1f}"))
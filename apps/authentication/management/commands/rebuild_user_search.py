@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from apps.authentication.search import rebuild
+
+
+class Command(BaseCommand):
+    help = 'إعادة بناء فهرس البحث عن المستخدمين من جدول المستخدمين'
+
+    def handle(self, *args, **options):
+        count = rebuild()
+        self.stdout.write(self.style.SUCCESS(f'تمت فهرسة {count} مستخدم'))
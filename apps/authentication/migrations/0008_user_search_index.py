@@ -0,0 +1,24 @@
+from django.db import migrations
+
+from apps.authentication import search
+
+
+def create_search_index(apps, schema_editor):
+    search.create_index(schema_editor)
+    User = apps.get_model('authentication', 'User')
+    search.index_users(User.objects.all())
+
+
+def drop_search_index(apps, schema_editor):
+    search.drop_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0007_broadcastnotification_delete_announcement'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
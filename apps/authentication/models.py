@@ -1,6 +1,6 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
-from django.db.models.signals import post_save
+from django.db import models, transaction
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 
 class User(AbstractUser):
@@ -82,23 +82,28 @@ class BroadcastNotification(models.Model):
     def __str__(self):
         return self.title
 
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    # يشمل الحفظ من UserUpdateView و AdminPasswordResetView و KYCSubmissionView
+    from saifi.authentication import invalidate_user
+    invalidate_user(instance.pk)
+    # مرة ثانية بعد الاعتماد: طلب متزامن قد يكون خزن البيانات القديمة قبل ظهور التعديل
+    transaction.on_commit(lambda: invalidate_user(instance.pk))
+
+@receiver(post_save, sender=User)
+def index_user_for_search(sender, instance, **kwargs):
+    from .search import index_users
+    index_users([instance])
+
+@receiver(post_delete, sender=User)
+def remove_user_from_search(sender, instance, **kwargs):
+    from .search import remove_user
+    remove_user(instance.pk)
+
 @receiver(post_save, sender=BroadcastNotification)
 def broadcast_notification_created(sender, instance, created, **kwargs):
     if created:
-        users = User.objects.filter(is_active=True)
-        batch_size = 500
-        notifications = []
-        
-        for user in users:
-            notifications.append(Notification(
-                user=user,
-                title=instance.title,
-                message=instance.message
-            ))
-            
-            if len(notifications) >= batch_size:
-                Notification.objects.bulk_create(notifications)
-                notifications = []
-                
-        if notifications:
-            Notification.objects.bulk_create(notifications)
+        # التوزيع على كل المستخدمين في مهمة خلفية بدلاً من داخل الطلب
+        from .jobs import fan_out_broadcast
+        fan_out_broadcast.enqueue(instance.id)
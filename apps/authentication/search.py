@@ -0,0 +1,179 @@
+"""
+فهرس البحث عن المستخدمين (لوحة الإدارة / الدعم الفني).
+
+لكل مستخدم مستند نصي واحد (اسم المستخدم، الأسماء، أرقام الهواتف) بعد توحيد الكتابة العربية،
+محفوظ في جدول ظل يُحدَّث بالإشارات عند حفظ/حذف المستخدم:
+- SQLite: جدول FTS5 افتراضي بمقسم trigram (بحث جزئي مفهرس) وترتيب bm25.
+- PostgreSQL: جدول عادي بفهرس GIN (gin_trgm_ops) وترتيب similarity.
+- غير ذلك: بحث icontains على جدول المستخدمين مباشرة.
+"""
+import re
+
+from django.db import connection
+
+SQLITE_TABLE = 'authentication_user_fts'
+PG_TABLE = 'authentication_user_search'
+
+_TASHKEEL = re.compile('[\u064B-\u0652\u0670\u0640]')
+_ARABIC_MAP = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ة': 'ه',
+    'ى': 'ي', 'ئ': 'ي',
+    'ؤ': 'و',
+    '٠': '0', '١': '1', '٢': '2', '٣': '3', '٤': '4',
+    '٥': '5', '٦': '6', '٧': '7', '٨': '8', '٩': '9',
+})
+
+
+def normalize(text):
+    """توحيد الكتابة: إزالة التشكيل والتطويل، توحيد الألف والتاء المربوطة والياء، الأرقام الهندية، الأحرف الصغيرة"""
+    if not text:
+        return ''
+    text = _TASHKEEL.sub('', str(text))
+    return ' '.join(text.translate(_ARABIC_MAP).lower().split())
+
+
+def user_document(user):
+    parts = [
+        user.username, user.first_name, user.second_name, user.third_name, user.last_name,
+        user.phone_number, user.alternative_phone,
+    ]
+    return normalize(' '.join(p for p in parts if p))
+
+
+def backend():
+    if connection.vendor == 'sqlite':
+        return 'fts5'
+    if connection.vendor == 'postgresql':
+        return 'trigram'
+    return None
+
+
+def create_index(schema_editor):
+    """إنشاء جدول الظل (يُستدعى من الـ migration)"""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_TABLE} USING fts5(document, tokenize='trigram')"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        schema_editor.execute(
+            f'CREATE TABLE IF NOT EXISTS {PG_TABLE} ('
+            f'user_id bigint PRIMARY KEY REFERENCES authentication_user (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, '
+            f'document text NOT NULL)'
+        )
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {PG_TABLE}_trgm ON {PG_TABLE} USING gin (document gin_trgm_ops)'
+        )
+
+
+def drop_index(schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {SQLITE_TABLE}')
+    elif vendor == 'postgresql':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {PG_TABLE}')
+
+
+def index_users(users):
+    """إضافة/تحديث مستندات مجموعة مستخدمين (للإشارات والإدخال الجماعي)"""
+    mode = backend()
+    rows = [(user.id, user_document(user)) for user in users]
+    if mode is None or not rows:
+        return
+    with connection.cursor() as cursor:
+        if mode == 'fts5':
+            # جداول FTS5 لا تدعم ON CONFLICT، فالتحديث حذف ثم إدخال
+            cursor.executemany(f'DELETE FROM {SQLITE_TABLE} WHERE rowid = %s', [(r[0],) for r in rows])
+            cursor.executemany(f'INSERT INTO {SQLITE_TABLE} (rowid, document) VALUES (%s, %s)', rows)
+        else:
+            cursor.executemany(
+                f'INSERT INTO {PG_TABLE} (user_id, document) VALUES (%s, %s) '
+                f'ON CONFLICT (user_id) DO UPDATE SET document = EXCLUDED.document',
+                rows
+            )
+
+
+def remove_user(user_id):
+    mode = backend()
+    if mode is None:
+        return
+    with connection.cursor() as cursor:
+        if mode == 'fts5':
+            cursor.execute(f'DELETE FROM {SQLITE_TABLE} WHERE rowid = %s', [user_id])
+        else:
+            cursor.execute(f'DELETE FROM {PG_TABLE} WHERE user_id = %s', [user_id])
+
+
+def rebuild(batch_size=2000):
+    """إعادة بناء الفهرس بالكامل من جدول المستخدمين"""
+    from .models import User
+
+    mode = backend()
+    if mode is None:
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SQLITE_TABLE if mode == "fts5" else PG_TABLE}')
+    count = 0
+    batch = []
+    for user in User.objects.order_by('id').iterator(chunk_size=batch_size):
+        batch.append(user)
+        if len(batch) >= batch_size:
+            index_users(batch)
+            count += len(batch)
+            batch = []
+    index_users(batch)
+    return count + len(batch)
+
+
+def _like(term):
+    return '%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+def search_user_ids(query, limit=100):
+    """
+    أرقام المستخدمين المطابقين مرتبة حسب الصلة (الأفضل أولاً).
+    كل كلمة في الاستعلام يجب أن تظهر كجزء من المستند (بحث جزئي كما في icontains).
+    """
+    terms = normalize(query).split()
+    if not terms:
+        return []
+    mode = backend()
+
+    if mode == 'fts5':
+        # trigram يحتاج 3 أحرف على الأقل؛ الكلمات الأقصر تُطابق بـ LIKE على جدول الظل
+        long_terms = [t for t in terms if len(t) >= 3]
+        short_terms = [t for t in terms if len(t) < 3]
+        where, params = [], []
+        if long_terms:
+            where.append(f'{SQLITE_TABLE} MATCH %s')
+            params.append(' '.join('"' + t.replace('"', '""') + '"' for t in long_terms))
+        for term in short_terms:
+            where.append("document LIKE %s ESCAPE '\\'")
+            params.append(_like(term))
+        order = 'rank, rowid DESC' if long_terms else 'rowid DESC'
+        sql = f'SELECT rowid FROM {SQLITE_TABLE} WHERE {" AND ".join(where)} ORDER BY {order} LIMIT %s'
+    elif mode == 'trigram':
+        where = ' AND '.join(['document ILIKE %s'] * len(terms))
+        params = [_like(t) for t in terms]
+        sql = (
+            f'SELECT user_id FROM {PG_TABLE} WHERE {where} '
+            f'ORDER BY similarity(document, %s) DESC, user_id DESC LIMIT %s'
+        )
+        params.append(' '.join(terms))
+    else:
+        from django.db.models import Q
+        from .models import User
+        users = User.objects.all()
+        for term in query.split():
+            users = users.filter(
+                Q(username__icontains=term) | Q(first_name__icontains=term) | Q(last_name__icontains=term)
+                | Q(phone_number__icontains=term) | Q(alternative_phone__icontains=term)
+            )
+        return list(users.order_by('-id').values_list('id', flat=True)[:limit])
+
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
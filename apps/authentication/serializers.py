@@ -65,6 +65,70 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         user.save()
         return user
 
+def wallets_by_user(users):
+    """أرصدة المحافظ لمجموعة مستخدمين باستعلام واحد: {user_id: {'YER': 0.0, ...}}"""
+    from apps.wallets.models import Wallet
+
+    data = {u.id: {'YER': 0.0, 'USD': 0.0, 'SAR': 0.0} for u in users}
+    rows = Wallet.objects.filter(user_id__in=data.keys()).values_list('user_id', 'currency', 'balance')
+    for user_id, currency, balance in rows:
+        data[user_id][currency] = float(balance)
+    return data
+
+class UserReadSerializer(serializers.BaseSerializer):
+    """
+    تمثيل المستخدم للقراءة فقط (me/، users/، استجابة التسجيل والتوثيق) بدون آلية ModelSerializer.
+    context:
+      - wallets: ناتج wallets_by_user (محسوب مسبقاً للصفحة كاملة)؛ المستخدم غير الموجود فيه أرصدته أصفار
+      - include_images: إضافة روابط صور الهوية (id_front, id_back, selfie)
+    """
+    FIELDS = (
+        'id', 'username', 'first_name', 'second_name', 'third_name', 'last_name',
+        'phone_number', 'alternative_phone', 'gender', 'is_active', 'is_verified',
+        'id_type', 'id_number', 'issuer', 'nationality', 'place_of_birth',
+        'city', 'district', 'area', 'address',
+    )
+    DATE_FIELDS = ('issue_date', 'expiry_date', 'date_of_birth')
+    IMAGE_FIELDS = ('id_front', 'id_back', 'selfie')
+
+    def to_representation(self, obj):
+        data = {name: getattr(obj, name) for name in self.FIELDS}
+        names = [obj.first_name, obj.second_name, obj.third_name, obj.last_name]
+        data['full_name'] = ' '.join([n for n in names if n])
+        for name in self.DATE_FIELDS:
+            value = getattr(obj, name)
+            # قد تكون نصاً إذا عُينت يدوياً قبل الحفظ (KYCSubmissionView)
+            data[name] = value.isoformat() if hasattr(value, 'isoformat') else value
+
+        wallets = self.context.get('wallets') or {}
+        data['wallets'] = wallets.get(obj.id) or {'YER': 0.0, 'USD': 0.0, 'SAR': 0.0}
+
+        if self.context.get('include_images'):
+            request = self.context.get('request')
+            for name in self.IMAGE_FIELDS:
+                image = getattr(obj, name)
+                if not image:
+                    data[name] = None
+                else:
+                    data[name] = request.build_absolute_uri(image.url) if request else image.url
+        return data
+
+class LoginUserSerializer(serializers.ModelSerializer):
+    """بيانات المستخدم المختصرة في استجابة تسجيل الدخول (بدون استعلام المحافظ والصور)"""
+    full_name = serializers.SerializerMethodField()
+
+    class Meta:
+        model = User
+        fields = [
+            'id', 'username', 'first_name', 'second_name', 'third_name', 'last_name',
+            'full_name', 'phone_number', 'gender', 'is_active', 'is_verified',
+        ]
+        read_only_fields = fields
+
+    def get_full_name(self, obj):
+        names = [obj.first_name, obj.second_name, obj.third_name, obj.last_name]
+        return ' '.join([n for n in names if n])
+
 class BroadcastNotificationSerializer(serializers.ModelSerializer):
     class Meta:
         model = BroadcastNotification
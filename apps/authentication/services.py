@@ -0,0 +1,18 @@
+from django.db import transaction
+
+from .models import User
+from .search import index_users
+
+
+def bulk_create_users(users):
+    """
+    إدخال مجموعة مستخدمين بـ bulk_create ثم تنفيذ ما تقوم به إشارات post_save يدوياً
+    (bulk_create لا يطلقها): فهرسة البحث. المحافظ لا تُنشأ هنا (تُنشأ عند أول إيداع).
+    """
+    with transaction.atomic():
+        created = User.objects.bulk_create(users)
+        if created and created[0].pk is None:
+            # قواعد بيانات لا تعيد المعرفات بعد الإدخال الجماعي
+            created = list(User.objects.filter(username__in=[u.username for u in users]))
+        index_users(created)
+    return created
@@ -1,3 +1,220 @@
-from django.test import TestCase
+from django.contrib.auth.hashers import make_password
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from .models import User
 
-# Create your tests here.
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        from saifi.authentication import clear_local_cache
+        clear_local_cache()
+        self.user = User.objects.create_user(
+            username='alice', password='pass', phone_number='777000100', first_name='Alice', is_active=True
+        )
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+
+    def test_authenticated_requests_skip_users_table(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with override_settings(AUTH_USER_CACHE_ALIAS=None):
+            self.assertEqual(self.client.get(reverse('user-detail')).status_code, status.HTTP_200_OK)
+            # الاستعلام الوحيد هو محافظ المستخدم داخل الـ serializer
+            with self.assertNumQueries(1):
+                self.client.get(reverse('user-detail'))
+
+        # مع الكاش المشترك: قراءة النسخة فقط، دون جدول المستخدمين
+        self.client.get(reverse('user-detail'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('user-detail'))
+        self.assertEqual(response.data['first_name'], 'Alice')
+        self.assertFalse([q for q in queries if 'authentication_user' in q['sql']])
+
+    def test_saving_user_invalidates_cache(self):
+        self.client.get(reverse('user-detail'))
+
+        APIClient().patch(reverse('user-update', args=[self.user.id]), {'first_name': 'Alya'}, format='json')
+        self.assertEqual(self.client.get(reverse('user-detail')).data['first_name'], 'Alya')
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(reverse('user-detail')).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_other_workers_invalidation_is_seen_immediately(self):
+        from saifi import authentication
+        self.client.get(reverse('user-detail'))
+        # عامل آخر عطل الحساب: التعديل بدون إشارة post_save هنا، ونسخته في الكاش المشترك زادت
+        User.objects.filter(id=self.user.id).update(is_active=False)
+        authentication._bump(str(self.user.id))
+
+        self.assertEqual(self.client.get(reverse('user-detail')).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_changes_from_other_workers_show_after_ttl(self):
+        # بدون كاش مشترك يبقى الحد هو المدة
+        with override_settings(AUTH_USER_CACHE_TTL=0, AUTH_USER_CACHE_ALIAS=None):
+            self.client.get(reverse('user-detail'))
+            # تعديل بدون إشارة post_save، كما يحدث في عامل آخر
+            User.objects.filter(id=self.user.id).update(first_name='Alya')
+            self.assertEqual(self.client.get(reverse('user-detail')).data['first_name'], 'Alya')
+
+
+class LoginTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='bob', password='secret', phone_number='777000200', is_active=True)
+        self.client = APIClient()
+
+    def test_login_by_phone_runs_single_lookup(self):
+        # استعلام المستخدم فقط: لا استعلام ثان بالهاتف ولا استعلام للمحافظ
+        with self.assertNumQueries(1):
+            response = self.client.post(reverse('login'), {'username': '777000200', 'password': 'secret'}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['user']['username'], 'bob')
+        self.assertIn('access', response.data)
+
+    def test_wrong_password_is_rejected(self):
+        response = self.client.post(reverse('login'), {'username': 'bob', 'password': 'nope'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_legacy_hash_is_upgraded_on_login(self):
+        User.objects.filter(id=self.user.id).update(password=make_password('secret', hasher='pbkdf2_sha256'))
+
+        response = self.client.post(reverse('login'), {'username': 'bob', 'password': 'secret'}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(User.objects.get(id=self.user.id).password.startswith('scrypt$'))
+
+
+class UserReadSerializerTests(TestCase):
+    def setUp(self):
+        from apps.wallets.models import Wallet
+        for i in range(3):
+            user = User.objects.create_user(username=f'user{i}', password='pass', phone_number=f'77700030{i}')
+            Wallet.objects.create(user=user, currency='USD', balance=i * 10)
+
+    def test_user_list_uses_constant_queries(self):
+        # المستخدمون + المحافظ، مهما كان عدد المستخدمين
+        with self.assertNumQueries(2):
+            response = APIClient().get(reverse('user-list'))
+
+        self.assertEqual(len(response.data), 3)
+        by_name = {u['username']: u for u in response.data}
+        self.assertEqual(by_name['user2']['wallets'], {'YER': 0.0, 'USD': 20.0, 'SAR': 0.0})
+        self.assertNotIn('selfie', by_name['user2'])
+
+        with_images = APIClient().get(reverse('user-list'), {'include_images': '1'})
+        self.assertIsNone(with_images.data[0]['selfie'])
+
+    def test_orjson_renderer_matches_drf_types(self):
+        import datetime
+        from decimal import Decimal
+        from saifi.renderers import ORJSONRenderer
+        data = {'amount': Decimal('1.50'), 'at': datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc), 'name': 'صرافة'}
+
+        self.assertEqual(
+            ORJSONRenderer().render(data).decode(),
+            '{"amount":1.5,"at":"2024-01-01T00:00:00Z","name":"صرافة"}'
+        )
+
+    def test_orjson_renderer_datetimes_match_json_renderer(self):
+        import datetime
+        import zoneinfo
+        from rest_framework.renderers import JSONRenderer
+        from saifi.renderers import ORJSONRenderer
+        aden = zoneinfo.ZoneInfo('Asia/Aden')
+        data = {
+            'utc': datetime.datetime(2024, 1, 1, 8, 30, 15, 123456, tzinfo=datetime.timezone.utc),
+            'local': datetime.datetime(2024, 1, 1, 11, 30, 15, 500, tzinfo=aden),
+            'day': datetime.date(2024, 1, 1),
+            'time': datetime.time(9, 5, 1, 250000),
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_orjson_renderer_falls_back_where_output_would_differ(self):
+        from decimal import Decimal
+        from rest_framework.renderers import JSONRenderer
+        from saifi.renderers import ORJSONRenderer
+        data = {'a': [1, None], 'text': 'سطر\u2028فاصل', 'big': 2 ** 70}
+        for media_type, context in [(None, None), ('application/json; indent=4', None), (None, {'indent': 2})]:
+            self.assertEqual(
+                ORJSONRenderer().render(data, media_type, context), JSONRenderer().render(data, media_type, context)
+            )
+        for value in (float('nan'), float('inf'), Decimal('NaN')):
+            with self.assertRaises(ValueError):
+                ORJSONRenderer().render({'amount': value})
+
+
+class UserSearchTests(TestCase):
+    def setUp(self):
+        self.ahmed = User.objects.create_user(username='u1', password='p', phone_number='777123456', first_name='أحمد', last_name='علي')
+        self.fatima = User.objects.create_user(username='u2', password='p', phone_number='733999888', first_name='فاطمة', last_name='حسن')
+        self.other = User.objects.create_user(username='u3', password='p', phone_number='711000000', first_name='خالد', last_name='احمدي')
+
+    def search(self, query, **params):
+        return APIClient().get(reverse('user-list'), {'search': query, **params}).data
+
+    def test_arabic_normalization_and_phone_substring(self):
+        self.assertEqual({u['id'] for u in self.search('احمد')}, {self.ahmed.id, self.other.id})
+        self.assertEqual([u['id'] for u in self.search('فاطمه')], [self.fatima.id])
+        self.assertEqual([u['id'] for u in self.search('123456')], [self.ahmed.id])
+        self.assertEqual([u['id'] for u in self.search('احمد علي')], [self.ahmed.id])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.fatima.first_name = 'مريم'
+        self.fatima.save()
+        self.assertEqual(self.search('فاطمة'), [])
+        self.assertEqual([u['id'] for u in self.search('مريم')], [self.fatima.id])
+
+        self.fatima.delete()
+        self.assertEqual(self.search('مريم'), [])
+
+    def test_search_results_are_paginated(self):
+        page = self.search('احمد', limit=1)
+        self.assertEqual(page['count'], 2)
+        self.assertEqual(len(page['results']), 1)
+
+
+class BulkProvisioningTests(TestCase):
+    def test_registration_creates_no_wallets(self):
+        from apps.wallets.models import Wallet
+        user = User.objects.create_user(username='new', password='p', phone_number='777000400')
+        self.assertFalse(Wallet.objects.filter(user=user).exists())
+
+    def test_import_command_creates_users_and_search_entries(self):
+        import os
+        import tempfile
+        from django.core.management import call_command
+        from apps.wallets.models import Wallet
+        from .search import search_user_ids
+        User.objects.create_user(username='taken', password='p', phone_number='777000500')
+
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, encoding='utf-8') as f:
+            f.write('phone_number,first_name,password\n')
+            for i in range(1, 6):
+                f.write(f'77700050{i},مستورد{i},\n')
+            f.write('777000500,مكرر,\n')
+        self.addCleanup(os.remove, f.name)
+
+        call_command('import_users', f.name, '--batch-size', '2', stdout=open(os.devnull, 'w'))
+
+        imported = User.objects.filter(first_name__startswith='مستورد')
+        self.assertEqual(imported.count(), 5)
+        self.assertFalse(Wallet.objects.filter(user__in=imported).exists())
+        self.assertEqual(len(search_user_ids('مستورد')), 5)
+        self.assertFalse(imported.first().has_usable_password())
+
+
+class BroadcastJobTests(TestCase):
+    def test_broadcast_is_fanned_out_by_worker(self):
+        from saifi.jobs.worker import run_pending
+        from .models import BroadcastNotification, Notification
+        for i in range(3):
+            User.objects.create_user(username=f'u{i}', password='p', phone_number=f'77700060{i}', is_active=True)
+        BroadcastNotification.objects.create(title='تنبيه', message='صيانة')
+
+        self.assertFalse(Notification.objects.exists())
+        self.assertEqual(run_pending(), (1, 0))
+        self.assertEqual(Notification.objects.filter(title='تنبيه').count(), 3)
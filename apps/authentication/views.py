@@ -1,11 +1,18 @@
-from rest_framework import status, generics, views, parsers, serializers
+from rest_framework import status, generics, views, parsers, serializers, pagination
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from rest_framework_simplejwt.tokens import RefreshToken
+from django.conf import settings
 from django.contrib.auth import authenticate
-from .serializers import UserRegistrationSerializer, BroadcastNotificationSerializer
+from .serializers import (
+    UserRegistrationSerializer, UserReadSerializer, LoginUserSerializer, BroadcastNotificationSerializer, wallets_by_user
+)
 from .models import User, Notification, BroadcastNotification
-from rest_framework import filters
+from .search import search_user_ids
+from apps.wallets.conditional import ConditionalGetMixin
+
+def include_images(request):
+    return request.query_params.get('include_images') in ('1', 'true')
 
 class LoginView(views.APIView):
     permission_classes = [AllowAny]
@@ -17,23 +24,16 @@ class LoginView(views.APIView):
         if not username or not password:
             return Response({'error': 'يجب إدخال اسم المستخدم وكلمة المرور'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Try to authenticate
-        user = authenticate(username=username, password=password)
-        
-        if user is None:
-            # Try with phone number
-            try:
-                user_obj = User.objects.get(phone_number=username)
-                user = authenticate(username=user_obj.username, password=password)
-            except User.DoesNotExist:
-                pass
+        # اسم المستخدم أو رقم الهاتف (UsernameOrPhoneBackend: استعلام واحد وتجزئة واحدة)
+        user = authenticate(request, username=username, password=password)
         
         if user is not None:
             refresh = RefreshToken.for_user(user)
+            # المحافظ وباقي البيانات متاحة عبر me/ و wallets/balance/
             return Response({
                 'access': str(refresh.access_token),
                 'refresh': str(refresh),
-                'user': UserRegistrationSerializer(user).data
+                'user': LoginUserSerializer(user).data
             })
         
         return Response({'error': 'اسم المستخدم أو كلمة المرور غير صحيحة'}, status=status.HTTP_401_UNAUTHORIZED)
@@ -57,7 +57,8 @@ class RegisterView(generics.CreateAPIView):
         return Response(
             {
                 "message": "تم إنشاء الحساب بنجاح.",
-                "user": serializer.data,
+                # حساب جديد: المحافظ كلها بصفر، فلا داعي لاستعلامها
+                "user": UserReadSerializer(user, context={'request': request}).data,
                 "tokens": {
                     "refresh": str(refresh),
                     "access": str(refresh.access_token),
@@ -68,16 +69,40 @@ class RegisterView(generics.CreateAPIView):
         )
 
 class UserListView(generics.ListAPIView):
+    """
+    قائمة المستخدمين. ?search= يستخدم فهرس البحث (search.py) والنتائج مرتبة حسب الصلة.
+    التقسيم إلى صفحات عند تمرير ?limit= و ?offset=
+    """
     queryset = User.objects.all()
-    serializer_class = UserRegistrationSerializer
+    serializer_class = UserReadSerializer
     permission_classes = [AllowAny]
-    filter_backends = [filters.SearchFilter]
-    search_fields = ['username', 'first_name', 'last_name', 'phone_number', 'alternative_phone']
+    pagination_class = pagination.LimitOffsetPagination
     
     def get_queryset(self):
         # يمكن إضافة فلاتر هنا لاحقاً
         return User.objects.all().order_by('-date_joined')
 
+    def search(self, query):
+        ids = search_user_ids(query, limit=getattr(settings, 'USER_SEARCH_MAX_RESULTS', 200))
+        users = User.objects.in_bulk(ids)
+        return [users[i] for i in ids if i in users]
+
+    def list(self, request, *args, **kwargs):
+        query = request.query_params.get('search', '').strip()
+        queryset = self.search(query) if query else self.get_queryset()
+        page = self.paginate_queryset(queryset)
+        users = list(page if page is not None else queryset)
+
+        # أرصدة الصفحة كاملة باستعلام واحد بدلاً من استعلام لكل مستخدم
+        serializer = UserReadSerializer(users, many=True, context={
+            'request': request,
+            'wallets': wallets_by_user(users),
+            'include_images': include_images(request),
+        })
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
 class UserUpdateView(generics.UpdateAPIView):
     queryset = User.objects.all()
     serializer_class = UserRegistrationSerializer
@@ -100,12 +125,20 @@ class UserDeleteView(generics.DestroyAPIView):
     permission_classes = [AllowAny] # In production this should be IsAdminUser
 
 class UserDetailView(generics.RetrieveAPIView):
-    serializer_class = UserRegistrationSerializer
+    serializer_class = UserReadSerializer
     permission_classes = [IsAuthenticated]
 
     def get_object(self):
         return self.request.user
 
+    def retrieve(self, request, *args, **kwargs):
+        user = self.get_object()
+        return Response(UserReadSerializer(user, context={
+            'request': request,
+            'wallets': wallets_by_user([user]),
+            'include_images': include_images(request),
+        }).data)
+
 class KYCSubmissionView(views.APIView):
     permission_classes = [IsAuthenticated]
     parser_classes = [parsers.MultiPartParser, parsers.FormParser]
@@ -146,7 +179,9 @@ class KYCSubmissionView(views.APIView):
             if 'selfie' in request.FILES: user.selfie = request.FILES['selfie']
             
             user.save()
-            return Response({"message": "تم رفع بيانات التوثيق بنجاح", "user": UserRegistrationSerializer(user).data}, status=status.HTTP_200_OK)
+            return Response({"message": "تم رفع بيانات التوثيق بنجاح", "user": UserReadSerializer(user, context={
+                'wallets': wallets_by_user([user]), 'include_images': True
+            }).data}, status=status.HTTP_200_OK)
             
         except Exception as e:
             print("KYC Update Error:", str(e))
@@ -192,9 +227,15 @@ class BroadcastNotificationCreateView(generics.CreateAPIView):
     serializer_class = BroadcastNotificationSerializer
     permission_classes = [AllowAny] # In production this should be restricted
 
-class PublicBroadcastNotificationView(views.APIView):
+class PublicBroadcastNotificationView(ConditionalGetMixin, views.APIView):
     permission_classes = [AllowAny]
 
+    def get_version(self, request):
+        latest = BroadcastNotification.objects.order_by('-created_at').values('id', 'created_at').first()
+        if latest is None:
+            return 'none', None
+        return latest['id'], latest['created_at']
+
     def get(self, request):
         latest = BroadcastNotification.objects.order_by('-created_at').first()
         if latest:
@@ -1,9 +1,20 @@
 from django.contrib import admin
-from .models import CompanyTreasury, CompanyTransaction
+from .models import CompanyTreasury, CompanyTransaction, DailyTreasurySummary, TreasuryShard
+
+class TreasuryShardInline(admin.TabularInline):
+    model = TreasuryShard
+    extra = 0
+    readonly_fields = ('index', 'balance', 'updated_at')
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
 
 @admin.register(CompanyTreasury)
 class CompanyTreasuryAdmin(admin.ModelAdmin):
-    list_display = ('name', 'type', 'currency', 'balance')
+    list_display = ('name', 'type', 'currency', 'balance', 'shard_count')
+    readonly_fields = ('shard_count',)
+    inlines = [TreasuryShardInline]
     list_filter = ('type', 'currency')
     search_fields = ('name',)
 
@@ -13,3 +24,9 @@ class CompanyTransactionAdmin(admin.ModelAdmin):
     list_filter = ('treasury', 'created_at')
     search_fields = ('description',)
     date_hierarchy = 'created_at'
+
+@admin.register(DailyTreasurySummary)
+class DailyTreasurySummaryAdmin(admin.ModelAdmin):
+    list_display = ('treasury', 'currency', 'day', 'direction', 'count', 'total')
+    list_filter = ('currency', 'direction')
+    date_hierarchy = 'day'
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from apps.financials.models import CompanyTreasury
+from apps.financials.sharding import rebalance, set_shard_count
+
+
+class Command(BaseCommand):
+    help = 'إعادة توزيع أرصدة الخزائن المقسمة بالتساوي على أجزائها (يُشغل دورياً)، أو تغيير عدد الأجزاء لخزينة'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--treasury', type=int, help='رقم الخزينة (الافتراضي: كل الخزائن المقسمة)')
+        parser.add_argument('--shards', type=int, help='تعيين عدد الأجزاء للخزينة المحددة (1 لإلغاء التقسيم)')
+
+    def handle(self, *args, **options):
+        treasury_id = options['treasury']
+        if options['shards'] is not None:
+            if not treasury_id:
+                raise CommandError('يجب تحديد --treasury مع --shards')
+            try:
+                set_shard_count(treasury_id, options['shards'])
+            except CompanyTreasury.DoesNotExist:
+                raise CommandError('الخزينة غير موجودة')
+            except ValueError as e:
+                raise CommandError(str(e))
+            self.stdout.write(self.style.SUCCESS(f"الخزينة {treasury_id}: {options['shards']} جزء"))
+            return
+
+        treasuries = CompanyTreasury.objects.filter(shard_count__gt=1)
+        if treasury_id:
+            treasuries = treasuries.filter(id=treasury_id)
+        count = 0
+        for tid in treasuries.values_list('id', flat=True):
+            total = rebalance(tid)
+            self.stdout.write(f'الخزينة {tid}: {total}')
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f'تمت إعادة توزيع {count} خزينة'))
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:54
+
+from django.db import migrations
+
+from apps.wallets.partitioning import convert_to_partitioned
+
+
+def partition_company_transactions(apps, schema_editor):
+    # PostgreSQL فقط؛ لا شيء على SQLite
+    convert_to_partitioned(schema_editor, 'financials_companytransaction')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('financials', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_company_transactions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('financials', '0002_partition_companytransaction'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyTreasurySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(choices=[('YER', 'رال يمني'), ('USD', 'دولار أمريكي'), ('SAR', 'ريال سعودي')], max_length=3, verbose_name='العملة')),
+                ('day', models.DateField(verbose_name='اليوم')),
+                ('direction', models.CharField(choices=[('IN', 'وارد'), ('OUT', 'صادر')], max_length=3, verbose_name='الاتجاه')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='عدد الحركات')),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=20, verbose_name='المجموع')),
+                ('treasury', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_summaries', to='financials.companytreasury', verbose_name='الخزينة/الحساب')),
+            ],
+            options={
+                'verbose_name': 'ملخص يومي للخزينة',
+                'verbose_name_plural': 'الملخصات اليومية للخزائن',
+                'indexes': [models.Index(fields=['day', 'currency'], name='financials__day_cf5c0e_idx')],
+                'unique_together': {('treasury', 'day', 'direction')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('financials', '0003_dailytreasurysummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='companytreasury',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='آخر تحديث'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('financials', '0004_companytreasury_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='companytreasury',
+            name='shard_count',
+            field=models.PositiveSmallIntegerField(default=1, verbose_name='عدد الأرصدة الفرعية'),
+        ),
+        migrations.CreateModel(
+            name='TreasuryShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveSmallIntegerField(verbose_name='الرقم')),
+                ('balance', models.DecimalField(decimal_places=2, default=0, max_digits=20, verbose_name='الرصيد')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='آخر تحديث')),
+                ('treasury', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shards', to='financials.companytreasury', verbose_name='الخزينة/الحساب')),
+            ],
+            options={
+                'verbose_name': 'رصيد فرعي للخزينة',
+                'verbose_name_plural': 'الأرصدة الفرعية للخزائن',
+                'unique_together': {('treasury', 'index')},
+            },
+        ),
+    ]
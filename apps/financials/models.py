@@ -1,4 +1,23 @@
+from decimal import Decimal
+
 from django.db import models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+class CompanyTreasuryQuerySet(models.QuerySet):
+    def with_live_balance(self):
+        """إضافة live_balance = الرصيد + مجموع الأرصدة الفرعية (للخزائن المقسمة)"""
+        shards = (
+            TreasuryShard.objects.filter(treasury=OuterRef('pk'))
+            .values('treasury')
+            .annotate(total=Sum('balance'))
+            .values('total')
+        )
+        return self.annotate(
+            live_balance=F('balance') + Coalesce(Subquery(shards), Value(Decimal('0')), output_field=models.DecimalField())
+        )
+
 
 class CompanyTreasury(models.Model):
     CURRENCY_CHOICES = [
@@ -16,6 +35,11 @@ class CompanyTreasury(models.Model):
     type = models.CharField(max_length=10, choices=TYPE_CHOICES, verbose_name="النوع")
     currency = models.CharField(max_length=3, choices=CURRENCY_CHOICES, verbose_name="العملة")
     balance = models.DecimalField(max_digits=20, decimal_places=2, default=0.00, verbose_name="الرصيد الحالي")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="آخر تحديث")
+    # أكثر من 1: الرصيد موزع على صفوف TreasuryShard حتى لا تتسلسل عمليات الصرف على صف الخزينة
+    shard_count = models.PositiveSmallIntegerField(default=1, verbose_name="عدد الأرصدة الفرعية")
+
+    objects = CompanyTreasuryQuerySet.as_manager()
     
     class Meta:
         verbose_name = "خزينة/حساب بنكي"
@@ -24,6 +48,32 @@ class CompanyTreasury(models.Model):
     def __str__(self):
         return f"{self.name} ({self.currency})"
 
+    @property
+    def is_sharded(self):
+        return self.shard_count > 1
+
+    def total_balance(self):
+        """الرصيد الفعلي: balance للخزينة العادية، ومجموع الأرصدة الفرعية للخزينة المقسمة"""
+        if not self.is_sharded:
+            return self.balance
+        return self.balance + (self.shards.aggregate(total=Sum('balance'))['total'] or Decimal('0'))
+
+
+class TreasuryShard(models.Model):
+    """رصيد فرعي لخزينة مقسمة. القيود الدائنة تذهب لجزء عشوائي والمدينة لجزء يكفي رصيده"""
+    treasury = models.ForeignKey(CompanyTreasury, on_delete=models.CASCADE, related_name='shards', verbose_name="الخزينة/الحساب")
+    index = models.PositiveSmallIntegerField(verbose_name="الرقم")
+    balance = models.DecimalField(max_digits=20, decimal_places=2, default=0, verbose_name="الرصيد")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="آخر تحديث")
+
+    class Meta:
+        unique_together = ['treasury', 'index']
+        verbose_name = "رصيد فرعي للخزينة"
+        verbose_name_plural = "الأرصدة الفرعية للخزائن"
+
+    def __str__(self):
+        return f"{self.treasury_id}#{self.index}: {self.balance}"
+
 class CompanyTransaction(models.Model):
     treasury = models.ForeignKey(CompanyTreasury, on_delete=models.CASCADE, related_name='transactions', verbose_name="الخزينة/الحساب")
     amount = models.DecimalField(max_digits=20, decimal_places=2, verbose_name="المبلغ")
@@ -37,3 +87,28 @@ class CompanyTransaction(models.Model):
 
     def __str__(self):
         return f"{self.description} - {self.amount}"
+
+class DailyTreasurySummary(models.Model):
+    """ملخص يومي مُجمّع لحركات الخزينة (وارد/صادر) يُحدث تزايدياً مع كل حركة"""
+    DIRECTION_CHOICES = [
+        ('IN', 'وارد'),
+        ('OUT', 'صادر'),
+    ]
+
+    treasury = models.ForeignKey(CompanyTreasury, on_delete=models.CASCADE, related_name='daily_summaries', verbose_name="الخزينة/الحساب")
+    currency = models.CharField(max_length=3, choices=CompanyTreasury.CURRENCY_CHOICES, verbose_name="العملة")
+    day = models.DateField(verbose_name="اليوم")
+    direction = models.CharField(max_length=3, choices=DIRECTION_CHOICES, verbose_name="الاتجاه")
+    count = models.PositiveIntegerField(default=0, verbose_name="عدد الحركات")
+    total = models.DecimalField(max_digits=20, decimal_places=2, default=0, verbose_name="المجموع")
+
+    class Meta:
+        unique_together = ['treasury', 'day', 'direction']
+        indexes = [
+            models.Index(fields=['day', 'currency']),
+        ]
+        verbose_name = "ملخص يومي للخزينة"
+        verbose_name_plural = "الملخصات اليومية للخزائن"
+
+    def __str__(self):
+        return f"{self.treasury_id} {self.day} {self.direction}: {self.count} / {self.total}"
@@ -0,0 +1,128 @@
+"""
+تقسيم رصيد الخزينة على عدة صفوف (TreasuryShard) لتخفيف التنافس على صف واحد.
+
+كل تحويل من الخزينة (TransferToWalletView) أو إليها (AddCapitalView) يقفل صف CompanyTreasury نفسه،
+فتتسلسل عمليات الصرف المتزامنة. في الوضع المقسم (shard_count > 1):
+- القيد الدائن يُضاف إلى جزء عشوائي.
+- القيد المدين يُخصم من جزء غير مقفول رصيده يكفي (SKIP LOCKED)، وإن لم يوجد جزء يكفي وحده
+  تُقفل كل الأجزاء بترتيب ثابت ويُوزع الخصم عليها.
+- الرصيد الكلي = balance (صفر عادة) + مجموع الأجزاء (CompanyTreasury.objects.with_live_balance).
+- rebalance يعيد توزيع الرصيد بالتساوي (أمر rebalance_treasury_shards الدوري)،
+  حتى يبقى لكل جزء رصيد يكفي لمعظم عمليات الصرف.
+
+القيود في الدفتر تبقى على حساب الخزينة نفسه (TREASURY/id)، فالتقسيم لا يغير إعادة البناء أو المطابقة.
+"""
+import random
+from decimal import Decimal, ROUND_DOWN
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import CompanyTreasury, TreasuryShard
+
+CENT = Decimal('0.01')
+PICK_ATTEMPTS = 3
+
+
+def post_to_shards(treasury_id, shard_count, delta, now, allow_overdraft=False):
+    """تطبيق صافي القيد على خزينة مقسمة (يُستدعى من post_journal داخل معاملته)"""
+    from apps.wallets.ledger import InsufficientFunds, LedgerError
+
+    shards = TreasuryShard.objects.filter(treasury_id=treasury_id)
+    values = {'balance': F('balance') + delta, 'updated_at': now}
+
+    if delta >= 0 or allow_overdraft:
+        updated = shards.filter(index=random.randrange(shard_count)).update(**values)
+        if not updated:
+            # تم تقليل عدد الأجزاء بعد قراءة shard_count
+            updated = shards.filter(index=0).update(**values)
+        if not updated:
+            raise LedgerError(f'الخزينة {treasury_id} ليست مقسمة')
+        return
+
+    amount = -delta
+    for _ in range(PICK_ATTEMPTS):
+        shard_id = (
+            shards.select_for_update(skip_locked=True)
+            .filter(balance__gte=amount)
+            .order_by('?')
+            .values_list('id', flat=True)
+            .first()
+        )
+        if shard_id is None:
+            break
+        # الشرط يتكرر في UPDATE لأن بعض القواعد (SQLite) تتجاهل FOR UPDATE
+        if TreasuryShard.objects.filter(id=shard_id, balance__gte=amount).update(**values) == 1:
+            return
+
+    # لا يوجد جزء متاح يكفي وحده: قفل كل الأجزاء بترتيب ثابت وتوزيع الخصم
+    locked = list(shards.select_for_update().order_by('index'))
+    if sum(s.balance for s in locked) < amount:
+        raise InsufficientFunds('TREASURY', treasury_id)
+    remaining = amount
+    for shard in locked:
+        take = min(shard.balance, remaining)
+        if take <= 0:
+            continue
+        shard.balance -= take
+        shard.updated_at = now
+        remaining -= take
+    TreasuryShard.objects.bulk_update(locked, ['balance', 'updated_at'])
+
+
+def _spread(total, count):
+    share = (total / count).quantize(CENT, rounding=ROUND_DOWN)
+    shares = [share] * count
+    shares[0] += total - share * count
+    return shares
+
+
+def rebalance(treasury_id):
+    """توزيع رصيد الخزينة (الصف الرئيسي + الأجزاء) بالتساوي على الأجزاء"""
+    with transaction.atomic():
+        treasury = CompanyTreasury.objects.select_for_update().get(id=treasury_id)
+        if not treasury.is_sharded:
+            return treasury.balance
+        locked = list(TreasuryShard.objects.select_for_update().filter(treasury=treasury).order_by('index'))
+        total = treasury.balance + sum(s.balance for s in locked)
+        now = timezone.now()
+        for shard, share in zip(locked, _spread(total, len(locked))):
+            shard.balance = share
+            shard.updated_at = now
+        TreasuryShard.objects.bulk_update(locked, ['balance', 'updated_at'])
+        if treasury.balance:
+            CompanyTreasury.objects.filter(id=treasury.id).update(balance=0, updated_at=now)
+        return total
+
+
+def set_shard_count(treasury_id, count):
+    """
+    تفعيل/تغيير/إلغاء التقسيم. count=1 يعيد الرصيد كاملاً إلى صف الخزينة.
+    الرصيد الكلي لا يتغير (لا قيود في الدفتر).
+    """
+    if count < 1:
+        raise ValueError('عدد الأرصدة الفرعية يجب أن يكون 1 على الأقل')
+    with transaction.atomic():
+        treasury = CompanyTreasury.objects.select_for_update().get(id=treasury_id)
+        shards = TreasuryShard.objects.filter(treasury=treasury)
+        now = timezone.now()
+        if count == 1:
+            folded = sum(s.balance for s in shards.select_for_update().order_by('index'))
+            shards.delete()
+            CompanyTreasury.objects.filter(id=treasury.id).update(
+                balance=F('balance') + folded, shard_count=1, updated_at=now
+            )
+            return
+
+        extra = shards.filter(index__gte=count)
+        folded = sum(s.balance for s in extra.select_for_update().order_by('index'))
+        extra.delete()
+        TreasuryShard.objects.bulk_create(
+            [TreasuryShard(treasury=treasury, index=i, balance=0) for i in range(count)],
+            ignore_conflicts=True
+        )
+        CompanyTreasury.objects.filter(id=treasury.id).update(
+            balance=F('balance') + folded, shard_count=count, updated_at=now
+        )
+    rebalance(treasury_id)
@@ -4,6 +4,7 @@ from .views import (
     AddCapitalView, 
     TransferToWalletView, 
     TreasuryListView, 
+    TreasurySummaryView,
     CreateTreasuryView,
     P2PTransferView,   # NEW
     ATMWithdrawView    # NEW
@@ -12,6 +13,7 @@ from .views import (
 urlpatterns = [
     path('balance-sheet/', BalanceSheetView.as_view(), name='balance-sheet'),
     path('treasuries/', TreasuryListView.as_view(), name='treasury-list'),
+    path('treasuries/summary/', TreasurySummaryView.as_view(), name='treasury-summary'),
     path('treasuries/create/', CreateTreasuryView.as_view(), name='treasury-create'),
     path('add-capital/', AddCapitalView.as_view(), name='add-capital'),
     path('transfer-to-wallet/', TransferToWalletView.as_view(), name='transfer-to-wallet'),
@@ -1,11 +1,25 @@
 from rest_framework import views, response, permissions, status
-from django.db.models import Sum
+from django.db.models import Sum, Max, Count
 from django.db import transaction
 from decimal import Decimal
-from .models import CompanyTreasury, CompanyTransaction
+from django.utils.dateparse import parse_date
+from .models import CompanyTreasury, CompanyTransaction, DailyTreasurySummary, TreasuryShard
 from apps.wallets.models import Wallet, Transaction
+from apps.wallets.idempotency import idempotent
+from apps.wallets.throttling import limit_inflight
+from apps.wallets.conditional import ConditionalGetMixin
+from apps.wallets.outbox import publish, transfer_received
+from apps.wallets.ledger import post_journal, wallet_posting, treasury_posting, system_posting, materialize_wallet, InsufficientFunds
 from apps.authentication.models import User
 
+def treasury_rows(treasuries):
+    """بيانات الخزائن مع الرصيد الفعلي (مجموع الأرصدة الفرعية للخزائن المقسمة)"""
+    rows = treasuries.with_live_balance().values('id', 'name', 'type', 'currency', 'live_balance')
+    return [
+        {'id': r['id'], 'name': r['name'], 'type': r['type'], 'currency': r['currency'], 'balance': r['live_balance']}
+        for r in rows
+    ]
+
 class BalanceSheetView(views.APIView):
     permission_classes = [permissions.AllowAny] # In prod: IsAdminUser
 
@@ -15,7 +29,10 @@ class BalanceSheetView(views.APIView):
         
         for currency in currencies:
             # 1. Assets (Company Money)
-            company_assets = CompanyTreasury.objects.filter(currency=currency).aggregate(total=Sum('balance'))['total'] or 0
+            company_assets = (
+                CompanyTreasury.objects.filter(currency=currency).with_live_balance()
+                .aggregate(total=Sum('live_balance'))['total'] or 0
+            )
             
             # 2. Liabilities (User Deposits)
             user_liabilities = Wallet.objects.filter(currency=currency).aggregate(total=Sum('balance'))['total'] or 0
@@ -34,7 +51,7 @@ class BalanceSheetView(views.APIView):
         return response.Response({
             'report': report,
             'details': {
-                'treasuries': list(CompanyTreasury.objects.values('id', 'name', 'type', 'currency', 'balance'))
+                'treasuries': treasury_rows(CompanyTreasury.objects.all())
             }
         })
 
@@ -65,18 +82,22 @@ class AddCapitalView(views.APIView):
             treasury = CompanyTreasury.objects.get(id=treasury_id)
             
             with transaction.atomic():
-                treasury.balance += amount
-                treasury.save()
-                
                 CompanyTransaction.objects.create(
                     treasury=treasury,
                     amount=amount,
                     description=description
                 )
 
+                # Capital comes from outside the company (owners' equity)
+                post_journal(
+                    [treasury_posting(treasury, amount), system_posting('EXTERNAL', treasury.currency, -amount)],
+                    description=description
+                )
+
+            treasury.refresh_from_db(fields=['balance', 'shard_count'])
             return response.Response({
                 'message': 'تم إضافة رأس المال بنجاح',
-                'new_balance': float(treasury.balance)
+                'new_balance': float(treasury.total_balance())
             })
 
         except CompanyTreasury.DoesNotExist:
@@ -89,7 +110,10 @@ class AddCapitalView(views.APIView):
 class TransferToWalletView(views.APIView):
     """تحويل أموال من خزينة الشركة إلى محفظة مستخدم"""
     permission_classes = [permissions.AllowAny]
+    throttle_scope = 'money'
 
+    @limit_inflight
+    @idempotent
     def post(self, request):
         treasury_id = request.data.get('treasury_id')
         user_id = request.data.get('user_id')
@@ -132,34 +156,22 @@ class TransferToWalletView(views.APIView):
                 }, status=status.HTTP_404_NOT_FOUND)
             
             # Check if treasury has enough balance
-            if treasury.balance < amount:
+            treasury_balance = treasury.total_balance()
+            if treasury_balance < amount:
                 return response.Response({
-                    'error': f'رصيد الخزينة غير كافٍ. الرصيد الحالي: {treasury.balance} {treasury.currency}'
+                    'error': f'رصيد الخزينة غير كافٍ. الرصيد الحالي: {treasury_balance} {treasury.currency}'
                 }, status=status.HTTP_400_BAD_REQUEST)
 
-            # Get or create user wallet in same currency
-            wallet, created = Wallet.objects.get_or_create(
-                user=user,
-                currency=treasury.currency,
-                defaults={'balance': 0}
-            )
-
             with transaction.atomic():
-                # Deduct from treasury
-                treasury.balance -= amount
-                treasury.save()
-                
+                # محفظة المستخدم بنفس العملة تُنشأ عند أول إيداع
+                wallet = materialize_wallet(user, treasury.currency)
                 CompanyTransaction.objects.create(
                     treasury=treasury,
                     amount=-amount,
                     description=f"تحويل إلى محفظة {user.username}"
                 )
 
-                # Add to user wallet
-                wallet.balance += amount
-                wallet.save()
-                
-                Transaction.objects.create(
+                deposit = Transaction.objects.create(
                     user=user,
                     amount=amount,
                     currency=treasury.currency,
@@ -167,27 +179,91 @@ class TransferToWalletView(views.APIView):
                     description=description
                 )
 
+                # Deduct from treasury & add to user wallet
+                post_journal(
+                    [treasury_posting(treasury, -amount), wallet_posting(wallet, amount)],
+                    description=f"تحويل إلى محفظة {user.username}",
+                    reference_number=deposit.reference_number
+                )
+                publish(*transfer_received(user.id, amount, treasury.currency, treasury.name, deposit.reference_number))
+
+            treasury.refresh_from_db(fields=['balance', 'shard_count'])
+            wallet.refresh_from_db(fields=['balance'])
             return response.Response({
                 'message': 'تم التحويل بنجاح',
-                'treasury_balance': float(treasury.balance),
+                'treasury_balance': float(treasury.total_balance()),
                 'wallet_balance': float(wallet.balance),
                 'user_name': user.username
             })
 
         except CompanyTreasury.DoesNotExist:
             return response.Response({'error': 'الخزينة غير موجودة'}, status=status.HTTP_404_NOT_FOUND)
+        except InsufficientFunds:
+            return response.Response({'error': 'رصيد الخزينة غير كافٍ'}, status=status.HTTP_400_BAD_REQUEST)
         except ValueError as e:
             return response.Response({'error': f'خطأ في البيانات: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return response.Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-class TreasuryListView(views.APIView):
+class TreasuryListView(ConditionalGetMixin, views.APIView):
     """قائمة جميع الخزائن"""
     permission_classes = [permissions.AllowAny]
 
+    def get_version(self, request):
+        version = CompanyTreasury.objects.aggregate(last=Max('updated_at'), count=Count('id'))
+        # الخزائن المقسمة لا يتغير صفها مع كل حركة
+        shards_last = TreasuryShard.objects.aggregate(last=Max('updated_at'))['last']
+        last = max(filter(None, [version['last'], shards_last]), default=None)
+        return f"{last}|{version['count']}", last
+
     def get(self, request):
-        treasuries = CompanyTreasury.objects.all().values('id', 'name', 'type', 'currency', 'balance')
-        return response.Response(list(treasuries))
+        return response.Response(treasury_rows(CompanyTreasury.objects.all()))
+
+class TreasurySummaryView(views.APIView):
+    """
+    إجمالي الوارد والصادر لكل خزينة خلال فترة، من جدول الملخصات اليومية.
+    المعاملات: start_date, end_date, currency, treasury_id
+    """
+    permission_classes = [permissions.AllowAny]  # In production: IsAdminUser
+
+    def get(self, request):
+        summaries = DailyTreasurySummary.objects.all()
+
+        start_date = parse_date(request.GET.get('start_date') or '')
+        end_date = parse_date(request.GET.get('end_date') or '')
+        currency = request.GET.get('currency')
+        treasury_id = request.GET.get('treasury_id')
+        if start_date:
+            summaries = summaries.filter(day__gte=start_date)
+        if end_date:
+            summaries = summaries.filter(day__lte=end_date)
+        if currency and currency != 'all':
+            summaries = summaries.filter(currency=currency)
+        if treasury_id:
+            summaries = summaries.filter(treasury_id=treasury_id)
+
+        report = {}
+        rows = (
+            summaries.values('treasury_id', 'treasury__name', 'currency', 'direction')
+            .annotate(count=Sum('count'), total=Sum('total'))
+            .order_by('treasury_id')
+        )
+        for r in rows:
+            entry = report.setdefault(r['treasury_id'], {
+                'treasury_id': r['treasury_id'],
+                'name': r['treasury__name'],
+                'currency': r['currency'],
+                'in_count': 0, 'in_total': 0.0,
+                'out_count': 0, 'out_total': 0.0,
+            })
+            prefix = 'in' if r['direction'] == 'IN' else 'out'
+            entry[f'{prefix}_count'] = r['count']
+            entry[f'{prefix}_total'] = float(r['total'])
+
+        for entry in report.values():
+            entry['net'] = entry['in_total'] + entry['out_total']
+
+        return response.Response(list(report.values()))
 
 class CreateTreasuryView(views.APIView):
     """إنشاء خزينة جديدة"""
@@ -202,20 +278,25 @@ class CreateTreasuryView(views.APIView):
         try:
             initial_balance = Decimal(str(initial_balance))
             
-            treasury = CompanyTreasury.objects.create(
-                name=name,
-                type=treasury_type,
-                currency=currency,
-                balance=initial_balance
-            )
-
-            if initial_balance > 0:
-                CompanyTransaction.objects.create(
-                    treasury=treasury,
-                    amount=initial_balance,
-                    description='رصيد افتتاحي'
+            with transaction.atomic():
+                treasury = CompanyTreasury.objects.create(
+                    name=name,
+                    type=treasury_type,
+                    currency=currency,
+                    balance=0
                 )
 
+                if initial_balance > 0:
+                    CompanyTransaction.objects.create(
+                        treasury=treasury,
+                        amount=initial_balance,
+                        description='رصيد افتتاحي'
+                    )
+                    post_journal(
+                        [treasury_posting(treasury, initial_balance), system_posting('EXTERNAL', currency, -initial_balance)],
+                        description='رصيد افتتاحي'
+                    )
+
             return response.Response({
                 'message': 'تم إنشاء الخزينة بنجاح',
                 'id': treasury.id,
@@ -230,7 +311,10 @@ class P2PTransferView(views.APIView):
     تحويل من مستخدم لآخر (P2P)
     """
     permission_classes = [permissions.AllowAny] # In prod: IsAuthenticated
+    throttle_scope = 'money'
 
+    @limit_inflight
+    @idempotent
     def post(self, request):
         # sender_phone = request.user.phone_number (In prod)
         sender_phone = request.data.get('sender_phone') # For testing/admin tool usage
@@ -250,18 +334,16 @@ class P2PTransferView(views.APIView):
             if not sender or not recipient:
                 return response.Response({'error': 'مرسل أو مستقبل غير موجود'}, status=404)
                 
-            sender_wallet, _ = Wallet.objects.get_or_create(user=sender, currency=currency)
-            recipient_wallet, _ = Wallet.objects.get_or_create(user=recipient, currency=currency)
-            
-            if sender_wallet.balance < amount:
+            sender_wallet = Wallet.objects.filter(user=sender, currency=currency).first()
+            if not sender_wallet or sender_wallet.balance < amount:
                 return response.Response({'error': 'رصيد غير كافي'}, status=400)
             
             with transaction.atomic():
-                sender_wallet.balance -= amount
-                sender_wallet.save()
-                
-                recipient_wallet.balance += amount
-                recipient_wallet.save()
+                recipient_wallet = materialize_wallet(recipient, currency)
+                post_journal(
+                    [wallet_posting(sender_wallet, -amount), wallet_posting(recipient_wallet, amount)],
+                    description=f"تحويل من {sender.username} إلى {recipient.username}"
+                )
                 
                 # Log transactions
                 Transaction.objects.create(
@@ -278,9 +360,13 @@ class P2PTransferView(views.APIView):
                     transaction_type='TRANSFER_IN',
                     description=f"استلام من {sender.username}"
                 )
+                publish(*transfer_received(recipient.id, amount, currency, sender.username))
                 
+            sender_wallet.refresh_from_db(fields=['balance'])
             return response.Response({'message': 'تم التحويل بنجاح', 'new_balance': float(sender_wallet.balance)})
 
+        except InsufficientFunds:
+            return response.Response({'error': 'رصيد غير كافي'}, status=400)
         except Exception as e:
             return response.Response({'error': str(e)}, status=500)
 
@@ -290,7 +376,10 @@ class ATMWithdrawView(views.APIView):
     طلب كود سحب من الصراف
     """
     permission_classes = [permissions.AllowAny]
+    throttle_scope = 'money'
 
+    @limit_inflight
+    @idempotent
     def post(self, request):
         phone = request.data.get('phone')
         amount = request.data.get('amount')
@@ -302,14 +391,16 @@ class ATMWithdrawView(views.APIView):
                 return response.Response({'error': 'المستخدم غير موجود'}, status=404)
             
             amount = Decimal(str(amount))
-            wallet, _ = Wallet.objects.get_or_create(user=user, currency='YER') # Assuming YER for ATM
+            wallet = Wallet.objects.filter(user=user, currency='YER').first() # Assuming YER for ATM
             
-            if wallet.balance < amount:
+            if not wallet or wallet.balance < amount:
                  return response.Response({'error': 'رصيد غير كافي'}, status=400)
                  
             with transaction.atomic():
-                wallet.balance -= amount
-                wallet.save()
+                post_journal(
+                    [wallet_posting(wallet, -amount), system_posting('EXTERNAL', 'YER', amount)],
+                    description=f"سحب ATM - {bank}"
+                )
                 
                 Transaction.objects.create(
                     user=user,
@@ -329,5 +420,7 @@ class ATMWithdrawView(views.APIView):
                 'validity': '30 دقيقة'
             })
             
+        except InsufficientFunds:
+            return response.Response({'error': 'رصيد غير كافي'}, status=400)
         except Exception as e:
            return response.Response({'error': str(e)}, status=500)
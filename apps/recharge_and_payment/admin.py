@@ -0,0 +1,19 @@
+from django.contrib import admin
+from .models import ReconciliationIssue, ReconciliationCheckpoint, Offer
+
+@admin.register(ReconciliationIssue)
+class ReconciliationIssueAdmin(admin.ModelAdmin):
+    list_display = ('reference_number', 'day', 'issue_type', 'local_amount', 'provider_amount', 'status', 'created_at')
+    list_filter = ('status', 'issue_type')
+    search_fields = ('reference_number',)
+    date_hierarchy = 'day'
+
+@admin.register(ReconciliationCheckpoint)
+class ReconciliationCheckpointAdmin(admin.ModelAdmin):
+    list_display = ('provider', 'last_transaction_id', 'updated_at')
+
+@admin.register(Offer)
+class OfferAdmin(admin.ModelAdmin):
+    list_display = ('service_code', 'offer_id', 'name', 'price', 'validity_days', 'is_active', 'synced_at')
+    list_filter = ('is_active', 'service_code')
+    search_fields = ('offer_id', 'name')
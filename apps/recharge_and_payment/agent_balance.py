@@ -0,0 +1,107 @@
+"""
+رصيد الوكيل لدى الزاجل (AC 7400) من الكاش بدلاً من طلب مباشر في كل مرة.
+
+- refresh (أمر poll_agent_balance الدوري) يستعلم من المزود ويخزن الرصيد ووقت الجلب.
+- بعد كل عملية سداد ناجحة يُخصم المبلغ من الرصيد المخزن (decrement) حتى يبقى تقديرياً صحيحاً
+  بين الاستعلامات. الرصيد يُخزن كعدد صحيح بالهللة ويُخصم بـ cache.decr (ذري على Redis/Memcached،
+  وقراءة ثم كتابة على DatabaseCache؛ القيمة تقديرية ويصححها الاستعلام الدوري التالي).
+- الرصيد المخزن هو رصيد الوكيل لدى الزاجل فقط؛ السداد عبر مزود آخر لا يُخصم منه.
+- الكاش يجب أن يكون مشتركاً بين العمليات (CACHES في الإعدادات) حتى تصل قيمة الأمر الدوري
+  إلى عمال الويب. جدول DatabaseCache يُنشأ بالترحيل 0003_cache_table؛ إذا تعذر الكاش يُعامل
+  الرصيد كغير مخزن.
+- PaymentView يرفض محلياً إذا كان الرصيد المخزن (غير القديم) لا يغطي المبلغ،
+  بدلاً من رحلة كاملة للمزود تنتهي بالرفض.
+"""
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .providers import ALZAJIL
+from .services import AlzajilClient
+
+PROVIDER = ALZAJIL
+
+BALANCE_KEY = 'alzajil:agent-balance:minor'
+META_KEY = 'alzajil:agent-balance:meta'
+
+
+def _cache():
+    return caches[getattr(settings, 'ALZAJIL_AGENT_BALANCE_CACHE_ALIAS', 'default')]
+
+
+def _max_age():
+    return getattr(settings, 'ALZAJIL_AGENT_BALANCE_MAX_AGE', 300)
+
+
+def _parse_balance(response):
+    try:
+        return Decimal(str(response.get('BAL'))).quantize(Decimal('0.01'))
+    except (InvalidOperation, TypeError, ValueError):
+        return None
+
+
+def store(response):
+    """تخزين استجابة 7400 ناجحة. تُرجع الرصيد أو None إذا لم تكن صالحة"""
+    if str(response.get('RC')) != '0':
+        return None
+    balance = _parse_balance(response)
+    if balance is None:
+        return None
+    cache = _cache()
+    # المدة في الكاش أطول من حد القِدم: القيمة القديمة تُعرض مع عمرها ولا تُستخدم للرفض
+    ttl = _max_age() * 10
+    cache.set(BALANCE_KEY, int(balance * 100), ttl)
+    cache.set(META_KEY, {'response': response, 'fetched_at': time.time()}, ttl)
+    return balance
+
+
+def refresh(client=None):
+    """جلب الرصيد من المزود وتخزينه. تُرجع استجابة المزود كما هي"""
+    response = (client or AlzajilClient()).query_agent_balance()
+    store(response)
+    return response
+
+
+def get_cached():
+    """(الرصيد، العمر بالثواني، آخر استجابة) أو None إذا لم يُخزن بعد"""
+    cache = _cache()
+    try:
+        meta = cache.get(META_KEY)
+        minor = cache.get(BALANCE_KEY)
+    except Exception as e:
+        # الكاش غير متاح (مثلاً جدول DatabaseCache لم يُنشأ): كأن الرصيد غير مخزن فلا يُرفض شيء محلياً
+        print(f"⚠️ Agent balance cache read failed: {e}")
+        return None
+    if meta is None or minor is None:
+        return None
+    return Decimal(minor) / 100, time.time() - meta['fetched_at'], meta['response']
+
+
+def decrement(amount, provider=PROVIDER):
+    """خصم متفائل بعد سداد ناجح عبر الزاجل (يتجاهل الخصم إذا لم يكن الرصيد مخزناً)"""
+    if provider != PROVIDER:
+        return
+    try:
+        _cache().decr(BALANCE_KEY, int(Decimal(str(amount)) * 100))
+    except ValueError:
+        pass
+    except Exception as e:
+        # بعد سداد نفذه المزود: تعذر الخصم التقديري لا يُفشل الطلب (يصححه الاستعلام الدوري)
+        print(f"⚠️ Agent balance cache decrement failed: {e}")
+
+
+def can_cover(amount):
+    """
+    False فقط إذا كان الرصيد المخزن حديثاً ولا يغطي المبلغ مع الاحتياطي.
+    بدون رصيد مخزن أو برصيد قديم لا يتم الرفض محلياً (المزود هو الحكم).
+    """
+    cached = get_cached()
+    if cached is None:
+        return True
+    balance, age, _ = cached
+    if age > _max_age():
+        return True
+    reserve = Decimal(str(getattr(settings, 'ALZAJIL_AGENT_BALANCE_RESERVE', 0)))
+    return balance - reserve >= Decimal(str(amount))
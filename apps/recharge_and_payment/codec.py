@@ -0,0 +1,125 @@
+"""
+ترميز طلبات الزاجل وفك استجاباتها بخرائط مفاتيح محسوبة مسبقاً.
+
+- مفاتيح الاستجابة تأتي بحالات أحرف مختلفة (rc / Rc / RC)؛ المفاتيح المعروفة تُوحد إلى
+  الأحرف الكبيرة عبر قاموس محسوب عند التحميل لكل أشكالها الشائعة، والمفاتيح الجديدة
+  تُحسب مرة واحدة وتُحفظ (بحد أقصى) بدلاً من lower() والبحث في قائمة في كل طلب.
+- الاستجابة تُقرأ من البايتات مباشرة (response.content) بـ orjson (من متطلبات المشروع في
+  requirements.txt) بدون تحويلها إلى نص أولاً. json القياسية احتياط بنفس النتيجة فقط إذا
+  لم تكن الحزمة مثبتة (يظهر ذلك في bench_alzajil_codec).
+- النتيجة AlzajilResponse: قاموس (dict) بدون __dict__ (__slots__) مع خصائص مكتوبة
+  (rc, ok, msg, ref, balance). لأنه dict تعيده الـ Views مباشرة ويُخزن في JSONField
+  والكاش بدون تحويل.
+"""
+import json
+from decimal import Decimal, InvalidOperation
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# AMT: مبلغ العملية في استجابة 1003 كما تقرؤه المطابقة (reconciliation.py)
+RESPONSE_KEYS = frozenset((
+    'rc', 'msg', 'sd', 'bal', 'mt', 'amt', 'loan', 'bill', 'ref', 'credit', 'bill_balance',
+    'adamt', 'offer_id', 'offer_name', 'effdate', 'expdate', 'packages', 'list', 'name',
+))
+
+# الشكل الوارد -> الشكل الموحد لكل المفاتيح المعروفة
+_RESPONSE_KEY_MAP = {}
+for _key in RESPONSE_KEYS:
+    for _variant in (_key, _key.upper(), _key.capitalize(), _key.title()):
+        _RESPONSE_KEY_MAP[_variant] = _key.upper()
+
+_BODY_KEY_MAP = {}
+_MAX_LEARNED_KEYS = 1024
+
+
+class AlzajilResponse(dict):
+    """استجابة الزاجل بمفاتيح موحدة"""
+    # provider: اسم المزود الذي أعادها (يضعه الموجه) خارج بيانات الاستجابة المعروضة للعميل
+    __slots__ = ('provider',)
+
+    @property
+    def rc(self):
+        try:
+            return int(self.get('RC'))
+        except (TypeError, ValueError):
+            return None
+
+    @property
+    def ok(self):
+        return self.rc == 0
+
+    @property
+    def msg(self):
+        return self.get('MSG') or ''
+
+    @property
+    def ref(self):
+        return self.get('REF')
+
+    @property
+    def balance(self):
+        try:
+            return Decimal(str(self.get('BAL')))
+        except (InvalidOperation, TypeError, ValueError):
+            return None
+
+
+def normalize_key(key):
+    try:
+        return _RESPONSE_KEY_MAP[key]
+    except KeyError:
+        pass
+    lower = key.lower()
+    normalized = lower.upper() if lower in RESPONSE_KEYS else key
+    if len(_RESPONSE_KEY_MAP) < _MAX_LEARNED_KEYS:
+        _RESPONSE_KEY_MAP[key] = normalized
+    return normalized
+
+
+def loads(content):
+    """bytes/str -> كائن Python (orjson إن وُجد). الخطأ ValueError في الحالتين"""
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def decode(content):
+    """فك استجابة المزود. القاموس يُعاد كـ AlzajilResponse بمفاتيح موحدة"""
+    data = loads(content)
+    if type(data) is not dict:
+        return data
+    key_map = _RESPONSE_KEY_MAP
+    return AlzajilResponse({
+        (key_map[k] if k in key_map else normalize_key(k)): v for k, v in data.items()
+    })
+
+
+def _body_key(key):
+    try:
+        return _BODY_KEY_MAP[key]
+    except KeyError:
+        lower = key.lower()
+        if len(_BODY_KEY_MAP) < _MAX_LEARNED_KEYS:
+            _BODY_KEY_MAP[key] = lower
+        return lower
+
+
+def _body_value(value):
+    if type(value) is str:
+        return value
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+
+def encode_body(body, usr=None, tkn=None):
+    """جسم طلب POST: مفاتيح بحروف صغيرة وقيم نصية (1.0 -> '1') مع usr/tkn إن لم تكن موجودة"""
+    final_body = {_body_key(k): _body_value(v) for k, v in body.items()} if body else {}
+    if usr and 'usr' not in final_body:
+        final_body['usr'] = usr
+    if tkn and 'tkn' not in final_body:
+        final_body['tkn'] = tkn
+    return final_body
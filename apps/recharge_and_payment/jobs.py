@@ -0,0 +1,23 @@
+from saifi.jobs.tasks import task
+
+
+@task(max_attempts=1, timeout=1800)
+def reconcile_alzajil():
+    """تشغيل المطابقة من طابور المهام (runworkers) لكل المزودين"""
+    from .providers import load_providers
+    from .reconciliation import reconcile
+    return {provider.name: reconcile(provider=provider.name) for provider in load_providers()}
+
+
+@task(max_attempts=1, timeout=60)
+def refresh_agent_balance():
+    """تحديث رصيد الوكيل المخزن من طابور المهام"""
+    from .agent_balance import refresh
+    return refresh().get('RC')
+
+
+@task(max_attempts=3, timeout=600)
+def sync_offer_catalog():
+    """مزامنة كتالوج العروض من طابور المهام"""
+    from .offer_catalog import sync_all
+    return sync_all()
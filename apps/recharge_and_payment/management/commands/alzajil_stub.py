@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from apps.recharge_and_payment.stub_server import StubConfig, StubServer
+
+
+class Command(BaseCommand):
+    help = 'تشغيل خادم الزاجل التجريبي محلياً (زمن وأخطاء قابلة للضبط، أو إعادة تشغيل جلسة مسجلة)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--latency', action='append',
+                            help='توزيع الزمن: fixed:S | uniform:MIN:MAX | exp:MEAN | lognormal:MEDIAN:SIGMA، '
+                                 'أو لرمز محدد 7100=fixed:1 (يمكن تكراره)')
+        parser.add_argument('--rc', action='append', help="رموز RC موزونة: '0:0.95,51:0.05' أو '7100=0:0.9,51:0.1'")
+        parser.add_argument('--error-rate', type=float, default=0.0, help='نسبة استجابات HTTP 500')
+        parser.add_argument('--drop-rate', type=float, default=0.0, help='نسبة قطع الاتصال بدون استجابة')
+        parser.add_argument('--agent-balance', default='1000000')
+        parser.add_argument('--seed', type=int)
+        parser.add_argument('--replay', help='ملف جلسة مسجلة (ALZAJIL_RECORD_PATH) لإعادة تشغيلها')
+        parser.add_argument('--verbose', action='store_true')
+
+    def handle(self, *args, **options):
+        config = StubConfig(
+            latency=options['latency'],
+            rc=options['rc'],
+            error_rate=options['error_rate'],
+            drop_rate=options['drop_rate'],
+            agent_balance=options['agent_balance'],
+            seed=options['seed'],
+            replay=options['replay'],
+        )
+        server = StubServer(config, host=options['host'], port=options['port'], verbose=options['verbose'])
+        self.stdout.write(self.style.SUCCESS(f'خادم الزاجل التجريبي: {server.url}'))
+        self.stdout.write('اضبط ALZAJIL_PAYMENT_URL و ALZAJIL_REPORT_URL على هذا الرابط. Ctrl+C للإيقاف')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f'الطلبات حسب AC: {dict(server.state.counters)}')
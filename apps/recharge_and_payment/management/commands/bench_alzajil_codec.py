@@ -0,0 +1,62 @@
+import json
+import timeit
+
+from django.core.management.base import BaseCommand
+from apps.recharge_and_payment import codec
+
+SAMPLE_RESPONSE = json.dumps({
+    'rc': 0, 'msg': 'تمت العملية بنجاح', 'ref': '9912837465', 'bal': '152300.50', 'sd': '2026-10-19 10:15:00',
+    'mt': 0, 'Credit': '0', 'bill_balance': '0', 'adamt': '0', 'TransId': '55120', 'extra_info': None,
+}, ensure_ascii=False).encode()
+SAMPLE_BODY = {'AC': 7100, 'SC': 42101, 'AMT': 1500.0, 'SNO': '777123456', 'REF': 'A-1', 'REM': 'test'}
+
+LEGACY_KEYS = ['rc', 'msg', 'sd', 'bal', 'mt', 'loan', 'bill', 'ref', 'credit', 'bill_balance',
+               'adamt', 'offer_id', 'offer_name', 'effdate', 'expdate', 'packages', 'list', 'name']
+
+
+def legacy_call(content, body):
+    """مسار AlzajilClient قبل codec: بناء الجسم، response.json() من النص، والتوحيد بقائمة"""
+    final_body = {}
+    for k, v in body.items():
+        val = v
+        if isinstance(v, float) and v.is_integer():
+            val = int(v)
+        final_body[k.lower()] = str(val)
+    final_body['usr'] = 'usr'
+    final_body['tkn'] = 'tkn'
+
+    response_json = json.loads(content.decode('utf-8'))
+    normalized = {}
+    for k, v in response_json.items():
+        key_lower = k.lower()
+        if key_lower in LEGACY_KEYS:
+            normalized[key_lower.upper()] = v
+        else:
+            normalized[k] = v
+    return normalized
+
+
+def codec_call(content, body):
+    codec.encode_body(body, 'usr', 'tkn')
+    return codec.decode(content)
+
+
+class Command(BaseCommand):
+    help = 'قياس كلفة ترميز الطلب وفك الاستجابة لكل طلب للزاجل: المسار السابق مقابل codec'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        n, repeat = options['iterations'], options['repeat']
+        assert legacy_call(SAMPLE_RESPONSE, SAMPLE_BODY) == codec_call(SAMPLE_RESPONSE, SAMPLE_BODY)
+
+        results = {}
+        for label, func in (('legacy', legacy_call), ('codec', codec_call)):
+            best = min(timeit.repeat(lambda: func(SAMPLE_RESPONSE, SAMPLE_BODY), number=n, repeat=repeat))
+            results[label] = best / n * 1e6
+            self.stdout.write(f'{label:>8}: {results[label]:.2f} µs/call')
+
+        self.stdout.write(f"orjson: {'نعم' if codec.orjson is not None else 'لا (json القياسية)'}")
+        self.stdout.write(self.style.SUCCESS(f"التسريع: {results['legacy'] / results['codec']:.2f}x"))
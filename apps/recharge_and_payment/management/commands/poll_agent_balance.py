@@ -0,0 +1,28 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from apps.recharge_and_payment import agent_balance
+
+
+class Command(BaseCommand):
+    help = 'تحديث رصيد الوكيل لدى الزاجل (AC 7400) في الكاش دورياً. يعمل باستمرار ما لم يُحدد --once'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, help='ثوان بين الاستعلامات (الافتراضي ALZAJIL_AGENT_BALANCE_POLL_SECONDS)')
+        parser.add_argument('--once', action='store_true', help='استعلام واحد ثم الخروج')
+
+    def handle(self, *args, **options):
+        interval = options['interval'] or getattr(settings, 'ALZAJIL_AGENT_BALANCE_POLL_SECONDS', 60)
+        while True:
+            try:
+                response = agent_balance.refresh()
+            except Exception as e:
+                response = {'RC': -100, 'MSG': str(e)}
+            if str(response.get('RC')) == '0':
+                self.stdout.write(f"رصيد الوكيل: {response.get('BAL')}")
+            else:
+                self.stdout.write(self.style.WARNING(f"فشل الاستعلام عن رصيد الوكيل: {response.get('MSG')}"))
+            if options['once']:
+                break
+            time.sleep(interval)
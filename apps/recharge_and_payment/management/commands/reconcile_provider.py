@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from apps.recharge_and_payment.providers import load_providers
+from apps.recharge_and_payment.reconciliation import reconcile
+
+
+class Command(BaseCommand):
+    help = 'مطابقة عمليات السداد الجديدة مع حالتها لدى مزودها (AC 1003) وتسجيل الفروقات (يُشغل دورياً)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--provider', action='append', help='اسم المزود من RECHARGE_PROVIDERS (الافتراضي: الكل)')
+        parser.add_argument('--concurrency', type=int, help='عدد الطلبات المتوازية للمزود')
+        parser.add_argument('--settle-minutes', type=int, help='تجاهل الحركات الأحدث من هذه المدة')
+        parser.add_argument('--max-rows', type=int, default=5000, help='أقصى عدد حركات في التشغيل الواحد')
+
+    def handle(self, *args, **options):
+        for provider in options['provider'] or [p.name for p in load_providers()]:
+            stats = reconcile(
+                provider=provider,
+                concurrency=options['concurrency'],
+                settle_minutes=options['settle_minutes'],
+                max_rows=options['max_rows'],
+            )
+            self.stdout.write(f"{provider}: أيام: {stats['days']} | تم التحقق: {stats['checked']} | فروقات: {stats['issues']}")
+            if stats['stopped']:
+                self.stdout.write(self.style.WARNING('توقفت المطابقة: المزود غير متاح، ستستكمل في التشغيل التالي'))
+            else:
+                self.stdout.write(self.style.SUCCESS('اكتملت المطابقة'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from apps.recharge_and_payment.offer_catalog import sync_all
+
+
+class Command(BaseCommand):
+    help = 'مزامنة قوائم العروض (AC 4005) للخدمات المعرفة في ALZAJIL_OFFER_CATALOG_SUBSCRIBERS إلى الكتالوج المحلي (يُشغل دورياً)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sc', type=int, action='append', help='رمز خدمة محدد (يمكن تكراره)')
+
+    def handle(self, *args, **options):
+        results = sync_all(service_codes=options['sc'])
+        if not results:
+            self.stdout.write(self.style.WARNING('لا توجد خدمات معرفة في ALZAJIL_OFFER_CATALOG_SUBSCRIBERS'))
+        for service_code, count in results.items():
+            if count is None:
+                self.stdout.write(self.style.WARNING(f'{service_code}: فشلت المزامنة، بقي الكتالوج كما هو'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'{service_code}: {count} عرض'))
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:19
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReconciliationCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('provider', models.CharField(max_length=50, unique=True, verbose_name='المزود')),
+                ('last_transaction_id', models.BigIntegerField(default=0, verbose_name='آخر حركة')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='آخر تشغيل')),
+            ],
+            options={
+                'verbose_name': 'نقطة مطابقة',
+                'verbose_name_plural': 'نقاط المطابقة',
+            },
+        ),
+        migrations.CreateModel(
+            name='ReconciliationIssue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('transaction_id', models.BigIntegerField(verbose_name='الحركة')),
+                ('transaction_created_at', models.DateTimeField(verbose_name='تاريخ الحركة')),
+                ('reference_number', models.CharField(blank=True, max_length=50, verbose_name='الرقم المرجعي')),
+                ('day', models.DateField(verbose_name='يوم العملية')),
+                ('issue_type', models.CharField(choices=[('MISSING_REF', 'لا يوجد رقم مرجعي من المزود'), ('NOT_CONFIRMED', 'المزود لا يؤكد العملية'), ('AMOUNT_MISMATCH', 'المبلغ مختلف')], max_length=20, verbose_name='نوع الفرق')),
+                ('local_amount', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='المبلغ المحلي')),
+                ('provider_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True, verbose_name='مبلغ المزود')),
+                ('provider_response', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='استجابة المزود')),
+                ('status', models.CharField(choices=[('OPEN', 'مفتوحة'), ('RESOLVED', 'تمت المعالجة')], default='OPEN', max_length=10, verbose_name='الحالة')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الاكتشاف')),
+                ('resolved_at', models.DateTimeField(blank=True, null=True, verbose_name='تاريخ المعالجة')),
+            ],
+            options={
+                'verbose_name': 'فرق مطابقة',
+                'verbose_name_plural': 'فروقات مطابقة المزود',
+                'ordering': ['-day', '-id'],
+                'indexes': [models.Index(fields=['status', 'day'], name='recharge_an_status_cb67c3_idx')],
+                'unique_together': {('transaction_id', 'transaction_created_at', 'issue_type')},
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:23
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recharge_and_payment', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Offer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('service_code', models.IntegerField(verbose_name='رمز الخدمة (SC)')),
+                ('offer_id', models.CharField(max_length=20, verbose_name='معرف العرض (SAC)')),
+                ('name', models.CharField(blank=True, max_length=200, verbose_name='الاسم')),
+                ('price', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True, verbose_name='السعر')),
+                ('validity_days', models.PositiveIntegerField(blank=True, null=True, verbose_name='الصلاحية (أيام)')),
+                ('raw', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='بيانات المزود')),
+                ('is_active', models.BooleanField(default=True, verbose_name='متاح')),
+                ('synced_at', models.DateTimeField(verbose_name='آخر مزامنة')),
+            ],
+            options={
+                'verbose_name': 'عرض',
+                'verbose_name_plural': 'كتالوج العروض',
+                'ordering': ['service_code', 'price', 'id'],
+                'indexes': [models.Index(fields=['service_code', 'is_active', 'price'], name='recharge_an_service_a503b7_idx'), models.Index(fields=['service_code', 'is_active', 'validity_days'], name='recharge_an_service_13c1d6_idx')],
+                'unique_together': {('service_code', 'offer_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,85 @@
+from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+class ReconciliationIssue(models.Model):
+    """فرق بين عملية سداد محلية (WITHDRAW) وحالتها لدى المزود (AC 1003)"""
+    ISSUE_TYPES = [
+        ('MISSING_REF', 'لا يوجد رقم مرجعي من المزود'),
+        ('NOT_CONFIRMED', 'المزود لا يؤكد العملية'),
+        ('AMOUNT_MISMATCH', 'المبلغ مختلف'),
+    ]
+    STATUS_CHOICES = [
+        ('OPEN', 'مفتوحة'),
+        ('RESOLVED', 'تمت المعالجة'),
+    ]
+
+    # بدون ForeignKey: wallets_transaction مقسم ومفتاحه الأساسي (id, created_at)، فتُحفظ مكوناته كقيم
+    transaction_id = models.BigIntegerField(verbose_name="الحركة")
+    transaction_created_at = models.DateTimeField(verbose_name="تاريخ الحركة")
+    reference_number = models.CharField(max_length=50, blank=True, verbose_name="الرقم المرجعي")
+    day = models.DateField(verbose_name="يوم العملية")
+    issue_type = models.CharField(max_length=20, choices=ISSUE_TYPES, verbose_name="نوع الفرق")
+    local_amount = models.DecimalField(max_digits=12, decimal_places=2, verbose_name="المبلغ المحلي")
+    provider_amount = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True, verbose_name="مبلغ المزود")
+    provider_response = models.JSONField(default=dict, encoder=DjangoJSONEncoder, verbose_name="استجابة المزود")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='OPEN', verbose_name="الحالة")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="تاريخ الاكتشاف")
+    resolved_at = models.DateTimeField(null=True, blank=True, verbose_name="تاريخ المعالجة")
+
+    class Meta:
+        unique_together = ['transaction_id', 'transaction_created_at', 'issue_type']
+        indexes = [
+            models.Index(fields=['status', 'day']),
+        ]
+        ordering = ['-day', '-id']
+        verbose_name = "فرق مطابقة"
+        verbose_name_plural = "فروقات مطابقة المزود"
+
+    def __str__(self):
+        return f"{self.reference_number} - {self.issue_type} ({self.status})"
+
+    @property
+    def transaction(self):
+        """الحركة المحلية (None إذا أُرشفت)؛ البحث بالمفتاح الكامل يقرأ قسماً واحداً"""
+        from apps.wallets.models import Transaction
+        return Transaction.objects.filter(id=self.transaction_id, created_at=self.transaction_created_at).first()
+
+
+class ReconciliationCheckpoint(models.Model):
+    """آخر حركة تمت مطابقتها لكل مزود، حتى يغطي كل تشغيل الحركات الجديدة فقط"""
+    provider = models.CharField(max_length=50, unique=True, verbose_name="المزود")
+    last_transaction_id = models.BigIntegerField(default=0, verbose_name="آخر حركة")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="آخر تشغيل")
+
+    class Meta:
+        verbose_name = "نقطة مطابقة"
+        verbose_name_plural = "نقاط المطابقة"
+
+    def __str__(self):
+        return f"{self.provider}: {self.last_transaction_id}"
+
+
+class Offer(models.Model):
+    """عرض/باقة من قائمة عروض الخدمة (AC 4005) تتم مزامنتها دورياً (sync_offer_catalog)"""
+    service_code = models.IntegerField(verbose_name="رمز الخدمة (SC)")
+    offer_id = models.CharField(max_length=20, verbose_name="معرف العرض (SAC)")
+    name = models.CharField(max_length=200, blank=True, verbose_name="الاسم")
+    price = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True, verbose_name="السعر")
+    validity_days = models.PositiveIntegerField(null=True, blank=True, verbose_name="الصلاحية (أيام)")
+    raw = models.JSONField(default=dict, encoder=DjangoJSONEncoder, verbose_name="بيانات المزود")
+    is_active = models.BooleanField(default=True, verbose_name="متاح")
+    synced_at = models.DateTimeField(verbose_name="آخر مزامنة")
+
+    class Meta:
+        unique_together = ['service_code', 'offer_id']
+        indexes = [
+            models.Index(fields=['service_code', 'is_active', 'price']),
+            models.Index(fields=['service_code', 'is_active', 'validity_days']),
+        ]
+        ordering = ['service_code', 'price', 'id']
+        verbose_name = "عرض"
+        verbose_name_plural = "كتالوج العروض"
+
+    def __str__(self):
+        return f"{self.service_code}/{self.offer_id} - {self.name}"
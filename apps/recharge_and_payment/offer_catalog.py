@@ -0,0 +1,163 @@
+"""
+كتالوج العروض المحلي (AC 4005).
+
+قائمة العروض لكل رمز خدمة (SC) نادراً ما تتغير، لذلك تُزامن دورياً إلى جدول Offer
+(أمر sync_offer_catalog أو مهمة sync_offer_catalog) ويُقدم التصفح والتصفية من الجدول.
+الإجراءات الخاصة بالمشترك (تفعيل عرض، عروض المشترك، القائمة مع الرصيد) تبقى عند المزود.
+
+- القائمة تتطلب رقم مشترك؛ يُستخدم رقم نموذجي لكل SC من ALZAJIL_OFFER_CATALOG_SUBSCRIBERS.
+- المزود يعيد العناصر في PACKAGES أو LIST وبأسماء حقول مختلفة حسب الخدمة، لذلك تُقرأ
+  الحقول من عدة أسماء محتملة بغض النظر عن حالة الأحرف (codec يوحد مفاتيح المستوى الأول فقط)
+  ويُحفظ العنصر كما هو في raw.
+- الاستجابة الفاشلة لا تغير الكتالوج؛ العروض التي اختفت من قائمة ناجحة تُعلم غير متاحة.
+  القائمة غير الفارغة التي لا يُقرأ منها أي عرض (شكل غير معروف) تُعامل كفشل ولا تُعطل الكتالوج.
+"""
+import re
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Offer
+from .services import AlzajilClient
+
+AC_LIST = 4005
+# أسماء الحقول المحتملة بالأحرف الكبيرة (المقارنة بعد upper())
+ID_KEYS = ('SAC', 'OFFER_ID', 'ID', 'CODE')
+NAME_KEYS = ('NAME', 'OFFER_NAME', 'NM', 'TITLE', 'DESC')
+PRICE_KEYS = ('PRICE', 'AMT', 'AMOUNT', 'COST')
+VALIDITY_KEYS = ('VALIDITY', 'DAYS', 'PERIOD', 'DURATION')
+
+
+def _upper_keys(item):
+    return {str(key).upper(): value for key, value in item.items()}
+
+
+def _pick(fields, keys):
+    """أول قيمة غير فارغة من الأسماء المحتملة (fields بمفاتيح كبيرة من _upper_keys)"""
+    for key in keys:
+        if fields.get(key) not in (None, ''):
+            return fields[key]
+    return None
+
+
+def _price(value):
+    try:
+        return Decimal(str(value).replace(',', '')).quantize(Decimal('0.01'))
+    except (InvalidOperation, TypeError, ValueError):
+        return None
+
+
+def _validity_days(value):
+    """'30' أو '30 يوم' أو 'شهر' -> عدد الأيام"""
+    if value is None:
+        return None
+    match = re.search(r'\d+', str(value))
+    if match:
+        return int(match.group())
+    text = str(value)
+    for word, days in (('يوم', 1), ('أسبوع', 7), ('اسبوع', 7), ('شهر', 30), ('سنة', 365)):
+        if word in text:
+            return days
+    return None
+
+
+def list_items(response):
+    """عناصر القائمة كما أرسلها المزود (PACKAGES أو LIST بأي حالة أحرف)"""
+    fields = _upper_keys(response)
+    items = fields.get('PACKAGES') or fields.get('LIST') or []
+    if isinstance(items, dict):
+        items = list(items.values())
+    return items
+
+
+def parse_offers(response):
+    """عناصر القائمة كقواميس حقول Offer (تُتجاهل العناصر بدون معرف)"""
+    items = list_items(response)
+    offers = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        fields = _upper_keys(item)
+        offer_id = _pick(fields, ID_KEYS)
+        if offer_id is None:
+            continue
+        offers[str(offer_id)[:20]] = {
+            'name': str(_pick(fields, NAME_KEYS) or '')[:200],
+            'price': _price(_pick(fields, PRICE_KEYS)),
+            'validity_days': _validity_days(_pick(fields, VALIDITY_KEYS)),
+            'raw': item,
+        }
+    return offers
+
+
+def sync_service(service_code, subscriber_no, client=None):
+    """مزامنة قائمة عروض خدمة واحدة. تُرجع عدد العروض المتاحة أو None إذا فشل الاستعلام"""
+    client = client or AlzajilClient()
+    try:
+        response = client.manage_offers(action_code=AC_LIST, service_code=service_code, subscriber_no=subscriber_no)
+    except Exception as e:
+        print(f"❌ Offer catalog {service_code}: {e}")
+        return None
+    if not isinstance(response, dict) or str(response.get('RC')) != '0':
+        print(f"⚠️ Offer catalog {service_code}: {response}")
+        return None
+
+    offers = parse_offers(response)
+    if not offers and list_items(response):
+        # تعطيل الكتالوج كله بسبب شكل عناصر غير معروف أسوأ من إبقاء القائمة السابقة
+        print(f"⚠️ Offer catalog {service_code}: no offers could be parsed from {list_items(response)[:1]}")
+        return None
+    now = timezone.now()
+    with transaction.atomic():
+        Offer.objects.bulk_create(
+            [Offer(service_code=service_code, offer_id=offer_id, is_active=True, synced_at=now, **fields)
+             for offer_id, fields in offers.items()],
+            update_conflicts=True,
+            unique_fields=['service_code', 'offer_id'],
+            update_fields=['name', 'price', 'validity_days', 'raw', 'is_active', 'synced_at'],
+        )
+        Offer.objects.filter(service_code=service_code, is_active=True).exclude(
+            offer_id__in=list(offers)
+        ).update(is_active=False, synced_at=now)
+    return len(offers)
+
+
+def sync_all(service_codes=None, client=None):
+    """مزامنة كل الخدمات المعرفة في ALZAJIL_OFFER_CATALOG_SUBSCRIBERS. تُرجع {SC: عدد العروض أو None}"""
+    subscribers = getattr(settings, 'ALZAJIL_OFFER_CATALOG_SUBSCRIBERS', {})
+    client = client or AlzajilClient()
+    results = {}
+    for service_code, subscriber_no in subscribers.items():
+        if service_codes and int(service_code) not in service_codes:
+            continue
+        results[int(service_code)] = sync_service(int(service_code), subscriber_no, client=client)
+    return results
+
+
+def search(service_code, min_price=None, max_price=None, min_validity=None, max_validity=None, name=None, ordering='price'):
+    """العروض المتاحة لخدمة مع التصفية"""
+    offers = Offer.objects.filter(service_code=service_code, is_active=True)
+    if min_price is not None:
+        offers = offers.filter(price__gte=min_price)
+    if max_price is not None:
+        offers = offers.filter(price__lte=max_price)
+    if min_validity is not None:
+        offers = offers.filter(validity_days__gte=min_validity)
+    if max_validity is not None:
+        offers = offers.filter(validity_days__lte=max_validity)
+    if name:
+        offers = offers.filter(name__icontains=name)
+    return offers.order_by(ordering, 'id')
+
+
+def as_provider_item(offer):
+    """عرض محلي بنفس شكل عنصر LIST لدى المزود مع الحقول الموحدة"""
+    return {
+        **offer.raw,
+        'SAC': offer.offer_id,
+        'NAME': offer.name,
+        'PRICE': float(offer.price) if offer.price is not None else None,
+        'VALIDITY_DAYS': offer.validity_days,
+    }
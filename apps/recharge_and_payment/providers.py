@@ -0,0 +1,105 @@
+"""
+مزودو خدمة السداد خلف الموجه (router.py).
+
+كل مزود يقدم نفس واجهة AlzajilClient (send_payment, query_subscriber_balance, manage_offers,
+query_agent_balance, check_transaction_status) ويُعرف في RECHARGE_PROVIDERS:
+
+    RECHARGE_PROVIDERS = {
+        'alzajil': {'class': 'apps.recharge_and_payment.providers.AlzajilProvider', 'cost': 0},
+        'stub': {'class': 'apps.recharge_and_payment.providers.StubProvider',
+                 'url': 'http://127.0.0.1:8765/api/tp/v1', 'cost': 5, 'service_codes': [42101, 42103]},
+    }
+
+- cost: كلفة العملية لدى المزود (تدخل في ترتيب الموجه).
+- service_codes: الخدمات التي يدعمها المزود (None = الكل).
+- لكل مزود قاطع دائرة مستقل باسمه (resilience.get_breaker).
+- اسم المزود الذي نفذ السداد يُحفظ في Transaction.provider؛ رصيد الوكيل المخزن والمطابقة لكل مزود.
+"""
+from abc import ABC, abstractmethod
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from . import services
+
+ALZAJIL = 'alzajil'
+
+
+class BaseProvider(ABC):
+    """واجهة المزود: يمرر الاستدعاءات إلى عميل بروتوكول الزاجل الخاص به"""
+
+    def __init__(self, name, cost=0, service_codes=None, **options):
+        self.name = name
+        self.cost = cost
+        self.service_codes = frozenset(int(sc) for sc in service_codes) if service_codes else None
+        self.options = options
+
+    def supports(self, service_code):
+        return self.service_codes is None or service_code is None or int(service_code) in self.service_codes
+
+    @property
+    def breaker_name(self):
+        return self.name
+
+    @abstractmethod
+    def get_client(self):
+        """عميل بواجهة AlzajilClient لهذا المزود"""
+
+    def send_payment(self, data):
+        return self.get_client().send_payment(data)
+
+    def query_subscriber_balance(self, service_code, subscriber_no, action_code=4001):
+        return self.get_client().query_subscriber_balance(
+            service_code=service_code, subscriber_no=subscriber_no, action_code=action_code
+        )
+
+    def manage_offers(self, action_code, service_code, subscriber_no, offer_id=None):
+        return self.get_client().manage_offers(
+            action_code=action_code, service_code=service_code, subscriber_no=subscriber_no, offer_id=offer_id
+        )
+
+    def query_agent_balance(self):
+        return self.get_client().query_agent_balance()
+
+    def check_transaction_status(self, trans_ref):
+        return self.get_client().check_transaction_status(trans_ref=trans_ref)
+
+
+class AlzajilProvider(BaseProvider):
+    """الزاجل عبر AlzajilClient وقاطعه 'alzajil'"""
+
+    @property
+    def breaker_name(self):
+        return ALZAJIL
+
+    def get_client(self):
+        # يُنشأ العميل عند كل استدعاء (قراءة الإعدادات فقط) حتى يمكن استبداله في الاختبارات
+        return services.AlzajilClient()
+
+
+class StubProvider(BaseProvider):
+    """
+    مزود بنفس بروتوكول الزاجل على رابط آخر (خادم stub_server أو بيئة اختبار المزود)،
+    بقاطع دائرة مستقل باسم المزود.
+    """
+
+    def get_client(self):
+        client = services.AlzajilClient()
+        client.payment_url = client.report_url = self.options['url']
+        client.breaker_name = self.name
+        return client
+
+
+DEFAULT_PROVIDERS = {
+    ALZAJIL: {'class': 'apps.recharge_and_payment.providers.AlzajilProvider', 'cost': 0},
+}
+
+
+def load_providers():
+    """المزودون المعرفون في RECHARGE_PROVIDERS بالترتيب (الأول هو الافتراضي)"""
+    providers = []
+    for name, config in getattr(settings, 'RECHARGE_PROVIDERS', DEFAULT_PROVIDERS).items():
+        options = dict(config)
+        cls = import_string(options.pop('class'))
+        providers.append(cls(name, **options))
+    return providers
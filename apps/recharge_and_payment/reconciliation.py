@@ -0,0 +1,155 @@
+"""
+مطابقة عمليات السداد المحلية مع المزود (AC 1003).
+
+PaymentView يسجل رقم المزود (REF) في Transaction.reference_number لحركات WITHDRAW واسم المزود
+في Transaction.provider. reconcile يعمل لمزود واحد: يأخذ حركاته الجديدة منذ آخر نقطة مطابقة له
+(ReconciliationCheckpoint) مجمعة حسب اليوم،
+ويستعلم عن حالتها عبر check_transaction_status بعدد محدود من الطلبات المتوازية
+(لا يتجاوز حد الـ Bulkhead للمزود) على اتصالات الجلسة المشتركة (services.get_session)،
+ويسجل الفروقات في ReconciliationIssue.
+
+- الحركات الأحدث من RECONCILIATION_SETTLE_MINUTES لا تدخل (قد لا تظهر لدى المزود بعد).
+- الاستجابة غير الحاسمة (خطأ اتصال، دائرة مفتوحة، خطأ خادم) توقف التشغيل،
+  ونقطة المطابقة تتقدم فقط حتى آخر حركة سبقتها، فتُعاد المحاولة في التشغيل التالي.
+"""
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ReconciliationIssue, ReconciliationCheckpoint
+from .providers import ALZAJIL
+from .resilience import FAST_FAIL_CODES
+from .services import AlzajilClient, is_provider_failure
+
+PROVIDER = ALZAJIL
+MISSING_REFS = ('', 'Unknown', 'None')
+
+
+def _is_inconclusive(response):
+    if not isinstance(response, dict):
+        return True
+    return response.get('RC') in FAST_FAIL_CODES or is_provider_failure(response)
+
+
+def _provider_amount(response):
+    for key in ('AMT', 'MT'):
+        if response.get(key) not in (None, ''):
+            try:
+                return Decimal(str(response[key])).quantize(Decimal('0.01'))
+            except InvalidOperation:
+                return None
+    return None
+
+
+def classify(txn, response):
+    """نوع الفرق ('' إذا تطابقت) ومبلغ المزود"""
+    provider_amount = _provider_amount(response)
+    if str(response.get('RC')) != '0':
+        return 'NOT_CONFIRMED', provider_amount
+    if provider_amount is not None and provider_amount != txn['amount']:
+        return 'AMOUNT_MISMATCH', provider_amount
+    return '', provider_amount
+
+
+def _check(client, reference_number):
+    try:
+        return client.check_transaction_status(reference_number)
+    except Exception as e:
+        return {'RC': -100, 'MSG': f'خطأ: {e}'}
+
+
+def pending_transactions(provider, after_id, cutoff, limit):
+    from apps.wallets.models import Transaction
+    served_by = Q(provider=provider)
+    if provider == ALZAJIL:
+        # الحركات الأقدم من حفظ المزود كلها عبر الزاجل
+        served_by |= Q(provider__isnull=True)
+    return list(
+        Transaction.objects
+        .filter(served_by, transaction_type='WITHDRAW', id__gt=after_id, created_at__lte=cutoff)
+        .order_by('id')
+        .values('id', 'reference_number', 'amount', 'created_at')[:limit]
+    )
+
+
+def provider_client(provider):
+    """عميل الاستعلام (check_transaction_status) لمزود من RECHARGE_PROVIDERS"""
+    if provider == ALZAJIL:
+        return AlzajilClient()
+    from .router import get_router
+    client = get_router().get_provider(provider)
+    if client is None:
+        raise ValueError(f'مزود غير معروف: {provider}')
+    return client
+
+
+def reconcile(provider=PROVIDER, client=None, concurrency=None, settle_minutes=None, max_rows=5000):
+    """تشغيل واحد للمطابقة لمزود واحد. تُرجع إحصائيات التشغيل"""
+    client = client or provider_client(provider)
+    concurrency = min(
+        concurrency or getattr(settings, 'RECONCILIATION_CONCURRENCY', 4),
+        getattr(settings, 'ALZAJIL_MAX_CONCURRENT', 10)
+    )
+    if settle_minutes is None:
+        settle_minutes = getattr(settings, 'RECONCILIATION_SETTLE_MINUTES', 10)
+
+    checkpoint, _ = ReconciliationCheckpoint.objects.get_or_create(provider=provider)
+    rows = pending_transactions(
+        provider, checkpoint.last_transaction_id, timezone.now() - timedelta(minutes=settle_minutes), max_rows
+    )
+
+    days = OrderedDict()
+    for row in rows:
+        days.setdefault(timezone.localdate(row['created_at']), []).append(row)
+
+    stats = {'days': 0, 'checked': 0, 'issues': 0, 'stopped': False}
+    with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as pool:
+        for day, txns in days.items():
+            to_check = [t for t in txns if (t['reference_number'] or '') not in MISSING_REFS]
+            responses = dict(zip(
+                [t['id'] for t in to_check],
+                pool.map(lambda t: _check(client, t['reference_number']), to_check)
+            ))
+
+            issues = []
+            last_done = checkpoint.last_transaction_id
+            for txn in txns:
+                response = responses.get(txn['id'])
+                if response is None:
+                    issue_type, provider_amount = 'MISSING_REF', None
+                elif _is_inconclusive(response):
+                    stats['stopped'] = True
+                    break
+                else:
+                    issue_type, provider_amount = classify(txn, response)
+                    stats['checked'] += 1
+                if issue_type:
+                    issues.append(ReconciliationIssue(
+                        transaction_id=txn['id'],
+                        transaction_created_at=txn['created_at'],
+                        reference_number=txn['reference_number'] or '',
+                        day=day,
+                        issue_type=issue_type,
+                        local_amount=txn['amount'],
+                        provider_amount=provider_amount,
+                        provider_response=response or {},
+                    ))
+                last_done = txn['id']
+
+            with transaction.atomic():
+                ReconciliationIssue.objects.bulk_create(issues, ignore_conflicts=True)
+                checkpoint.last_transaction_id = last_done
+                checkpoint.save(update_fields=['last_transaction_id', 'updated_at'])
+            stats['issues'] += len(issues)
+            stats['days'] += 1
+            if stats['stopped']:
+                print(f"⚠️ Reconciliation ({provider}) stopped at {day}: provider unavailable")
+                break
+
+    return stats
@@ -0,0 +1,58 @@
+"""
+تسجيل جلسات حقيقية مع الزاجل لإعادة تشغيلها في الخادم التجريبي (stub_server --replay).
+
+عند ضبط ALZAJIL_RECORD_PATH يكتب AlzajilClient كل طلب واستجابته كسطر JSON:
+    {"method", "params", "body", "status", "content", "elapsed"}
+مع إخفاء usr و tkn. الملف يُقرأ بـ load() ويُستخدم كمصدر للاستجابات وزمنها.
+"""
+import json
+import threading
+import time
+
+from django.conf import settings
+
+SECRET_KEYS = frozenset(('usr', 'tkn', 'USR', 'TKN'))
+
+_lock = threading.Lock()
+
+
+def _masked(data):
+    return {k: ('***' if k in SECRET_KEYS else v) for k, v in (data or {}).items()}
+
+
+def record_path():
+    return getattr(settings, 'ALZAJIL_RECORD_PATH', None)
+
+
+def record(method, params, body, status_code, content, elapsed):
+    """إضافة طلب واستجابته إلى ملف التسجيل (لا شيء إذا لم يُضبط ALZAJIL_RECORD_PATH)"""
+    path = record_path()
+    if not path:
+        return
+    line = json.dumps({
+        'method': method.upper(),
+        'params': _masked(params),
+        'body': _masked(body),
+        'status': status_code,
+        'content': content.decode('utf-8', errors='replace') if isinstance(content, bytes) else content,
+        'elapsed': round(elapsed, 4),
+        'recorded_at': time.time(),
+    }, ensure_ascii=False, default=str)
+    with _lock:
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+
+
+def load(path):
+    """قراءة ملف تسجيل: قائمة السجلات بالترتيب"""
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def action_code(entry):
+    """AC الطلب المسجل (من المعاملات في GET أو الجسم في POST)"""
+    for source in (entry.get('params') or {}, entry.get('body') or {}):
+        for key in ('AC', 'ac'):
+            if source.get(key) not in (None, ''):
+                return int(source[key])
+    return None
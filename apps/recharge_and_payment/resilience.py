@@ -0,0 +1,186 @@
+"""
+قاطع الدائرة (Circuit Breaker) وحاجز التزامن (Bulkhead) حول مزود الزاجل.
+
+- CLOSED: الطلبات تمر، ويتم تتبع نسبة الأخطاء والطلبات البطيئة في نافذة زمنية متحركة.
+- OPEN: عند تجاوز النسبة يتم رفض الطلبات فوراً (RC_CIRCUIT_OPEN) لمدة ALZAJIL_BREAKER_OPEN_SECONDS.
+- HALF_OPEN: بعد انتهاء المدة يُسمح بعدد محدود من الطلبات التجريبية؛ نجاحها يغلق الدائرة وفشل أي منها يعيد فتحها.
+
+الـ Bulkhead يحد عدد طلبات المزود المتزامنة داخل العامل حتى لا تستهلك كل خيوط gunicorn،
+والطلب الزائد يُرفض بعد انتظار قصير (RC_BULKHEAD_FULL).
+الحالة لكل عملية (process)، وهذا كافٍ لأن الهدف حماية عمال هذه العملية.
+"""
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+CLOSED = 'CLOSED'
+OPEN = 'OPEN'
+HALF_OPEN = 'HALF_OPEN'
+
+# رموز الرفض السريع (مختلفة عن -100 خطأ الاتصال و -1 الاستجابة غير الصالحة)
+RC_CIRCUIT_OPEN = -101
+RC_BULKHEAD_FULL = -102
+RC_AGENT_BALANCE_LOW = -103  # رصيد الوكيل المخزن لا يغطي العملية (agent_balance)
+RC_NEEDS_RECONCILIATION = -104  # السداد تم لدى المزود وتعذر تسجيله محلياً (PaymentView)
+FAST_FAIL_CODES = (RC_CIRCUIT_OPEN, RC_BULKHEAD_FULL, RC_AGENT_BALANCE_LOW)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class CircuitBreaker:
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = deque()  # (timestamp, failed, slow)
+        self.state = CLOSED
+        self.opened_at = None
+        self._probes = 0
+        self._probe_successes = 0
+        self.counters = {'calls': 0, 'failures': 0, 'slow': 0, 'rejected': 0, 'opened': 0}
+
+        max_concurrent = _setting('ALZAJIL_MAX_CONCURRENT', 10)
+        self._bulkhead = threading.BoundedSemaphore(max_concurrent)
+        self.max_concurrent = max_concurrent
+        self.in_flight = 0
+        self.bulkhead_rejected = 0
+
+    def _trim(self, now):
+        window = _setting('ALZAJIL_BREAKER_WINDOW_SECONDS', 60)
+        while self._calls and now - self._calls[0][0] > window:
+            self._calls.popleft()
+
+    def _open(self, now):
+        self.state = OPEN
+        self.opened_at = now
+        self.counters['opened'] += 1
+        self._calls.clear()
+        print(f"⚠️ Circuit '{self.name}' OPEN")
+
+    def allow(self):
+        """هل يُسمح بتمرير طلب الآن؟ (ينقل OPEN إلى HALF_OPEN عند انتهاء المدة)"""
+        now = time.monotonic()
+        with self._lock:
+            if self.state == OPEN:
+                if now - self.opened_at < _setting('ALZAJIL_BREAKER_OPEN_SECONDS', 30):
+                    self.counters['rejected'] += 1
+                    return False
+                self.state = HALF_OPEN
+                self._probes = 0
+                self._probe_successes = 0
+            if self.state == HALF_OPEN:
+                if self._probes >= _setting('ALZAJIL_BREAKER_HALF_OPEN_CALLS', 2):
+                    self.counters['rejected'] += 1
+                    return False
+                self._probes += 1
+            return True
+
+    def record(self, failed, latency):
+        now = time.monotonic()
+        slow = latency >= _setting('ALZAJIL_SLOW_CALL_SECONDS', 10)
+        with self._lock:
+            self.counters['calls'] += 1
+            self.counters['failures'] += int(failed)
+            self.counters['slow'] += int(slow)
+
+            if self.state == HALF_OPEN:
+                if failed or slow:
+                    self._open(now)
+                else:
+                    self._probe_successes += 1
+                    if self._probe_successes >= _setting('ALZAJIL_BREAKER_HALF_OPEN_CALLS', 2):
+                        self.state = CLOSED
+                        self._calls.clear()
+                        print(f"✅ Circuit '{self.name}' CLOSED")
+                return
+
+            if self.state == OPEN:
+                # طلب بدأ قبل فتح الدائرة وانتهى بعده
+                return
+
+            self._calls.append((now, failed, slow))
+            self._trim(now)
+            total = len(self._calls)
+            if total < _setting('ALZAJIL_BREAKER_MIN_CALLS', 10):
+                return
+            failure_rate = sum(1 for c in self._calls if c[1]) / total
+            slow_rate = sum(1 for c in self._calls if c[2]) / total
+            if (failure_rate >= _setting('ALZAJIL_BREAKER_FAILURE_RATE', 0.5)
+                    or slow_rate >= _setting('ALZAJIL_BREAKER_SLOW_RATE', 0.5)):
+                self._open(now)
+
+    def acquire_slot(self):
+        if not self._bulkhead.acquire(timeout=_setting('ALZAJIL_BULKHEAD_WAIT_SECONDS', 0.5)):
+            with self._lock:
+                self.bulkhead_rejected += 1
+            return False
+        with self._lock:
+            self.in_flight += 1
+        return True
+
+    def release_slot(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._bulkhead.release()
+
+    def call(self, func, is_failure):
+        """
+        تنفيذ func عبر الـ Bulkhead والقاطع. is_failure(result) تحدد هل النتيجة فشل في المزود
+        (خطأ اتصال/خادم) وليس رفضاً تجارياً (رصيد، رقم خاطئ...).
+        """
+        if not self.allow():
+            return {'RC': RC_CIRCUIT_OPEN, 'MSG': 'خدمة المزود غير متاحة مؤقتاً، يرجى المحاولة لاحقاً'}
+        if not self.acquire_slot():
+            if self.state == HALF_OPEN:
+                # لم يُنفذ الطلب التجريبي، فلا يُحسب
+                with self._lock:
+                    self._probes -= 1
+            return {'RC': RC_BULKHEAD_FULL, 'MSG': 'المزود مشغول حالياً، يرجى المحاولة بعد قليل'}
+
+        started = time.monotonic()
+        try:
+            result = func()
+        except Exception:
+            self.record(True, time.monotonic() - started)
+            raise
+        finally:
+            self.release_slot()
+        self.record(is_failure(result), time.monotonic() - started)
+        return result
+
+    def snapshot(self):
+        now = time.monotonic()
+        with self._lock:
+            self._trim(now)
+            total = len(self._calls)
+            return {
+                'name': self.name,
+                'state': self.state,
+                'open_for_seconds': round(now - self.opened_at, 1) if self.state == OPEN else 0,
+                'window_calls': total,
+                'window_failure_rate': round(sum(1 for c in self._calls if c[1]) / total, 3) if total else 0,
+                'window_slow_rate': round(sum(1 for c in self._calls if c[2]) / total, 3) if total else 0,
+                'in_flight': self.in_flight,
+                'max_concurrent': self.max_concurrent,
+                'bulkhead_rejected': self.bulkhead_rejected,
+                **self.counters,
+            }
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name='alzajil'):
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+
+def reset_breakers():
+    with _breakers_lock:
+        _breakers.clear()
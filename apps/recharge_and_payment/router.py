@@ -0,0 +1,223 @@
+"""
+موجه طلبات السداد بين المزودين (providers.py).
+
+لكل رمز خدمة (SC) تُرتب المزودات الداعمة لها حسب:
+- الصحة: المزود ذو الدائرة المفتوحة يُستبعد، ونصف المفتوحة تُضاف لها عقوبة.
+- الزمن: p95 لآخر RECHARGE_LATENCY_WINDOW طلب (أو RECHARGE_DEFAULT_LATENCY_MS قبل توفر عينات كافية).
+- الكلفة: cost * RECHARGE_COST_WEIGHT_MS.
+
+عمليات السداد لا تُكرر: تُرسل لمزود واحد، ويُنتقل للتالي فقط إذا لم يُرسل الطلب أصلاً
+(الدائرة مفتوحة أو المزود مشغول). استعلامات القراءة (رصيد المشترك، قوائم العروض) تُرسل
+للأفضل، وإذا لم تكتمل خلال RECHARGE_HEDGE_AFTER_MS (أو فشلت) تُرسل نسخة للمزود الثاني
+وتُعاد أول استجابة صالحة (Hedged Request).
+
+رصيد الوكيل وحالة العملية خاصة بمزود بعينه: تذهب للمزود الافتراضي (الأول) أو المحدد.
+الإحصائيات لكل عملية (process) مثل قاطع الدائرة.
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+
+from .codec import AlzajilResponse
+from .providers import load_providers
+from .resilience import HALF_OPEN, OPEN, RC_BULKHEAD_FULL, RC_CIRCUIT_OPEN, get_breaker
+from .services import is_provider_failure
+
+# 4005 القائمة، 4006 القائمة مع الرصيد، 4007 استعلام؛ باقي 4002-4004 إجراءات على المشترك
+READ_OFFER_CODES = (4005, 4006, 4007)
+NOT_SENT_CODES = (RC_CIRCUIT_OPEN, RC_BULKHEAD_FULL)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _not_sent(result):
+    return isinstance(result, dict) and result.get('RC') in NOT_SENT_CODES
+
+
+def _usable(result):
+    """استجابة نهائية من المزود (نجاح أو رفض تجاري) وليست فشلاً أو رفضاً سريعاً"""
+    return isinstance(result, dict) and not _not_sent(result) and not is_provider_failure(result)
+
+
+def served_by(response):
+    """اسم المزود الذي أعاد الاستجابة عبر الموجه (None إذا لم تمر به)"""
+    return getattr(response, 'provider', None)
+
+
+class LatencyTracker:
+    """أزمنة آخر N طلب لمزود"""
+
+    def __init__(self, size):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p, min_samples=None):
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples or len(samples) < (min_samples or _setting('RECHARGE_LATENCY_MIN_SAMPLES', 20)):
+            return None
+        return samples[min(int(len(samples) * p / 100), len(samples) - 1)]
+
+    def __len__(self):
+        return len(self._samples)
+
+
+class Router:
+    def __init__(self, providers=None):
+        self.providers = providers if providers is not None else load_providers()
+        window = _setting('RECHARGE_LATENCY_WINDOW', 200)
+        self.latency = {p.name: LatencyTracker(window) for p in self.providers}
+        self.counters = {'hedged': 0, 'hedge_wins': 0, 'failovers': 0}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(
+            max_workers=_setting('RECHARGE_HEDGE_WORKERS', 16), thread_name_prefix='recharge-hedge'
+        )
+
+    @property
+    def default(self):
+        return self.providers[0]
+
+    def get_provider(self, name):
+        return next((p for p in self.providers if p.name == name), None)
+
+    def _count(self, key):
+        with self._lock:
+            self.counters[key] += 1
+
+    def health(self, provider):
+        return get_breaker(provider.breaker_name).state
+
+    def score(self, provider):
+        """كلما قل كان أفضل (بالمللي ثانية)"""
+        p95 = self.latency[provider.name].percentile(95)
+        latency_ms = p95 * 1000 if p95 is not None else _setting('RECHARGE_DEFAULT_LATENCY_MS', 1000)
+        penalty = _setting('RECHARGE_HALF_OPEN_PENALTY_MS', 5000) if self.health(provider) == HALF_OPEN else 0
+        return latency_ms + provider.cost * _setting('RECHARGE_COST_WEIGHT_MS', 100) + penalty
+
+    def rank(self, service_code=None):
+        """المزودات الداعمة للخدمة من الأفضل للأسوأ"""
+        candidates = [p for p in self.providers if p.supports(service_code)]
+        available = [p for p in candidates if self.health(p) != OPEN]
+        # كل الدوائر مفتوحة: المحاولة على أي حال (القاطع يرفض فوراً أو يسمح بطلب تجريبي)
+        return sorted(available or candidates, key=self.score)
+
+    def _timed(self, provider, method, args, kwargs):
+        started = time.monotonic()
+        try:
+            result = getattr(provider, method)(*args, **kwargs)
+        except Exception as e:
+            print(f"❌ Provider {provider.name}.{method}: {e}")
+            result = {'RC': -100, 'MSG': f'خطأ: {e}'}
+        if not _not_sent(result):
+            self.latency[provider.name].add(time.monotonic() - started)
+        if isinstance(result, dict):
+            if not isinstance(result, AlzajilResponse):
+                result = AlzajilResponse(result)
+            result.provider = provider.name
+        return result
+
+    def call(self, method, service_code, *args, hedge=False, **kwargs):
+        ranked = self.rank(service_code)
+        if not ranked:
+            return {'RC': -1, 'MSG': f'لا يوجد مزود يدعم الخدمة {service_code}'}
+        if hedge and len(ranked) > 1:
+            return self._hedged(ranked[0], ranked[1], method, args, kwargs)
+
+        result = None
+        for index, provider in enumerate(ranked):
+            result = self._timed(provider, method, args, kwargs)
+            if not _not_sent(result):
+                return result
+            # الطلب لم يُرسل أصلاً، فالانتقال للمزود التالي آمن حتى لعمليات السداد
+            if index + 1 < len(ranked):
+                self._count('failovers')
+        return result
+
+    def _hedged(self, primary, secondary, method, args, kwargs):
+        futures = {self._pool.submit(self._timed, primary, method, args, kwargs): primary}
+        done, _ = wait(futures, timeout=_setting('RECHARGE_HEDGE_AFTER_MS', 800) / 1000)
+        fallback = None
+        if done:
+            fallback = next(iter(done)).result()
+            if _usable(fallback):
+                return fallback
+
+        self._count('hedged')
+        futures[self._pool.submit(self._timed, secondary, method, args, kwargs)] = secondary
+        pending = {f for f in futures if f not in done}
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                result = future.result()
+                if _usable(result):
+                    if futures[future] is secondary:
+                        self._count('hedge_wins')
+                    return result
+                fallback = fallback or result
+        return fallback
+
+    # نفس واجهة AlzajilClient حتى تستخدمه الـ Views بدلاً منه
+
+    def send_payment(self, data):
+        return self.call('send_payment', data.get('SC'), data)
+
+    def query_subscriber_balance(self, service_code, subscriber_no, action_code=4001):
+        return self.call('query_subscriber_balance', service_code, service_code, subscriber_no,
+                         action_code=action_code, hedge=True)
+
+    def manage_offers(self, action_code, service_code, subscriber_no, offer_id=None):
+        return self.call('manage_offers', service_code, action_code, service_code, subscriber_no,
+                         offer_id=offer_id, hedge=action_code in READ_OFFER_CODES)
+
+    def query_agent_balance(self, provider=None):
+        return self._timed(self.get_provider(provider) or self.default, 'query_agent_balance', (), {})
+
+    def check_transaction_status(self, trans_ref, provider=None):
+        return self._timed(self.get_provider(provider) or self.default, 'check_transaction_status', (trans_ref,), {})
+
+    def snapshot(self):
+        providers = []
+        for provider in self.providers:
+            tracker = self.latency[provider.name]
+            p50, p95, p99 = (tracker.percentile(p, min_samples=1) for p in (50, 95, 99))
+            providers.append({
+                'name': provider.name,
+                'health': self.health(provider),
+                'cost': provider.cost,
+                'samples': len(tracker),
+                'p50_ms': round(p50 * 1000, 1) if p50 is not None else None,
+                'p95_ms': round(p95 * 1000, 1) if p95 is not None else None,
+                'p99_ms': round(p99 * 1000, 1) if p99 is not None else None,
+                'score': round(self.score(provider), 1),
+            })
+        with self._lock:
+            return {'providers': providers, **self.counters}
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_router():
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = Router()
+        return _router
+
+
+def reset_router():
+    global _router
+    with _router_lock:
+        if _router is not None:
+            _router._pool.shutdown(wait=False)
+        _router = None
@@ -49,3 +49,17 @@ class TransactionStatusSerializer(BaseAlzajilSerializer):
     لرمز الإجراء AC 1003 (حالة المعاملة)
     """
     REF = serializers.CharField(max_length=100, help_text="مرجع المعاملة من الطلب السابق")
+
+class OfferCatalogSerializer(BaseAlzajilSerializer):
+    """
+    تصفح كتالوج العروض المحلي (بدون استعلام من المزود)
+    """
+    SC = serializers.IntegerField(help_text="رمز الخدمة")
+    min_price = serializers.DecimalField(max_digits=12, decimal_places=2, required=False)
+    max_price = serializers.DecimalField(max_digits=12, decimal_places=2, required=False)
+    min_validity = serializers.IntegerField(min_value=0, required=False, help_text="أقل صلاحية بالأيام")
+    max_validity = serializers.IntegerField(min_value=0, required=False, help_text="أعلى صلاحية بالأيام")
+    q = serializers.CharField(max_length=100, required=False, help_text="بحث في اسم العرض")
+    ordering = serializers.ChoiceField(
+        choices=['price', '-price', 'validity_days', '-validity_days', 'name'], default='price', required=False
+    )
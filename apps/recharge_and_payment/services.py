@@ -1,12 +1,53 @@
+import threading
+import time
 import requests
 import json
 from django.conf import settings
+from requests.adapters import HTTPAdapter
+from .resilience import get_breaker
+from . import codec, recorder
+
+
+def is_provider_failure(response_data):
+    """
+    هل الاستجابة فشل في المزود نفسه (اتصال، مهلة، خطأ خادم)؟
+    رفض العملية من المزود (RC موجب مثل رصيد غير كافٍ) ليس فشلاً في الخدمة.
+    """
+    rc = response_data.get('RC') if isinstance(response_data, dict) else None
+    try:
+        rc = int(rc)
+    except (TypeError, ValueError):
+        return False
+    return rc in (-100, -1) or rc >= 500
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """
+    جلسة HTTP مشتركة في العملية: اتصالات TLS تُعاد استخدامها بين الطلبات والخيوط (المطابقة،
+    الطلبات المتحوطة) بدلاً من اتصال جديد لكل طلب. حجم المجمع لكل مضيف = حد الـ Bulkhead
+    (ALZAJIL_MAX_CONCURRENT) فلا ينتظر طلب مسموح به اتصالاً ولا يُفتح اتصال يُغلق بعده.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            size = getattr(settings, 'ALZAJIL_MAX_CONCURRENT', 10)
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=size)
+            session = requests.Session()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _session = session
+        return _session
+
 
 class AlzajilClient:
     """
     عميل للتفاعل مع واجهة برمجة تطبيقات الزاجل (Alzajil Utility Payment Service).
     بناءً على وثائق 'alzajil (Utility Payment Service) v1.12'.
     """
+    breaker_name = 'alzajil'
 
     def __init__(self):
         # الإعدادات الأساسية والروابط
@@ -30,6 +71,16 @@ class AlzajilClient:
         return self.agent_user_id, self.security_token
 
     def _send_request(self, params, method='GET', body=None, use_report=False):
+        """
+        إرسال الطلب عبر قاطع الدائرة والـ Bulkhead: عند تعطل المزود يتم الرفض فوراً
+        برمز RC مميز بدلاً من انتظار المهلة كاملة.
+        """
+        return get_breaker(self.breaker_name).call(
+            lambda: self._send_request_direct(params, method=method, body=body, use_report=use_report),
+            is_provider_failure
+        )
+
+    def _send_request_direct(self, params, method='GET', body=None, use_report=False):
         """
         دالة مساعدة لإرسال الطلبات إلى API.
         """
@@ -38,78 +89,49 @@ class AlzajilClient:
 
         usr, tkn = self._get_credentials(use_report=use_report)
 
-        # تجهيز الجسم (Body) إذا لم يكن موجوداً
-        if body is None:
-            body = {}
-        
-        # تحويل كافة مفاتيح الجسم إلى Lowercase لضمان التوافق مع توجيهات المستخدم
-        # وكتحسين إضافي: تحويل جميع القيم إلى نصوص (Strings) مع مراعاة الأعداد الصحيحة
-        final_body = {}
-        for k, v in body.items():
-            val = v
-            if isinstance(v, float) and v.is_integer():
-                val = int(v)
-            final_body[k.lower()] = str(val)
-        
-        # إضافة المعاملات المشتركة بحروف صغيرة
-        if usr:
-            if method.upper() == 'POST':
-                if 'usr' not in final_body: final_body['usr'] = usr
-            else:
-                if 'usr' not in params: params['usr'] = usr
-        if tkn:
-            if method.upper() == 'POST':
-                if 'tkn' not in final_body: final_body['tkn'] = tkn
-            else:
-                if 'tkn' not in params: params['tkn'] = tkn
+        is_post = method.upper() == 'POST'
+        # جسم POST بمفاتيح صغيرة وقيم نصية (codec.encode_body)؛ في GET تُضاف usr/tkn إلى المعاملات
+        final_body = codec.encode_body(body, usr, tkn) if is_post else {}
+        if not is_post:
+            if usr and 'usr' not in params: params['usr'] = usr
+            if tkn and 'tkn' not in params: params['tkn'] = tkn
 
+        # (مهلة الاتصال، مهلة القراءة): الاتصال الفاشل يُكتشف بسرعة دون انتظار مهلة القراءة
+        timeout = getattr(settings, 'ALZAJIL_TIMEOUT', (5, 30))
+        started = time.monotonic()
         try:
-            if method.upper() == 'POST':
-                response = requests.post(url, json=final_body, params=params, verify=False, timeout=30)
+            if is_post:
+                response = get_session().post(url, json=final_body, params=params, verify=False, timeout=timeout)
             else:
-                response = requests.get(url, params=params, verify=False, timeout=30)
-            
-            # محاولة قراءة الاستجابة حتى لو كان الـ status code غير ناجح
-            try:
-                response_json = response.json()
-                # Alzajil servers might return keys in varying cases.
-                # Normalize typical keys to uppercase for consistency with Flutter UI.
-                if isinstance(response_json, dict):
-                    normalized = {}
-                    for k, v in response_json.items():
-                        key_lower = k.lower()
-                        # List of typical keys to normalize to Uppercase
-                        if key_lower in ['rc', 'msg', 'sd', 'bal', 'mt', 'loan', 'bill', 'ref', 'credit', 'bill_balance',
-                                         'adamt', 'offer_id', 'offer_name', 'effdate', 'expdate', 'packages', 'list', 'name']:
-                            normalized[key_lower.upper()] = v
-                        else:
-                            normalized[k] = v
-                    return normalized
-                return response_json
-            except Exception as e:
-                print(f"DEBUG: JSON Process Error: {e}")
-                
-                # Mask Token for display
-                debug_body = final_body.copy()
-                if 'tkn' in debug_body: debug_body['tkn'] = '***'
-                
-                # Use json.dumps to show valid JSON (double quotes) to the user
-                debug_json_str = json.dumps(debug_body, ensure_ascii=False)
-
-                return {
-                    'RC': response.status_code,
-                    'MSG': f'استجابة غير معالجة. الرابط: {url} | البيانات: {debug_json_str} | الخطأ: {response.text[:100]}'
-                }
+                response = get_session().get(url, params=params, verify=False, timeout=timeout)
         except requests.exceptions.RequestException as e:
             # معالجة أخطاء الاتصال
             return {
                 'RC': -100, # استخدام -100 كرمز خطأ عام للخدمة
                 'MSG': f'خطأ في الاتصال: {str(e)}'
             }
-        except json.JSONDecodeError:
-             return {
-                'RC': -1,
-                'MSG': 'استجابة JSON غير صالحة من المزود'
+
+        if recorder.record_path():
+            # تسجيل الجلسة لإعادة تشغيلها في الخادم التجريبي (recorder.py)
+            recorder.record(method, params, final_body, response.status_code, response.content, time.monotonic() - started)
+
+        # محاولة قراءة الاستجابة حتى لو كان الـ status code غير ناجح
+        # المفاتيح الشائعة تُوحد إلى الأحرف الكبيرة (توافق تطبيق Flutter) - انظر codec.py
+        try:
+            return codec.decode(response.content)
+        except ValueError as e:
+            print(f"DEBUG: JSON Process Error: {e}")
+
+            # Mask Token for display
+            debug_body = dict(final_body)
+            if 'tkn' in debug_body: debug_body['tkn'] = '***'
+
+            # Use json.dumps to show valid JSON (double quotes) to the user
+            debug_json_str = json.dumps(debug_body, ensure_ascii=False)
+
+            return {
+                'RC': response.status_code,
+                'MSG': f'استجابة غير معالجة. الرابط: {url} | البيانات: {debug_json_str} | الخطأ: {response.text[:100]}'
             }
 
     def send_payment(self, data):
@@ -0,0 +1,265 @@
+"""
+خادم الزاجل التجريبي لاختبارات الأداء بدون الاتصال بـ alzajilonline.com.
+
+يطبق رموز الإجراء التي يستخدمها AlzajilClient على أي مسار:
+    7100/7200/7600/7700 سداد وشراء عروض (يُخصم من رصيد الوكيل ويُحفظ المرجع)
+    7400 رصيد الوكيل، 4001 رصيد المشترك، 4002-4007 العروض، 1003 حالة عملية سابقة
+مع زمن استجابة من توزيع قابل للضبط، ونسبة أخطاء خادم (HTTP 500) وانقطاع اتصال،
+ورموز RC موزونة لكل AC. أو يعيد تشغيل جلسة مسجلة (recorder.py) بنفس الاستجابات وزمنها.
+
+    python manage.py alzajil_stub --port 8765 --latency lognormal:0.3:0.5 --rc 7100=0:0.95,51:0.05
+    ALZAJIL_PAYMENT_URL = ALZAJIL_REPORT_URL = 'http://127.0.0.1:8765/api/tp/v1'
+"""
+import json
+import math
+import random
+import threading
+import time
+from collections import defaultdict
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qsl
+
+from . import recorder
+
+PAYMENT_CODES = (7100, 7200, 7600, 7700)
+OFFER_LIST_CODES = (4005, 4006)
+
+# نفس أسماء الحقول التي يقرؤها offer_catalog.parse_offers (بالأحرف الصغيرة كما يرسلها المزود)
+STUB_OFFERS = [
+    {'sac': '101', 'name': 'باقة يومية', 'price': '150', 'validity': '1'},
+    {'sac': '102', 'name': 'باقة أسبوعية', 'price': '900', 'validity': '7'},
+    {'sac': '103', 'name': 'باقة شهرية', 'price': '2500', 'validity': '30'},
+]
+
+
+def parse_latency(spec):
+    """
+    توزيع الزمن (بالثواني) كدالة rng -> seconds:
+    fixed:S | uniform:MIN:MAX | exp:MEAN | lognormal:MEDIAN:SIGMA
+    """
+    name, *args = str(spec).split(':')
+    args = [float(a) for a in args]
+    if name == 'fixed':
+        return lambda rng: args[0]
+    if name == 'uniform':
+        return lambda rng: rng.uniform(args[0], args[1])
+    if name == 'exp':
+        return lambda rng: rng.expovariate(1 / args[0]) if args[0] > 0 else 0.0
+    if name == 'lognormal':
+        mu = math.log(args[0]) if args[0] > 0 else 0.0
+        return lambda rng: rng.lognormvariate(mu, args[1])
+    raise ValueError(f'توزيع زمن غير معروف: {spec}')
+
+
+def parse_rc(spec):
+    """'0:0.95,51:0.05' -> [(0, 0.95), (51, 0.05)]"""
+    weights = []
+    for part in str(spec).split(','):
+        rc, _, weight = part.partition(':')
+        weights.append((int(rc), float(weight or 1)))
+    return weights
+
+
+def _per_ac(values, parser):
+    """['lognormal:0.2:0.5', '7100=fixed:1'] -> {'*': ..., 7100: ...}"""
+    parsed = {}
+    for value in values or []:
+        ac, sep, spec = str(value).partition('=')
+        if sep and ac.strip().isdigit():
+            parsed[int(ac)] = parser(spec)
+        else:
+            parsed['*'] = parser(value)
+    return parsed
+
+
+class StubConfig:
+    def __init__(self, latency=None, rc=None, error_rate=0.0, drop_rate=0.0,
+                 agent_balance='1000000', seed=None, replay=None):
+        self.latency = _per_ac(latency, parse_latency)
+        self.rc = _per_ac(rc, parse_rc)
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.agent_balance = Decimal(str(agent_balance))
+        self.seed = seed
+        self.replay = replay
+
+    def for_ac(self, table, ac):
+        return table.get(ac, table.get('*'))
+
+
+class StubState:
+    """حالة الخادم: رصيد الوكيل والعمليات المنفذة (لاستعلامات 1003)"""
+
+    def __init__(self, config):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.lock = threading.Lock()
+        self.agent_balance = config.agent_balance
+        self.transactions = {}
+        self.sequence = 0
+        self.counters = defaultdict(int)
+        self.replay = self._load_replay(config.replay) if config.replay else None
+
+    def _load_replay(self, path):
+        by_key, by_ac = defaultdict(list), defaultdict(list)
+        for entry in recorder.load(path):
+            ac = recorder.action_code(entry)
+            by_key[self.replay_key(ac, {**(entry.get('params') or {}), **(entry.get('body') or {})})].append(entry)
+            by_ac[ac].append(entry)
+        return {'key': by_key, 'ac': by_ac, 'cursor': defaultdict(int)}
+
+    @staticmethod
+    def replay_key(ac, request):
+        lower = {str(k).lower(): str(v) for k, v in request.items()}
+        return (ac, lower.get('sc', ''), lower.get('sno', ''), lower.get('sac', ''), lower.get('ref', ''))
+
+    def next_replay(self, ac, request):
+        """الاستجابة المسجلة المطابقة للطلب (أو التالية لنفس AC) بالتناوب"""
+        key = self.replay_key(ac, request)
+        entries = self.replay['key'].get(key) or self.replay['ac'].get(ac)
+        if not entries:
+            return None
+        with self.lock:
+            cursor_key = key if self.replay['key'].get(key) else ac
+            index = self.replay['cursor'][cursor_key] % len(entries)
+            self.replay['cursor'][cursor_key] += 1
+        return entries[index]
+
+    def random(self):
+        with self.lock:
+            return self.rng.random()
+
+    def latency(self, ac):
+        distribution = self.config.for_ac(self.config.latency, ac)
+        if distribution is None:
+            return 0.0
+        with self.lock:
+            return max(distribution(self.rng), 0.0)
+
+    def pick_rc(self, ac):
+        weights = self.config.for_ac(self.config.rc, ac)
+        if not weights:
+            return 0
+        with self.lock:
+            return self.rng.choices([rc for rc, _ in weights], [w for _, w in weights])[0]
+
+    def respond(self, ac, request):
+        """استجابة AC (قاموس بمفاتيح صغيرة كما يرسلها المزود)"""
+        if ac is None:
+            return {'rc': -1, 'msg': 'رمز الإجراء (AC) مطلوب'}
+        lower = {str(k).lower(): v for k, v in request.items()}
+        rc = self.pick_rc(ac)
+        if rc != 0:
+            return {'rc': rc, 'msg': f'رفض تجريبي ({rc})'}
+
+        if ac in PAYMENT_CODES:
+            amount = Decimal(str(lower.get('amt') or 0))
+            with self.lock:
+                if amount > self.agent_balance:
+                    return {'rc': 51, 'msg': 'رصيد الوكيل غير كافٍ'}
+                self.agent_balance -= amount
+                self.sequence += 1
+                ref = f'STUB{self.sequence:08d}'
+                self.transactions[ref] = {'amt': str(amount), 'sc': lower.get('sc'), 'sno': lower.get('sno')}
+                balance = self.agent_balance
+            return {'rc': 0, 'msg': 'تمت العملية بنجاح', 'ref': ref, 'bal': str(balance)}
+        if ac == 7400:
+            with self.lock:
+                return {'rc': 0, 'msg': 'رصيد الوكيل', 'bal': str(self.agent_balance)}
+        if ac == 4001:
+            sno = str(lower.get('sno') or '0')
+            return {'rc': 0, 'msg': 'رصيد المشترك', 'sno': sno, 'bal': str(int(sno[-4:] or 0) % 5000), 'mt': 0}
+        if ac in OFFER_LIST_CODES:
+            response = {'rc': 0, 'msg': 'قائمة العروض', 'packages': STUB_OFFERS}
+            if ac == 4006:
+                response['bal'] = '0'
+            return response
+        if 4002 <= ac <= 4007:
+            offer = next((o for o in STUB_OFFERS if o['sac'] == str(lower.get('sac'))), STUB_OFFERS[0])
+            return {'rc': 0, 'msg': 'تم', 'offer_id': offer['sac'], 'offer_name': offer['name']}
+        if ac == 1003:
+            with self.lock:
+                txn = self.transactions.get(str(lower.get('ref')))
+            if txn is None:
+                return {'rc': 12, 'msg': 'العملية غير موجودة'}
+            return {'rc': 0, 'msg': 'ناجحة', 'ref': lower.get('ref'), 'amt': txn['amt']}
+        return {'rc': -1, 'msg': f'رمز إجراء غير مدعوم: {ac}'}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    verbose = False
+
+    def log_message(self, format, *args):
+        if self.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        self._handle({})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            body = {}
+        self._handle(body if isinstance(body, dict) else {})
+
+    def _handle(self, body):
+        state = self.server.state
+        request = {**dict(parse_qsl(urlsplit(self.path).query)), **body}
+        try:
+            ac = int(next(v for k, v in request.items() if k.lower() == 'ac'))
+        except (StopIteration, TypeError, ValueError):
+            ac = None
+        with state.lock:
+            state.counters[ac] += 1
+
+        if state.replay is not None:
+            entry = state.next_replay(ac, request)
+            if entry is None:
+                return self._send(404, json.dumps({'rc': -1, 'msg': 'لا يوجد تسجيل لهذا الطلب'}).encode())
+            delay = state.latency(ac) if state.config.latency else entry.get('elapsed', 0)
+            time.sleep(delay)
+            return self._send(entry.get('status', 200), (entry.get('content') or '').encode())
+
+        time.sleep(state.latency(ac))
+        roll = state.random()
+        if roll < state.config.drop_rate:
+            # انقطاع الاتصال بدون استجابة (ConnectionError عند العميل)
+            self.close_connection = True
+            return
+        if roll < state.config.drop_rate + state.config.error_rate:
+            return self._send(500, b'Internal Server Error', content_type='text/plain')
+        self._send(200, json.dumps(state.respond(ac, request), ensure_ascii=False).encode())
+
+    def _send(self, status_code, payload, content_type='application/json'):
+        self.send_response(status_code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, config=None, host='127.0.0.1', port=0, verbose=False):
+        handler = type('Handler', (StubHandler,), {'verbose': verbose})
+        super().__init__((host, port), handler)
+        self.state = StubState(config or StubConfig())
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/api/tp/v1'
+
+    def start(self):
+        """التشغيل في خيط خلفي (للاختبارات). تُرجع الرابط"""
+        threading.Thread(target=self.serve_forever, kwargs={'poll_interval': 0.05}, name='alzajil-stub', daemon=True).start()
+        return self.url
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
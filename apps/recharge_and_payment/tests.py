@@ -1,8 +1,12 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from unittest.mock import patch, MagicMock
 from rest_framework import status
 from rest_framework.test import APIClient
+import requests
+from decimal import Decimal
+from .resilience import get_breaker, reset_breakers, RC_CIRCUIT_OPEN, RC_BULKHEAD_FULL, RC_AGENT_BALANCE_LOW, RC_NEEDS_RECONCILIATION
+from .services import AlzajilClient
 
 class AlzajilViewTests(TestCase):
     def setUp(self):
@@ -53,3 +57,427 @@ class AlzajilViewTests(TestCase):
         response = self.client.post(url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn('SNO', response.data)
+
+
+@override_settings(ALZAJIL_BREAKER_MIN_CALLS=2, ALZAJIL_BREAKER_FAILURE_RATE=0.5, ALZAJIL_BREAKER_HALF_OPEN_CALLS=1)
+class CircuitBreakerTests(TestCase):
+    def setUp(self):
+        reset_breakers()
+        self.addCleanup(reset_breakers)
+
+    @patch('apps.recharge_and_payment.services.requests.Session.get', side_effect=requests.exceptions.ConnectTimeout('timeout'))
+    def test_opens_after_failures_and_fails_fast(self, mock_get):
+        client = AlzajilClient()
+        self.assertEqual(client.query_agent_balance()['RC'], -100)
+        self.assertEqual(client.query_agent_balance()['RC'], -100)
+
+        self.assertEqual(client.query_agent_balance()['RC'], RC_CIRCUIT_OPEN)
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual(get_breaker().snapshot()['state'], 'OPEN')
+
+        response = APIClient().get(reverse('alzajil-agent-balance'))
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertIn('Retry-After', response)
+
+    @patch('apps.recharge_and_payment.services.requests.Session.get')
+    def test_half_open_probe_closes_circuit(self, mock_get):
+        mock_get.side_effect = requests.exceptions.ConnectionError('down')
+        client = AlzajilClient()
+        client.query_agent_balance()
+        client.query_agent_balance()
+        self.assertEqual(get_breaker().state, 'OPEN')
+
+        mock_get.side_effect = None
+        mock_get.return_value = MagicMock(content=b'{"rc": 0, "bal": 100}', status_code=200)
+        with override_settings(ALZAJIL_BREAKER_OPEN_SECONDS=0):
+            self.assertEqual(client.query_agent_balance()['RC'], 0)
+        self.assertEqual(get_breaker().state, 'CLOSED')
+
+    @override_settings(ALZAJIL_BULKHEAD_WAIT_SECONDS=0)
+    @patch('apps.recharge_and_payment.services.requests.Session.get')
+    def test_bulkhead_rejects_when_full(self, mock_get):
+        breaker = get_breaker()
+        for _ in range(breaker.max_concurrent):
+            breaker.acquire_slot()
+
+        self.assertEqual(AlzajilClient().query_agent_balance()['RC'], RC_BULKHEAD_FULL)
+        mock_get.assert_not_called()
+        self.assertEqual(breaker.snapshot()['bulkhead_rejected'], 1)
+
+
+class ReconciliationTests(TestCase):
+    def setUp(self):
+        from apps.authentication.models import User
+        from apps.wallets.models import Transaction
+        user = User.objects.create_user(username='payer', password='p', phone_number='777000700')
+        self.txns = [
+            Transaction.objects.create(user=user, amount=amount, currency='YER', transaction_type='WITHDRAW', reference_number=ref)
+            for ref, amount in [('R1', 100), ('R2', 200), ('R3', 300), ('Unknown', 50)]
+        ]
+        self.provider = {
+            'R1': {'RC': 0, 'AMT': '100'},
+            'R2': {'RC': 12, 'MSG': 'not found'},
+            'R3': {'RC': 0, 'AMT': '250'},
+        }
+        self.client_mock = MagicMock()
+        self.client_mock.check_transaction_status.side_effect = lambda ref: self.provider[ref]
+
+    def test_mismatches_are_recorded_and_checkpoint_advances(self):
+        from .models import ReconciliationIssue
+        from .reconciliation import reconcile
+        stats = reconcile(client=self.client_mock, concurrency=2, settle_minutes=0)
+
+        self.assertEqual((stats['checked'], stats['issues'], stats['stopped']), (3, 3, False))
+        issues = dict(ReconciliationIssue.objects.values_list('reference_number', 'issue_type'))
+        self.assertEqual(issues, {'R2': 'NOT_CONFIRMED', 'R3': 'AMOUNT_MISMATCH', 'Unknown': 'MISSING_REF'})
+
+        self.client_mock.check_transaction_status.reset_mock()
+        self.assertEqual(reconcile(client=self.client_mock, settle_minutes=0)['days'], 0)
+        self.client_mock.check_transaction_status.assert_not_called()
+
+    def test_rerun_does_not_duplicate_issues(self):
+        from .models import ReconciliationCheckpoint, ReconciliationIssue
+        from .reconciliation import reconcile
+        reconcile(client=self.client_mock, settle_minutes=0)
+        ReconciliationCheckpoint.objects.update(last_transaction_id=0)
+        reconcile(client=self.client_mock, settle_minutes=0)
+
+        self.assertEqual(ReconciliationIssue.objects.count(), 3)
+        issue = ReconciliationIssue.objects.get(reference_number='R3')
+        self.assertEqual(issue.transaction, self.txns[2])
+
+    def test_only_the_providers_own_transactions_are_checked(self):
+        from apps.wallets.models import Transaction
+        from .reconciliation import reconcile
+        Transaction.objects.filter(reference_number__in=['R2', 'R3', 'Unknown']).update(provider='stub')
+
+        stats = reconcile(client=self.client_mock, settle_minutes=0)
+        self.assertEqual((stats['checked'], stats['issues']), (1, 0))
+        self.client_mock.check_transaction_status.assert_called_once_with('R1')
+
+        stats = reconcile(provider='stub', client=self.client_mock, settle_minutes=0)
+        self.assertEqual((stats['checked'], stats['issues']), (2, 3))
+
+    def test_parallel_checks_share_a_sized_connection_pool(self):
+        from .services import get_session
+        session = get_session()
+
+        self.assertIs(get_session(), session)
+        self.assertEqual(session.get_adapter('https://alzajilonline.com')._pool_maxsize, 10)
+
+    def test_provider_outage_stops_before_unchecked_rows(self):
+        from .models import ReconciliationCheckpoint, ReconciliationIssue
+        from .reconciliation import reconcile
+        self.provider['R2'] = {'RC': -100, 'MSG': 'timeout'}
+        stats = reconcile(client=self.client_mock, settle_minutes=0)
+
+        self.assertTrue(stats['stopped'])
+        self.assertFalse(ReconciliationIssue.objects.exists())
+        self.assertEqual(ReconciliationCheckpoint.objects.get().last_transaction_id, self.txns[0].id)
+
+
+class AgentBalanceTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        from apps.authentication.models import User
+        from apps.wallets.models import Wallet
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user(username='agentpayer', password='p', phone_number='777000701')
+        Wallet.objects.create(user=self.user, currency='YER', balance=1000)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.payment = {'AC': 7100, 'SC': 42101, 'AMT': 300.0, 'SNO': '777123456'}
+
+    @patch('apps.recharge_and_payment.services.AlzajilClient')
+    def test_low_cached_balance_rejects_without_calling_provider(self, MockClient):
+        from . import agent_balance
+        agent_balance.store({'RC': 0, 'BAL': '200.00'})
+
+        response = self.client.post(reverse('alzajil-payment'), self.payment, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response.data['RC'], RC_AGENT_BALANCE_LOW)
+        MockClient.return_value.send_payment.assert_not_called()
+
+    @patch('apps.recharge_and_payment.services.AlzajilClient')
+    def test_successful_payment_decrements_cached_balance(self, MockClient):
+        from . import agent_balance
+        MockClient.return_value.send_payment.return_value = {'RC': 0, 'MSG': 'Success', 'REF': 'A1'}
+        agent_balance.store({'RC': 0, 'BAL': '500.00'})
+
+        response = self.client.post(reverse('alzajil-payment'), self.payment, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(agent_balance.get_cached()[0], 200)
+
+    @patch('apps.recharge_and_payment.services.AlzajilClient')
+    def test_recording_failure_after_provider_success_is_not_resent(self, MockClient):
+        from apps.wallets.models import Transaction
+        MockClient.return_value.send_payment.return_value = {'RC': 0, 'MSG': 'Success', 'REF': 'R1'}
+        headers = {'HTTP_IDEMPOTENCY_KEY': 'pay-r1'}
+
+        with patch.object(Transaction.objects, 'create', side_effect=RuntimeError('db down')):
+            response = self.client.post(reverse('alzajil-payment'), self.payment, format='json', **headers)
+        retry = self.client.post(reverse('alzajil-payment'), self.payment, format='json', **headers)
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['RC'], RC_NEEDS_RECONCILIATION)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        MockClient.return_value.send_payment.assert_called_once()
+
+    def test_payment_through_other_provider_keeps_alzajil_balance(self):
+        from types import SimpleNamespace
+        from apps.wallets.models import Transaction
+        from . import agent_balance
+        from .router import get_router
+        router = get_router()
+        # رصيد الزاجل المخزن لا يغطي المبلغ، لكن مزوداً آخر متاح للخدمة
+        from .codec import AlzajilResponse
+        agent_balance.store({'RC': 0, 'BAL': '100.00'})
+        served = AlzajilResponse({'RC': 0, 'REF': 'S1'})
+        served.provider = 'stub'
+        with patch.object(router, 'rank', return_value=[SimpleNamespace(name='alzajil'), SimpleNamespace(name='stub')]), \
+                patch.object(router, 'send_payment', return_value=served):
+            response = self.client.post(reverse('alzajil-payment'), self.payment, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'RC': 0, 'REF': 'S1'})
+        self.assertEqual(Transaction.objects.get(reference_number='S1').provider, 'stub')
+        self.assertEqual(agent_balance.get_cached()[0], 100)
+
+    def test_unavailable_cache_does_not_block_payments(self):
+        from django.db import DatabaseError
+        from . import agent_balance
+        with patch.object(agent_balance, '_cache') as cache:
+            cache.return_value.get.side_effect = DatabaseError('no such table: saifi_cache')
+            cache.return_value.decr.side_effect = DatabaseError('no such table: saifi_cache')
+            self.assertTrue(agent_balance.can_cover(10 ** 9))
+            agent_balance.decrement(100)
+
+    @patch('apps.recharge_and_payment.services.AlzajilClient')
+    def test_view_serves_cached_value(self, MockClient):
+        from . import agent_balance
+        agent_balance.store({'RC': 0, 'MSG': 'OK', 'BAL': '750.50'})
+
+        response = self.client.get(reverse('alzajil-agent-balance'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['BAL'], response.data['CACHED']), (750.5, True))
+        self.assertIn('Age', response)
+        MockClient.return_value.query_agent_balance.assert_not_called()
+
+
+class OfferCatalogTests(TestCase):
+    def setUp(self):
+        from apps.authentication.models import User
+        self.client = APIClient()
+        self.client.force_authenticate(user=User.objects.create_user(username='browser', password='p', phone_number='777000702'))
+        self.provider = MagicMock()
+        self.provider.manage_offers.return_value = {'RC': 0, 'PACKAGES': [
+            {'SAC': '11', 'NAME': 'باقة يومية', 'PRICE': '150', 'VALIDITY': '1 يوم'},
+            {'SAC': '12', 'NAME': 'باقة شهرية', 'PRICE': '2,500', 'VALIDITY': '30'},
+            {'ID': '13', 'DESC': 'باقة أسبوعية', 'AMT': 900, 'DAYS': 7},
+        ]}
+
+    def test_sync_upserts_and_deactivates_missing_offers(self):
+        from .models import Offer
+        from .offer_catalog import sync_service
+        self.assertEqual(sync_service(42103, '777000000', client=self.provider), 3)
+        self.assertEqual(Offer.objects.get(offer_id='12').price, 2500)
+        self.assertEqual(Offer.objects.get(offer_id='13').validity_days, 7)
+
+        self.provider.manage_offers.return_value['PACKAGES'].pop(0)
+        sync_service(42103, '777000000', client=self.provider)
+        self.assertFalse(Offer.objects.get(offer_id='11').is_active)
+
+        self.provider.manage_offers.return_value = {'RC': -100, 'MSG': 'timeout'}
+        self.assertIsNone(sync_service(42103, '777000000', client=self.provider))
+        self.assertEqual(Offer.objects.filter(is_active=True).count(), 2)
+
+    def test_item_keys_are_case_insensitive(self):
+        from .codec import decode
+        from .offer_catalog import parse_offers
+        response = decode('{"rc": 0, "packages": [{"offer_id": "101", "offer_name": "باقة", "price": "150"}]}'.encode())
+
+        offers = parse_offers(response)
+        self.assertEqual(list(offers), ['101'])
+        self.assertEqual((offers['101']['name'], offers['101']['price']), ('باقة', 150))
+
+    def test_unparseable_list_keeps_catalog(self):
+        from .models import Offer
+        from .offer_catalog import sync_service
+        sync_service(42103, '777000000', client=self.provider)
+
+        self.provider.manage_offers.return_value = {'RC': 0, 'PACKAGES': [{'unknown': 'x'}]}
+        self.assertIsNone(sync_service(42103, '777000000', client=self.provider))
+        self.assertEqual(Offer.objects.filter(is_active=True).count(), 3)
+
+    @patch('apps.recharge_and_payment.services.AlzajilClient')
+    def test_browsing_is_served_locally(self, MockClient):
+        from .offer_catalog import sync_service
+        sync_service(42103, '777000000', client=self.provider)
+
+        response = self.client.get(reverse('alzajil-offer-catalog'), {'SC': 42103, 'max_price': 1000, 'min_validity': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([o['offer_id'] for o in response.data['offers']], ['13'])
+
+        response = self.client.get(reverse('alzajil-offers'), {'AC': 4005, 'SC': 42103, 'SNO': '777123456'})
+        self.assertEqual(len(response.data['LIST']), 3)
+        MockClient.return_value.manage_offers.assert_not_called()
+
+
+class CodecTests(TestCase):
+    def test_decode_normalizes_known_keys_only(self):
+        from .codec import decode, AlzajilResponse
+        response = decode('{"rc": "0", "Msg": "ok", "BAL": "12.50", "TransId": 7}'.encode())
+
+        self.assertIsInstance(response, AlzajilResponse)
+        self.assertEqual(response, {'RC': '0', 'MSG': 'ok', 'BAL': '12.50', 'TransId': 7})
+        self.assertTrue(response.ok)
+        self.assertEqual(response.balance, Decimal('12.50'))
+
+    def test_stdlib_fallback_decodes_the_same(self):
+        from . import codec
+        content = '{"rc": 0, "msg": "تم", "bal": 12.5, "packages": [{"sac": "1"}]}'.encode()
+        with patch.object(codec, 'orjson', None):
+            fallback = codec.decode(content)
+        self.assertEqual(codec.decode(content), fallback)
+        with patch.object(codec, 'orjson', None), self.assertRaises(ValueError):
+            codec.decode(b'<html>')
+
+    def test_encode_body_lowercases_and_stringifies(self):
+        from .codec import encode_body
+        body = encode_body({'AC': 7100, 'AMT': 100.0, 'SNO': '777'}, 'usr1', 'tkn1')
+        self.assertEqual(body, {'ac': '7100', 'amt': '100', 'sno': '777', 'usr': 'usr1', 'tkn': 'tkn1'})
+
+    @patch('apps.recharge_and_payment.services.requests.Session.get')
+    def test_invalid_json_returns_status_code(self, mock_get):
+        reset_breakers()
+        self.addCleanup(reset_breakers)
+        mock_get.return_value = MagicMock(content=b'<html>', text='<html>', status_code=502)
+        self.assertEqual(AlzajilClient().query_agent_balance()['RC'], 502)
+
+
+class StubServerTests(TestCase):
+    def setUp(self):
+        reset_breakers()
+        self.addCleanup(reset_breakers)
+
+    def _serve(self, config):
+        from .stub_server import StubServer
+        server = StubServer(config)
+        url = server.start()
+        self.addCleanup(server.stop)
+        return override_settings(ALZAJIL_PAYMENT_URL=url, ALZAJIL_REPORT_URL=url)
+
+    def test_payment_then_status_and_agent_balance(self):
+        from .stub_server import StubConfig
+        with self._serve(StubConfig(agent_balance='1000', seed=1)):
+            client = AlzajilClient()
+            payment = client.send_payment({'AC': 7100, 'SC': 42101, 'AMT': 250.0, 'SNO': '777123456'})
+            self.assertTrue(payment.ok)
+            self.assertEqual(client.check_transaction_status(payment.ref)['AMT'], '250')
+            self.assertEqual(client.query_agent_balance().balance, Decimal('750'))
+
+    def test_reconciliation_checks_amounts_from_provider_responses(self):
+        from apps.authentication.models import User
+        from apps.wallets.models import Transaction
+        from .models import ReconciliationIssue
+        from .reconciliation import reconcile
+        from .stub_server import StubConfig
+        user = User.objects.create_user(username='stubpayer', password='p', phone_number='777000710')
+        with self._serve(StubConfig(agent_balance='1000', seed=1)):
+            client = AlzajilClient()
+            for local, sent in (('100.00', 100.0), ('300.00', 250.0)):
+                ref = client.send_payment({'AC': 7100, 'SC': 42101, 'AMT': sent, 'SNO': '777123456'}).ref
+                Transaction.objects.create(user=user, amount=local, currency='YER', transaction_type='WITHDRAW', reference_number=ref)
+
+            stats = reconcile(client=client, settle_minutes=0)
+
+        self.assertEqual((stats['checked'], stats['issues']), (2, 1))
+        issue = ReconciliationIssue.objects.get()
+        self.assertEqual((issue.issue_type, issue.provider_amount), ('AMOUNT_MISMATCH', Decimal('250.00')))
+
+    def test_errors_and_weighted_rc(self):
+        from .stub_server import StubConfig
+        with self._serve(StubConfig(rc=['7400=51:1'], error_rate=0, seed=1)):
+            self.assertEqual(AlzajilClient().query_agent_balance()['RC'], 51)
+        reset_breakers()
+        with self._serve(StubConfig(error_rate=1.0)):
+            self.assertEqual(AlzajilClient().query_agent_balance()['RC'], 500)
+
+    def test_offer_catalog_syncs_from_stub(self):
+        from .models import Offer
+        from .offer_catalog import sync_service
+        from .stub_server import StubConfig, STUB_OFFERS
+        with self._serve(StubConfig()):
+            self.assertEqual(sync_service(42103, '777000000', client=AlzajilClient()), len(STUB_OFFERS))
+
+        offer = Offer.objects.get(service_code=42103, offer_id='103')
+        self.assertEqual((offer.name, offer.price, offer.validity_days, offer.is_active), ('باقة شهرية', 2500, 30, True))
+
+    def test_recorded_session_replays(self):
+        import os
+        import tempfile
+        from .stub_server import StubConfig
+        path = os.path.join(tempfile.mkdtemp(), 'session.jsonl')
+        with self._serve(StubConfig(agent_balance='4321')), override_settings(ALZAJIL_RECORD_PATH=path):
+            AlzajilClient().query_agent_balance()
+
+        with self._serve(StubConfig(replay=path)):
+            response = AlzajilClient().query_agent_balance()
+        self.assertEqual(response.balance, Decimal('4321'))
+
+
+class RouterTests(TestCase):
+    def setUp(self):
+        reset_breakers()
+        self.addCleanup(reset_breakers)
+
+    def _provider(self, name, cost=0, delay=0, **responses):
+        import time
+        from .providers import BaseProvider
+        client = MagicMock()
+        for method, response in responses.items():
+            getattr(client, method).side_effect = lambda *a, r=response, **k: time.sleep(delay) or dict(r)
+        provider = type('FakeProvider', (BaseProvider,), {'get_client': lambda self: client})(name, cost=cost)
+        provider.client = client
+        return provider
+
+    @override_settings(RECHARGE_HEDGE_AFTER_MS=50)
+    def test_slow_read_is_hedged_to_second_provider(self):
+        from .router import Router
+        slow = self._provider('slow', delay=0.5, query_subscriber_balance={'RC': 0, 'BAL': '1'})
+        fast = self._provider('fast', cost=1, query_subscriber_balance={'RC': 0, 'BAL': '2'})
+        router = Router([slow, fast])
+
+        response = router.query_subscriber_balance(42101, '777123456')
+
+        self.assertEqual((response, response.provider), ({'RC': 0, 'BAL': '2'}, 'fast'))
+        self.assertEqual((router.counters['hedged'], router.counters['hedge_wins']), (1, 1))
+
+    def test_payment_fails_over_only_when_not_sent(self):
+        from .router import Router
+        primary = self._provider('primary', send_payment={'RC': RC_CIRCUIT_OPEN})
+        secondary = self._provider('secondary', cost=1, send_payment={'RC': 0, 'REF': 'S1'})
+        router = Router([primary, secondary])
+        self.assertEqual(router.send_payment({'SC': 42101}).provider, 'secondary')
+
+        primary.client.send_payment.side_effect = lambda data: {'RC': -100, 'MSG': 'timeout'}
+        secondary.client.send_payment.reset_mock()
+        self.assertEqual(router.send_payment({'SC': 42101})['RC'], -100)
+        secondary.client.send_payment.assert_not_called()
+
+    @override_settings(RECHARGE_LATENCY_MIN_SAMPLES=1)
+    def test_rank_uses_health_latency_and_cost(self):
+        from .router import Router
+        a, b, c = self._provider('a'), self._provider('b', cost=1), self._provider('c')
+        c.service_codes = frozenset([1])
+        router = Router([a, b, c])
+        router.latency['a'].add(2.0)
+        router.latency['b'].add(0.5)
+        self.assertEqual([p.name for p in router.rank(42101)], ['b', 'a'])
+
+        get_breaker('b')._open(0)
+        self.assertEqual([p.name for p in router.rank(42101)], ['a'])
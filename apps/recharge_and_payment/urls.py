@@ -3,14 +3,18 @@ from .views import (
     PaymentView,
     SubscriberBalanceView,
     OffersView,
+    OfferCatalogView,
     AgentBalanceView,
-    TransactionStatusView
+    TransactionStatusView,
+    ProviderHealthView
 )
 
 urlpatterns = [
     path('payment/', PaymentView.as_view(), name='alzajil-payment'),
     path('subscriber-balance/', SubscriberBalanceView.as_view(), name='alzajil-subscriber-balance'),
     path('offers/', OffersView.as_view(), name='alzajil-offers'),
+    path('offers/catalog/', OfferCatalogView.as_view(), name='alzajil-offer-catalog'),
     path('agent-balance/', AgentBalanceView.as_view(), name='alzajil-agent-balance'),
     path('transaction-status/', TransactionStatusView.as_view(), name='alzajil-transaction-status'),
+    path('provider-health/', ProviderHealthView.as_view(), name='alzajil-provider-health'),
 ]
@@ -5,25 +5,42 @@ from .serializers import (
     PaymentSerializer,
     BalanceQuerySerializer,
     OfferManagementSerializer,
+    OfferCatalogSerializer,
     TransactionStatusSerializer
 )
-from .services import AlzajilClient
+from .router import get_router, served_by
+from .resilience import FAST_FAIL_CODES, RC_AGENT_BALANCE_LOW, RC_NEEDS_RECONCILIATION, get_breaker
+from . import agent_balance, offer_catalog
+from apps.wallets.idempotency import idempotent
+from apps.wallets.throttling import limit_inflight
 
 class BaseAlzajilView(APIView):
     """
     عرض أساسي لتهيئة العميل (Client Initialization)
+    العميل هو موجه المزودين (router.py) بنفس واجهة AlzajilClient.
     """
+    throttle_scope = 'provider'
+
     def get_client(self):
-        return AlzajilClient()
+        return get_router()
+
+    def provider_response(self, response_data):
+        """الرفض السريع (الدائرة مفتوحة / المزود مشغول) يُعاد كـ 503 مع Retry-After"""
+        if response_data.get('RC') in FAST_FAIL_CODES:
+            return Response(response_data, status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': '5'})
+        return Response(response_data, status=status.HTTP_200_OK)
 
 class PaymentView(BaseAlzajilView):
     """
     يعالج عمليات السداد (AC=7100, 7600, 7700) وشراء العروض (AC=7200).
     يتوقع طلب POST.
     """
+    @limit_inflight
+    @idempotent
     def post(self, request):
         from django.db import transaction
         from apps.wallets.models import Wallet, Transaction
+        from apps.wallets.ledger import post_journal, wallet_posting, system_posting
         from decimal import Decimal
 
         serializer = PaymentSerializer(data=request.data)
@@ -40,47 +57,51 @@ class PaymentView(BaseAlzajilView):
                  return Response({"MSG": "Invalid amount", "RC": -1}, status=status.HTTP_400_BAD_REQUEST)
 
             # 1. Check Wallet Balance (Assume YER for now as per current scope)
-            try:
-                wallet = Wallet.objects.get(user=user, currency='YER')
-            except Wallet.DoesNotExist:
-                return Response({"MSG": "لا توجد محفظة (YER) لهذا المستخدم", "RC": -1}, status=status.HTTP_400_BAD_REQUEST)
-
-            if float(wallet.balance) < amount:
+            # المستخدم بدون محفظة رصيده صفر
+            wallet = Wallet.objects.filter(user=user, currency='YER').first()
+            if not wallet or float(wallet.balance) < amount:
                  return Response({"MSG": "رصيد المحفظة غير كافٍ لإتمام العملية", "RC": -1}, status=status.HTTP_400_BAD_REQUEST)
 
+            # رصيد الوكيل لدى الزاجل (من الكاش): الرفض محلياً بدلاً من رحلة كاملة تنتهي بالرفض،
+            # فقط إذا لم يكن هناك مزود آخر متاح للخدمة
+            client = self.get_client()
+            serving = {provider.name for provider in client.rank(validated.get('SC'))}
+            if serving <= {agent_balance.PROVIDER} and not agent_balance.can_cover(amount):
+                return self.provider_response({
+                    "MSG": "رصيد الوكيل لدى المزود غير كافٍ حالياً، يرجى المحاولة لاحقاً",
+                    "RC": RC_AGENT_BALANCE_LOW
+                })
+
             # 2. Call API
             try:
-                client = self.get_client()
                 # We pass serializer data directly. Ensuring keys/values are compliant happens in client
                 response_data = client.send_payment(validated)
-                
-                # 3. If Success -> Deduct & Record
-                if str(response_data.get('RC')) == '0':
-                    with transaction.atomic():
-                        # Refetch wallet to lock it
-                        wallet = Wallet.objects.select_for_update().get(id=wallet.id)
-                        
-                        # Check balance again just in case
-                        if float(wallet.balance) < amount:
-                            # Edge case: Balance changed during API call. 
-                            # We must fail the local transaction but API succeeded! 
-                            # Ideally we should queue a refund or alert admin. 
-                            # For now, we will force negative or fail? 
-                            # Let's deduct anyway to keep consistency with API, or strictly fail.
-                            # Given it's a critical financial app, let's proceed with deduction (allow negative temporarily) OR fail.
-                            # But wait, checking again before API is safer. 
-                            # Stick to standard flow: Deduct.
-                            pass
-
-                        wallet.balance -= Decimal(str(amount))
-                        wallet.save()
+            except Exception as e:
+                 print(f"Payment View Internal Error: {e}")
+                 # Logic error or API Fail. No deduction.
+                 return Response({"MSG": f"System Error: {str(e)}", "RC": -1}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+            # 3. If Success -> Deduct & Record
+            if str(response_data.get('RC')) == '0':
+                provider = served_by(response_data) or agent_balance.PROVIDER
+                ref_no = response_data.get('REF', 'Unknown')
+                try:
+                    with transaction.atomic():
                         # Record Transaction
-                        ref_no = response_data.get('REF', 'Unknown')
                         desc = f"سداد خدمة (SC: {validated.get('SC')}) - {validated.get('SNO')}"
                         if validated.get('AC') == 7200:
                              desc = f"شراء باقة (SAC: {validated.get('SAC')}) - {validated.get('SNO')}"
 
+                        # Edge case: Balance changed during API call.
+                        # The provider already accepted the payment, so the deduction is
+                        # posted anyway (allow negative temporarily) to stay consistent with the API.
+                        post_journal(
+                            [wallet_posting(wallet, -amount), system_posting('PROVIDER', 'YER', amount)],
+                            description=desc,
+                            reference_number=str(ref_no),
+                            allow_overdraft=True
+                        )
+
                         Transaction.objects.create(
                             user=user,
                             amount=Decimal(str(amount)),
@@ -88,16 +109,22 @@ class PaymentView(BaseAlzajilView):
                             transaction_type='WITHDRAW',
                             description=desc,
                             status='SUCCESS',
-                            reference_number=str(ref_no) # Use API Ref as Transaction Ref
+                            reference_number=str(ref_no), # Use API Ref as Transaction Ref
+                            provider=provider
                         )
-                
-                return Response(response_data, status=status.HTTP_200_OK)
+                except Exception as e:
+                    print(f"Payment Recording Error (REF: {ref_no}, provider: {provider}): {e}")
+                    # المزود نفذ السداد: الاستجابة نهائية (ليست 5xx) حتى يحفظها مفتاح منع التكرار
+                    # ولا تُرسل إعادة المحاولة السداد مرة ثانية؛ التسجيل المحلي يتم عبر المطابقة
+                    return Response({
+                        "MSG": "تم السداد لدى المزود وتعذر تسجيله في المحفظة، ستتم مطابقة العملية",
+                        "RC": RC_NEEDS_RECONCILIATION,
+                        "REF": ref_no,
+                    }, status=status.HTTP_202_ACCEPTED)
+                agent_balance.decrement(amount, provider)
+
+            return self.provider_response(response_data)
 
-            except Exception as e:
-                 print(f"Payment View Internal Error: {e}")
-                 # Logic error or API Fail. No deduction.
-                 return Response({"MSG": f"System Error: {str(e)}", "RC": -1}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        
         print(f"Payment Validation Error: {serializer.errors}")
         print(f"Request Data: {request.data}")
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -116,17 +143,28 @@ class SubscriberBalanceView(BaseAlzajilView):
                 subscriber_no=serializer.validated_data['SNO'],
                 action_code=serializer.validated_data.get('AC', 4001)
             )
-            return Response(response_data, status=status.HTTP_200_OK)
+            return self.provider_response(response_data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 class OffersView(BaseAlzajilView):
     """
     إدارة العروض (AC=4002-4007).
     الطريقة: GET
+    قائمة العروض العامة (AC=4005) تُقدم من الكتالوج المحلي إذا تمت مزامنة الخدمة؛
+    باقي الإجراءات خاصة بالمشترك وتذهب للمزود.
     """
     def get(self, request):
         serializer = OfferManagementSerializer(data=request.query_params)
         if serializer.is_valid():
+            if serializer.validated_data['AC'] == offer_catalog.AC_LIST:
+                offers = list(offer_catalog.search(serializer.validated_data['SC']))
+                if offers:
+                    return Response({
+                        'RC': 0,
+                        'LIST': [offer_catalog.as_provider_item(o) for o in offers],
+                        'CACHED': True,
+                    }, status=status.HTTP_200_OK)
+
             client = self.get_client()
             response_data = client.manage_offers(
                 action_code=serializer.validated_data['AC'],
@@ -134,18 +172,64 @@ class OffersView(BaseAlzajilView):
                 subscriber_no=serializer.validated_data['SNO'],
                 offer_id=serializer.validated_data.get('SAC')
             )
-            return Response(response_data, status=status.HTTP_200_OK)
+            return self.provider_response(response_data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class OfferCatalogView(APIView):
+    """
+    تصفح وتصفية عروض خدمة من الكتالوج المحلي (السعر، الصلاحية، الاسم).
+    الطريقة: GET
+    """
+    def get(self, request):
+        serializer = OfferCatalogSerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        data = serializer.validated_data
+        offers = offer_catalog.search(
+            data['SC'],
+            min_price=data.get('min_price'),
+            max_price=data.get('max_price'),
+            min_validity=data.get('min_validity'),
+            max_validity=data.get('max_validity'),
+            name=data.get('q'),
+            ordering=data.get('ordering') or 'price',
+        )
+        return Response({
+            'SC': data['SC'],
+            'count': len(offers),
+            'offers': [
+                {
+                    'offer_id': o.offer_id,
+                    'name': o.name,
+                    'price': o.price,
+                    'validity_days': o.validity_days,
+                    'synced_at': o.synced_at,
+                }
+                for o in offers
+            ]
+        }, status=status.HTTP_200_OK)
+
 class AgentBalanceView(BaseAlzajilView):
     """
     الاستعلام عن رصيد الوكيل (AC=7400).
     الطريقة: GET
+    يُعاد الرصيد المخزن (يحدثه poll_agent_balance ويُخصم منه بعد كل سداد) مع عمره بالثواني (AGE).
+    ?refresh=1 أو قِدم القيمة يفرض استعلاماً مباشراً؛ إذا فشل تُعاد القيمة القديمة مع عمرها.
     """
     def get(self, request):
-        client = self.get_client()
-        response_data = client.query_agent_balance()
-        return Response(response_data, status=status.HTTP_200_OK)
+        cached = None if request.query_params.get('refresh') else agent_balance.get_cached()
+        if cached is None or cached[1] > agent_balance._max_age():
+            response_data = agent_balance.refresh(self.get_client().get_provider(agent_balance.PROVIDER))
+            if str(response_data.get('RC')) == '0' or cached is None:
+                return self.provider_response({**response_data, 'CACHED': False, 'AGE': 0})
+
+        balance, age, last_response = cached
+        return Response(
+            {**last_response, 'BAL': float(balance), 'CACHED': True, 'AGE': int(age)},
+            status=status.HTTP_200_OK,
+            headers={'Age': str(int(age))}
+        )
 
 class TransactionStatusView(BaseAlzajilView):
     """
@@ -155,9 +239,22 @@ class TransactionStatusView(BaseAlzajilView):
     def get(self, request):
         serializer = TransactionStatusSerializer(data=request.query_params)
         if serializer.is_valid():
+            from apps.wallets.models import Transaction
             client = self.get_client()
-            response_data = client.check_transaction_status(
-                trans_ref=serializer.validated_data['REF']
-            )
-            return Response(response_data, status=status.HTTP_200_OK)
+            ref = serializer.validated_data['REF']
+            # المزود الذي نُفذت عنده العملية (PROVIDER أو المحفوظ مع الحركة)، الافتراضي الزاجل
+            provider = request.query_params.get('PROVIDER') or Transaction.objects.filter(
+                transaction_type='WITHDRAW', reference_number=ref
+            ).values_list('provider', flat=True).first()
+            response_data = client.check_transaction_status(trans_ref=ref, provider=provider)
+            return self.provider_response(response_data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+class ProviderHealthView(APIView):
+    """
+    حالة قاطع الدائرة للمزود (الحالة، نسب الأخطاء والبطء، الطلبات المرفوضة، التزامن الحالي).
+    routing: صحة وأزمنة (p50/p95/p99) وكلفة كل مزود في الموجه وعدد الطلبات المكررة (hedged).
+    الطريقة: GET
+    """
+    def get(self, request):
+        return Response({**get_breaker().snapshot(), 'routing': get_router().snapshot()}, status=status.HTTP_200_OK)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Wallet, Transaction, ExchangeRate, CurrencyConversion
+from .models import Wallet, Transaction, ExchangeRate, CurrencyConversion, IdempotencyKey, LedgerEntry, BalanceCheckpoint, ArchivedPartition, DailyWalletSummary, OutboxEvent, UsedQuote
 
 @admin.register(Wallet)
 class WalletAdmin(admin.ModelAdmin):
@@ -25,3 +25,44 @@ class CurrencyConversionAdmin(admin.ModelAdmin):
     list_filter = ('from_currency', 'to_currency', 'status')
     search_fields = ('user__username',)
     date_hierarchy = 'created_at'
+
+
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    list_display = ('key', 'endpoint', 'scope', 'status', 'response_status', 'created_at', 'expires_at')
+    list_filter = ('endpoint', 'status')
+    search_fields = ('key', 'scope')
+
+@admin.register(LedgerEntry)
+class LedgerEntryAdmin(admin.ModelAdmin):
+    list_display = ('journal_id', 'account_type', 'account_id', 'amount', 'currency', 'reference_number', 'created_at')
+    list_filter = ('account_type', 'currency')
+    search_fields = ('journal_id', 'reference_number', 'description')
+    date_hierarchy = 'created_at'
+
+@admin.register(BalanceCheckpoint)
+class BalanceCheckpointAdmin(admin.ModelAdmin):
+    list_display = ('account_type', 'account_id', 'currency', 'balance', 'last_entry_id', 'created_at')
+    list_filter = ('account_type', 'currency')
+
+@admin.register(ArchivedPartition)
+class ArchivedPartitionAdmin(admin.ModelAdmin):
+    list_display = ('table_name', 'month', 'row_count', 'path', 'archived_at')
+    list_filter = ('table_name',)
+
+@admin.register(DailyWalletSummary)
+class DailyWalletSummaryAdmin(admin.ModelAdmin):
+    list_display = ('user', 'currency', 'day', 'transaction_type', 'count', 'total')
+    list_filter = ('currency', 'transaction_type')
+    date_hierarchy = 'day'
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ('id', 'topic', 'status', 'attempts', 'available_at', 'created_at', 'processed_at')
+    list_filter = ('status', 'topic')
+    date_hierarchy = 'created_at'
+
+@admin.register(UsedQuote)
+class UsedQuoteAdmin(admin.ModelAdmin):
+    list_display = ('quote_id', 'user', 'reference_number', 'used_at')
+    search_fields = ('quote_id', 'reference_number')
@@ -0,0 +1,93 @@
+"""
+طلبات GET الشرطية (ETag / Last-Modified) والحقول الجزئية (?fields=) لواجهات القراءة التي يستطلعها التطبيق.
+
+الواجهة تعرف get_version(request) التي تُرجع (ختم النسخة، آخر تعديل) من استعلام تجميعي رخيص
+(مثل أكبر updated_at). إذا طابق الختم ترويسة If-None-Match (أو لم يتغير منذ If-Modified-Since)
+تُعاد 304 قبل تنفيذ get، أي بدون بناء البيانات أو تحويلها إلى JSON.
+"""
+import hashlib
+
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework import exceptions, response, status
+
+
+class NotModified(exceptions.APIException):
+    status_code = status.HTTP_304_NOT_MODIFIED
+
+
+def _matches(if_none_match, etag):
+    if if_none_match.strip() == '*':
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    # المقارنة الضعيفة: W/"x" يساوي "x"
+    bare = etag.removeprefix('W/')
+    return any(tag.removeprefix('W/') == bare for tag in candidates)
+
+
+def sparse(data, fields):
+    """إبقاء الحقول المطلوبة فقط (قاموس أو قائمة قواميس)"""
+    if isinstance(data, list):
+        return [sparse(item, fields) for item in data]
+    if isinstance(data, dict):
+        return {k: v for k, v in data.items() if k in fields}
+    return data
+
+
+class ConditionalGetMixin:
+    """
+    يُضاف قبل APIView في الوراثة ويتطلب تعريف get_version(request) -> (stamp, last_modified | None).
+    - ETag يعتمد على الختم + معاملات الطلب (لأن ?fields= يغير المحتوى) + المستخدم.
+    - ?fields=a,b يعيد هذه الحقول فقط.
+    """
+
+    def get_version(self, request):
+        raise NotImplementedError
+
+    def _etag(self, request, stamp):
+        user_id = request.user.pk if request.user and request.user.is_authenticated else ''
+        source = f"{type(self).__name__}|{user_id}|{stamp}|{request.META.get('QUERY_STRING', '')}"
+        return f'W/"{hashlib.md5(source.encode()).hexdigest()}"'
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._etag_value = None
+        self._last_modified = None
+        if request.method not in ('GET', 'HEAD'):
+            return
+
+        stamp, last_modified = self.get_version(request)
+        self._etag_value = self._etag(request, stamp)
+        self._last_modified = last_modified
+
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match is not None:
+            if _matches(if_none_match, self._etag_value):
+                raise NotModified()
+            return
+        if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since') or '')
+        if if_modified_since and last_modified and int(last_modified.timestamp()) <= if_modified_since:
+            raise NotModified()
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return response.Response(status=status.HTTP_304_NOT_MODIFIED)
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response_obj, *args, **kwargs):
+        response_obj = super().finalize_response(request, response_obj, *args, **kwargs)
+        if getattr(self, '_etag_value', None) is None:
+            return response_obj
+
+        if response_obj.status_code == status.HTTP_200_OK:
+            fields = request.query_params.get('fields')
+            if fields:
+                response_obj.data = sparse(response_obj.data, {f.strip() for f in fields.split(',') if f.strip()})
+        if response_obj.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response_obj['ETag'] = self._etag_value
+            if self._last_modified:
+                response_obj['Last-Modified'] = http_date(self._last_modified.timestamp())
+            # على العميل إعادة التحقق في كل مرة (الاستجابة رخيصة عند عدم التغير)
+            response_obj['Cache-Control'] = 'private, no-cache'
+            patch_vary_headers(response_obj, ['Authorization'])
+        return response_obj
@@ -0,0 +1,14 @@
+"""معالجات أحداث الـ outbox (تُسجل عند تحميل التطبيق في WalletsConfig.ready)"""
+from apps.authentication.models import Notification
+from .outbox import handler, TRANSFER_RECEIVED
+
+
+@handler(TRANSFER_RECEIVED)
+def notify_transfer_recipient(payload, event):
+    # يُنفذ في نفس معاملة تعليم الحدث كمنفذ، فلا يتكرر الإشعار عند إعادة المحاولة
+    reference = f" (مرجع: {payload['reference_number']})" if payload.get('reference_number') else ''
+    Notification.objects.create(
+        user_id=payload['user_id'],
+        title='تم استلام حوالة',
+        message=f"استلمت {payload['amount']} {payload['currency']} من {payload['sender']}{reference}",
+    )
@@ -0,0 +1,138 @@
+import functools
+import hashlib
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import response, status
+from rest_framework.throttling import BaseThrottle
+
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+
+
+def _request_scope(request):
+    """
+    مساحة المفاتيح: المستخدم، أو عنوان IP للطلبات بدون مصادقة (نفس تعريف العميل في التحديد)
+    حتى لا يستعيد عميل استجابة عميل آخر بنفس المفتاح والبيانات.
+    """
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f"user:{user.id}"
+    ident = BaseThrottle().get_ident(request) or ''
+    # قد يكون X-Forwarded-For كاملاً، فيُختصر ليناسب طول الحقل
+    return f"anon:{hashlib.sha256(ident.encode()).hexdigest()[:40]}"
+
+
+def _request_hash(request):
+    data = request.data
+    if hasattr(data, 'dict'):
+        data = data.dict()
+    payload = json.dumps(data, sort_keys=True, cls=DjangoJSONEncoder, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _pending_lease():
+    return getattr(settings, 'IDEMPOTENCY_PENDING_LEASE', timedelta(minutes=2))
+
+
+def _replay(record):
+    replayed = response.Response(record.response_body, status=record.response_status)
+    replayed['Idempotent-Replayed'] = 'true'
+    return replayed
+
+
+def _wait_for_completion(lookup, request_hash):
+    """
+    انتظار الطلب الأصلي (المتزامن) حتى يكتمل ثم إرجاع نتيجته بدلاً من تنفيذ العملية مرة ثانية.
+    """
+    deadline = time.monotonic() + getattr(settings, 'IDEMPOTENCY_WAIT_SECONDS', 5)
+    while True:
+        record = IdempotencyKey.objects.filter(**lookup).first()
+        if record is None:
+            # الطلب الأصلي فشل (5xx) وتم حذف السجل: يمكن للعميل إعادة المحاولة
+            return response.Response(
+                {'error': 'فشل الطلب الأصلي، يرجى إعادة المحاولة'},
+                status=status.HTTP_409_CONFLICT,
+                headers={'Retry-After': '1'}
+            )
+        if record.request_hash != request_hash:
+            return response.Response(
+                {'error': 'تم استخدام مفتاح منع التكرار مع بيانات مختلفة'},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
+        if record.status == 'COMPLETED':
+            return _replay(record)
+        if time.monotonic() >= deadline:
+            return response.Response(
+                {'error': 'الطلب الأصلي ما زال قيد المعالجة'},
+                status=status.HTTP_409_CONFLICT,
+                headers={'Retry-After': '1'}
+            )
+        time.sleep(0.05)
+
+
+def idempotent(view_method):
+    """
+    مزخرف لدوال post في الواجهات المالية.
+    عند وجود الترويسة Idempotency-Key يتم تنفيذ الطلب مرة واحدة فقط، وتُعاد الاستجابة المحفوظة
+    للطلبات المكررة دون لمس المحافظ أو مزود الخدمة. الطلبات بدون الترويسة تُنفذ كالمعتاد.
+    السجل PENDING ينتهي بعد IDEMPOTENCY_PENDING_LEASE (أطول من أقصى مدة للطلب)، فإذا توقف العامل
+    أثناء التنفيذ يمكن لإعادة المحاولة أخذ المفتاح بعدها بدلاً من الانتظار IDEMPOTENCY_KEY_TTL كاملة.
+    """
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+
+        if len(key) > 255:
+            return response.Response({'error': 'مفتاح منع التكرار طويل جداً'}, status=status.HTTP_400_BAD_REQUEST)
+
+        lookup = {
+            'scope': _request_scope(request),
+            'endpoint': request.resolver_match.url_name if request.resolver_match else request.path,
+            'key': key,
+        }
+        request_hash = _request_hash(request)
+        now = timezone.now()
+
+        # المفاتيح المنتهية (ومنها PENDING لعامل توقف) لا تمنع إعادة الاستخدام
+        IdempotencyKey.objects.filter(expires_at__lte=now, **lookup).delete()
+
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(
+                    request_hash=request_hash,
+                    expires_at=now + _pending_lease(),
+                    **lookup
+                )
+        except IntegrityError:
+            return _wait_for_completion(lookup, request_hash)
+
+        try:
+            result = view_method(self, request, *args, **kwargs)
+        except Exception:
+            record.delete()
+            raise
+
+        if result.status_code >= 500:
+            # أخطاء الخادم غير محفوظة حتى يتمكن العميل من إعادة المحاولة بنفس المفتاح
+            record.delete()
+            return result
+
+        # update بدلاً من save: إذا انتهت المهلة وأخذ طلب آخر المفتاح لا يُكتب فوق سجله
+        IdempotencyKey.objects.filter(pk=record.pk).update(
+            status='COMPLETED',
+            response_status=result.status_code,
+            response_body=result.data,
+            expires_at=timezone.now() + settings.IDEMPOTENCY_KEY_TTL,
+        )
+        return result
+
+    return wrapper
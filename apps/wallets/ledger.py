@@ -0,0 +1,239 @@
+"""
+دفتر الأستاذ بالقيد المزدوج.
+
+كل حركة مالية تُسجل كمجموعة قيود متوازنة (مجموعها صفر لكل عملة) عبر post_journal،
+ويتم تحديث الرصيد المُسقط (Wallet.balance / CompanyTreasury.balance) في نفس المعاملة
+بتحديث ذري (F expressions). يمكن إعادة بناء أي رصيد من آخر نقطة حفظ + القيود التالية لها.
+"""
+import uuid
+from collections import namedtuple
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Sum, Max
+from django.utils import timezone
+
+from .models import Wallet, LedgerEntry, BalanceCheckpoint
+
+Posting = namedtuple('Posting', ['account_type', 'account_id', 'currency', 'amount'])
+
+CENT = Decimal('0.01')
+
+
+class LedgerError(Exception):
+    pass
+
+
+class UnbalancedJournal(LedgerError):
+    """مجموع القيود لعملة ما لا يساوي صفراً"""
+
+
+class InsufficientFunds(LedgerError):
+    """الرصيد غير كافٍ لتنفيذ قيد مدين على الحساب"""
+
+    def __init__(self, account_type, account_id):
+        super().__init__('insufficient_funds')
+        self.account_type = account_type
+        self.account_id = account_id
+
+
+def to_amount(value):
+    """تحويل المبلغ إلى Decimal بخانتين عشريتين"""
+    return Decimal(str(value)).quantize(CENT)
+
+
+def wallet_posting(wallet, amount):
+    return Posting('WALLET', wallet.id, wallet.currency, to_amount(amount))
+
+
+def treasury_posting(treasury, amount):
+    return Posting('TREASURY', treasury.id, treasury.currency, to_amount(amount))
+
+
+def materialize_wallets(user_ids, currency):
+    """
+    المحافظ لا تُنشأ مسبقاً: المستخدم بدون محفظة رصيده صفر، والمحفظة تُنشأ عند أول قيد دائن عليها.
+    جلب/إنشاء محافظ مجموعة مستخدمين بجملة INSERT ... ON CONFLICT DO UPDATE واحدة تقفل الصفوف
+    حتى نهاية معاملة القيد (يجب استدعاؤها داخل transaction.atomic قبل post_journal).
+    تُرجع {user_id: Wallet} (الرصيد في الكائنات غير محمل، استخدم refresh_from_db عند الحاجة).
+    """
+    wallets = Wallet.objects.bulk_create(
+        [Wallet(user_id=user_id, currency=currency, balance=0, is_active=True) for user_id in set(user_ids)],
+        update_conflicts=True,
+        unique_fields=['user', 'currency'],
+        update_fields=['updated_at']
+    )
+    return {w.user_id: w for w in wallets}
+
+
+def materialize_wallet(user, currency):
+    return materialize_wallets([user.id], currency)[user.id]
+
+
+def system_posting(account_type, currency, amount):
+    """قيد على حساب نظامي (FX, PROVIDER, EXTERNAL) لا يملك رصيداً مُسقطاً"""
+    return Posting(account_type, 0, currency, to_amount(amount))
+
+
+def post_journal(postings, description='', reference_number='', allow_overdraft=False):
+    """
+    تسجيل مجموعة قيود متوازنة وتحديث الأرصدة المُسقطة ذرياً.
+
+    - القيود المدينة (السالبة) على المحافظ والخزائن تُنفذ بشرط كفاية الرصيد في نفس جملة UPDATE،
+      وإلا يتم رفع InsufficientFunds وإلغاء المعاملة كاملة (ما لم يكن allow_overdraft=True).
+    - القيود الدائنة تُطبق بجملة bulk_update واحدة لكل نوع حساب.
+    """
+    from apps.financials.models import CompanyTreasury
+
+    postings = [p for p in postings if p.amount]
+    if not postings:
+        return None
+
+    totals = {}
+    for p in postings:
+        totals[p.currency] = totals.get(p.currency, Decimal('0')) + p.amount
+    unbalanced = {c: t for c, t in totals.items() if t != 0}
+    if unbalanced:
+        raise UnbalancedJournal(f"قيد غير متوازن: {unbalanced}")
+
+    journal_id = uuid.uuid4()
+    now = timezone.now()
+
+    with transaction.atomic():
+        LedgerEntry.objects.bulk_create([
+            LedgerEntry(
+                journal_id=journal_id,
+                account_type=p.account_type,
+                account_id=p.account_id,
+                currency=p.currency,
+                amount=p.amount,
+                description=description[:255],
+                reference_number=reference_number or '',
+            )
+            for p in postings
+        ])
+
+        deltas = {}
+        for p in postings:
+            if p.account_type in ('WALLET', 'TREASURY'):
+                key = (p.account_type, p.account_id)
+                deltas[key] = deltas.get(key, Decimal('0')) + p.amount
+
+        sharded = {}
+        treasury_ids = [account_id for account_type, account_id in deltas if account_type == 'TREASURY']
+        if treasury_ids:
+            sharded = dict(
+                CompanyTreasury.objects.filter(id__in=treasury_ids, shard_count__gt=1).values_list('id', 'shard_count')
+            )
+
+        credits = {'WALLET': [], 'TREASURY': []}
+        # ترتيب ثابت للأقفال لتجنب الـ deadlock
+        for (account_type, account_id), delta in sorted(deltas.items()):
+            if account_type == 'TREASURY' and account_id in sharded:
+                from apps.financials.sharding import post_to_shards
+                post_to_shards(account_id, sharded[account_id], delta, now, allow_overdraft)
+                continue
+            model = Wallet if account_type == 'WALLET' else CompanyTreasury
+            if delta >= 0:
+                credits[account_type].append((account_id, delta))
+                continue
+            rows = model.objects.filter(id=account_id)
+            if not allow_overdraft:
+                rows = rows.filter(balance__gte=-delta)
+            values = {'balance': F('balance') + delta, 'updated_at': now}
+            if rows.update(**values) != 1:
+                raise InsufficientFunds(account_type, account_id)
+
+        if credits['WALLET']:
+            wallets = []
+            for account_id, delta in credits['WALLET']:
+                wallets.append(Wallet(id=account_id, balance=F('balance') + delta, updated_at=now))
+            Wallet.objects.bulk_update(wallets, ['balance', 'updated_at'])
+        if credits['TREASURY']:
+            treasuries = [
+                CompanyTreasury(id=account_id, balance=F('balance') + delta, updated_at=now)
+                for account_id, delta in credits['TREASURY']
+            ]
+            CompanyTreasury.objects.bulk_update(treasuries, ['balance', 'updated_at'])
+
+    return journal_id
+
+
+def latest_checkpoint(account_type, account_id, currency):
+    return (
+        BalanceCheckpoint.objects
+        .filter(account_type=account_type, account_id=account_id, currency=currency)
+        .order_by('-last_entry_id')
+        .first()
+    )
+
+
+def rebuild_balance(account_type, account_id, currency):
+    """إعادة بناء رصيد حساب من آخر نقطة حفظ والقيود التالية لها فقط"""
+    checkpoint = latest_checkpoint(account_type, account_id, currency)
+    base = checkpoint.balance if checkpoint else Decimal('0')
+    last_entry_id = checkpoint.last_entry_id if checkpoint else 0
+    delta = LedgerEntry.objects.filter(
+        account_type=account_type,
+        account_id=account_id,
+        currency=currency,
+        id__gt=last_entry_id
+    ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
+    return base + delta
+
+
+def create_checkpoints(settle_seconds=60):
+    """
+    إنشاء نقاط حفظ للحسابات التي تغيرت منذ آخر تشغيل.
+    التكلفة تتناسب مع عدد القيود الجديدة فقط وليس مع كامل الدفتر.
+    القيود الأحدث من settle_seconds لا تدخل في النافذة حتى لا تفوتنا معاملات لم تُعتمد بعد.
+    """
+    since = BalanceCheckpoint.objects.aggregate(last=Max('last_entry_id'))['last'] or 0
+    cutoff = timezone.now() - timedelta(seconds=settle_seconds)
+    until = LedgerEntry.objects.filter(created_at__lte=cutoff).aggregate(last=Max('id'))['last'] or 0
+    if until <= since:
+        return 0
+
+    changes = (
+        LedgerEntry.objects
+        .filter(id__gt=since, id__lte=until)
+        .values('account_type', 'account_id', 'currency')
+        .annotate(total=Sum('amount'))
+    )
+    checkpoints = []
+    for change in changes:
+        previous = latest_checkpoint(change['account_type'], change['account_id'], change['currency'])
+        checkpoints.append(BalanceCheckpoint(
+            account_type=change['account_type'],
+            account_id=change['account_id'],
+            currency=change['currency'],
+            balance=(previous.balance if previous else Decimal('0')) + change['total'],
+            last_entry_id=until
+        ))
+    BalanceCheckpoint.objects.bulk_create(checkpoints)
+    return len(checkpoints)
+
+
+def find_drift():
+    """مقارنة الأرصدة المُسقطة بالأرصدة المعاد بناؤها من الدفتر"""
+    from apps.financials.models import CompanyTreasury
+
+    drift = []
+    accounts = (
+        ('WALLET', Wallet.objects.values_list('id', 'currency', 'balance')),
+        # الخزائن المقسمة: الرصيد هو مجموع الأرصدة الفرعية
+        ('TREASURY', CompanyTreasury.objects.with_live_balance().values_list('id', 'currency', 'live_balance')),
+    )
+    for account_type, rows in accounts:
+        for account_id, currency, balance in rows.iterator():
+            expected = rebuild_balance(account_type, account_id, currency)
+            if expected != balance:
+                drift.append({
+                    'account_type': account_type,
+                    'account_id': account_id,
+                    'currency': currency,
+                    'balance': balance,
+                    'expected': expected,
+                })
+    return drift
@@ -0,0 +1,59 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from apps.wallets.models import Transaction, CurrencyConversion, ArchivedPartition
+from apps.financials.models import CompanyTransaction
+from apps.wallets.partitioning import archive_month, is_partitioning_supported, month_start, next_month
+
+MODELS = {
+    'transaction': Transaction,
+    'conversion': CurrencyConversion,
+    'company': CompanyTransaction,
+}
+
+
+class Command(BaseCommand):
+    help = 'فصل الأشهر القديمة من جداول السجلات وأرشفتها في ملفات مضغوطة (gzip JSON Lines)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', required=True, help='أرشفة جميع الأشهر قبل هذا الشهر (YYYY-MM)')
+        parser.add_argument('--table', choices=list(MODELS), action='append', help='الجداول المطلوبة (الافتراضي: الكل)')
+
+    def handle(self, *args, **options):
+        try:
+            before = datetime.datetime.strptime(options['before'], '%Y-%m').date()
+        except ValueError:
+            raise CommandError('صيغة الشهر يجب أن تكون YYYY-MM')
+
+        for name in options['table'] or list(MODELS):
+            model = MODELS[name]
+            table = model._meta.db_table
+            for month in self.months_to_archive(model, before):
+                count = archive_month(model, month)
+                self.stdout.write(f'{table} {month:%Y-%m}: {count} صف')
+        self.stdout.write(self.style.SUCCESS('تمت الأرشفة'))
+
+    def months_to_archive(self, model, before):
+        table = model._meta.db_table
+        done = set(ArchivedPartition.objects.filter(table_name=table).values_list('month', flat=True))
+
+        if is_partitioning_supported():
+            prefix = f'{table}_p'
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                    "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = %s",
+                    [table]
+                )
+                names = [row[0] for row in cursor.fetchall() if row[0].startswith(prefix)]
+            months = sorted(datetime.datetime.strptime(n[len(prefix):], '%Y_%m').date() for n in names)
+        else:
+            oldest = model.objects.order_by('created_at').values_list('created_at', flat=True).first()
+            months = []
+            month = month_start(oldest) if oldest else before
+            while month < before:
+                months.append(month)
+                month = next_month(month)
+
+        return [m for m in months if m < before and m not in done]
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from apps.wallets.summaries import backfill
+
+
+class Command(BaseCommand):
+    help = 'إعادة بناء الملخصات اليومية للمحافظ والخزائن من جداول الحركات'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start-date', help='YYYY-MM-DD (افتراضياً: كل السجل الحي)')
+        parser.add_argument('--end-date', help='YYYY-MM-DD')
+
+    def handle(self, *args, **options):
+        start_date = end_date = None
+        if options['start_date']:
+            start_date = parse_date(options['start_date'])
+            if start_date is None:
+                raise CommandError('صيغة --start-date غير صحيحة')
+        if options['end_date']:
+            end_date = parse_date(options['end_date'])
+            if end_date is None:
+                raise CommandError('صيغة --end-date غير صحيحة')
+
+        wallets, treasuries = backfill(start_date, end_date)
+        self.stdout.write(self.style.SUCCESS(f'تم بناء {wallets} ملخص محفظة و {treasuries} ملخص خزينة'))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+from apps.wallets.partitioning import PARTITIONED_TABLES, create_partitions, is_partitioning_supported, next_month
+
+
+class Command(BaseCommand):
+    help = 'إنشاء الأقسام الشهرية القادمة للجداول المقسمة (PostgreSQL)، يُشغل شهرياً'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=3, help='عدد الأشهر القادمة المطلوب تجهيزها')
+
+    def handle(self, *args, **options):
+        if not is_partitioning_supported():
+            self.stdout.write(self.style.WARNING('قاعدة البيانات الحالية لا تدعم التقسيم، لا شيء للقيام به'))
+            return
+
+        today = timezone.now().date()
+        end = today
+        for _ in range(options['months_ahead']):
+            end = next_month(end)
+
+        with connection.cursor() as cursor:
+            for table in PARTITIONED_TABLES:
+                created = create_partitions(cursor, table, today, end)
+                self.stdout.write(f'{table}: {", ".join(created)}')
+        self.stdout.write(self.style.SUCCESS('تم تجهيز الأقسام'))
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+from apps.wallets.outbox import dispatch_batch, purge_processed
+
+
+class Command(BaseCommand):
+    help = 'تنفيذ أحداث صندوق الأحداث الصادرة (outbox) على دفعات. يعمل باستمرار ما لم يُحدد --once'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--interval', type=float, default=1.0, help='ثوان الانتظار عندما لا توجد أحداث')
+        parser.add_argument('--once', action='store_true', help='تنفيذ الأحداث المستحقة الآن ثم الخروج')
+        parser.add_argument('--purge-days', type=int, default=7, help='حذف الأحداث المنفذة الأقدم من هذه المدة')
+
+    def handle(self, *args, **options):
+        total_done = total_failed = 0
+        last_purge = 0
+        while True:
+            done, failed = dispatch_batch(options['batch_size'])
+            total_done, total_failed = total_done + done, total_failed + failed
+            if done or failed:
+                self.stdout.write(f'تم تنفيذ {done} حدث، فشل {failed}')
+
+            if time.monotonic() - last_purge > 3600:
+                purge_processed(options['purge_days'])
+                last_purge = time.monotonic()
+
+            if options['once']:
+                if done + failed < options['batch_size']:
+                    break
+                continue
+            if done + failed == 0:
+                time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(f'المجموع: {total_done} منفذ، {total_failed} فاشل'))
@@ -0,0 +1,59 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils.dateparse import parse_date
+from apps.authentication.models import User
+from apps.wallets.statements import FORMATS, export_statement
+
+
+class Command(BaseCommand):
+    help = 'تصدير كشوف حساب جميع المستخدمين (أو مستخدمين محددين) بالتوازي إلى مجلد'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--out', required=True, help='مجلد الإخراج')
+        parser.add_argument('--output', choices=list(FORMATS), default='csv', help='صيغة الملفات')
+        parser.add_argument('--gzip', action='store_true', help='ضغط الملفات')
+        parser.add_argument('--start-date', help='YYYY-MM-DD')
+        parser.add_argument('--end-date', help='YYYY-MM-DD')
+        parser.add_argument('--currency')
+        parser.add_argument('--user', type=int, action='append', help='معرف مستخدم (يمكن تكراره)')
+        parser.add_argument('--workers', type=int, default=4, help='عدد العمليات المتوازية')
+
+    def handle(self, *args, **options):
+        start_date = parse_date(options['start_date']) if options['start_date'] else None
+        end_date = parse_date(options['end_date']) if options['end_date'] else None
+        if (options['start_date'] and not start_date) or (options['end_date'] and not end_date):
+            raise CommandError('صيغة التاريخ يجب أن تكون YYYY-MM-DD')
+
+        os.makedirs(options['out'], exist_ok=True)
+        users = User.objects.order_by('id')
+        if options['user']:
+            users = users.filter(id__in=options['user'])
+        user_ids = list(users.values_list('id', flat=True))
+
+        def export_one(user_id):
+            try:
+                user = User.objects.get(id=user_id)
+                extension = FORMATS[options['output']][2] + ('.gz' if options['gzip'] else '')
+                path = os.path.join(options['out'], f'statement-{user.id}.{extension}')
+                size = 0
+                with open(path, 'wb') as f:
+                    for chunk in export_statement(
+                        user, options['output'], options['gzip'], start_date, end_date, options['currency']
+                    ):
+                        f.write(chunk)
+                        size += len(chunk)
+                return user_id, size
+            finally:
+                # كل خيط يفتح اتصاله الخاص بقاعدة البيانات
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            futures = [pool.submit(export_one, user_id) for user_id in user_ids]
+            for future in as_completed(futures):
+                user_id, size = future.result()
+                self.stdout.write(f'المستخدم {user_id}: {size} بايت')
+
+        self.stdout.write(self.style.SUCCESS(f'تم تصدير {len(user_ids)} كشف حساب إلى {options["out"]}'))
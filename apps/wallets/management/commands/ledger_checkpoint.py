@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from apps.wallets.ledger import create_checkpoints
+
+
+class Command(BaseCommand):
+    help = 'إنشاء نقاط حفظ للأرصدة من قيود دفتر الأستاذ الجديدة (يُشغل دورياً)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--settle-seconds', type=int, default=60, help='تجاهل القيود الأحدث من هذه المدة')
+
+    def handle(self, *args, **options):
+        count = create_checkpoints(settle_seconds=options['settle_seconds'])
+        self.stdout.write(self.style.SUCCESS(f'تم إنشاء {count} نقطة حفظ'))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+from apps.wallets.ledger import find_drift
+
+
+class Command(BaseCommand):
+    help = 'مقارنة أرصدة المحافظ والخزائن بالأرصدة المعاد بناؤها من دفتر الأستاذ'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='تصحيح الأرصدة المُسقطة لتطابق الدفتر')
+
+    def handle(self, *args, **options):
+        from apps.wallets.models import Wallet
+        from apps.financials.models import CompanyTreasury
+
+        drift = find_drift()
+        for d in drift:
+            self.stdout.write(
+                f"{d['account_type']}#{d['account_id']} ({d['currency']}): "
+                f"الرصيد {d['balance']} | الدفتر {d['expected']}"
+            )
+            if options['fix']:
+                if d['account_type'] == 'WALLET':
+                    Wallet.objects.filter(id=d['account_id']).update(balance=d['expected'])
+                else:
+                    # تصحيح بالفرق على صف الخزينة (يصح للخزائن المقسمة أيضاً)
+                    CompanyTreasury.objects.filter(id=d['account_id']).update(
+                        balance=F('balance') + (d['expected'] - d['balance'])
+                    )
+
+        if drift:
+            self.stdout.write(self.style.WARNING(f'عدد الحسابات غير المتطابقة: {len(drift)}'))
+        else:
+            self.stdout.write(self.style.SUCCESS('جميع الأرصدة مطابقة لدفتر الأستاذ'))
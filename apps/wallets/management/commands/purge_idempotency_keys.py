@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from apps.wallets.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = 'حذف مفاتيح منع التكرار (Idempotency-Key) المنتهية الصلاحية'
+
+    def handle(self, *args, **options):
+        deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()
+        self.stdout.write(self.style.SUCCESS(f'تم حذف {deleted} مفتاح منتهي الصلاحية'))
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:50
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallets', '0004_currencyconversion_reference_number_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=255, verbose_name='المفتاح')),
+                ('scope', models.CharField(max_length=50, verbose_name='النطاق')),
+                ('endpoint', models.CharField(max_length=100, verbose_name='المسار')),
+                ('request_hash', models.CharField(max_length=64, verbose_name='بصمة الطلب')),
+                ('status', models.CharField(choices=[('PENDING', 'قيد المعالجة'), ('COMPLETED', 'مكتمل')], default='PENDING', max_length=20, verbose_name='الحالة')),
+                ('response_status', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='رمز الاستجابة')),
+                ('response_body', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True, verbose_name='محتوى الاستجابة')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الإنشاء')),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name='تاريخ الانتهاء')),
+            ],
+            options={
+                'verbose_name': 'مفتاح منع التكرار',
+                'verbose_name_plural': 'مفاتيح منع التكرار',
+                'unique_together': {('scope', 'endpoint', 'key')},
+            },
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:51
+
+from django.db import migrations, models
+
+
+def create_opening_checkpoints(apps, schema_editor):
+    """الأرصدة الحالية تصبح نقطة البداية للدفتر (رصيد افتتاحي)"""
+    Wallet = apps.get_model('wallets', 'Wallet')
+    CompanyTreasury = apps.get_model('financials', 'CompanyTreasury')
+    BalanceCheckpoint = apps.get_model('wallets', 'BalanceCheckpoint')
+
+    checkpoints = [
+        BalanceCheckpoint(account_type='WALLET', account_id=w.id, currency=w.currency, balance=w.balance, last_entry_id=0)
+        for w in Wallet.objects.exclude(balance=0).iterator()
+    ] + [
+        BalanceCheckpoint(account_type='TREASURY', account_id=t.id, currency=t.currency, balance=t.balance, last_entry_id=0)
+        for t in CompanyTreasury.objects.exclude(balance=0).iterator()
+    ]
+    BalanceCheckpoint.objects.bulk_create(checkpoints, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallets', '0005_idempotencykey'),
+        ('financials', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BalanceCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('account_type', models.CharField(choices=[('WALLET', 'محفظة مستخدم'), ('TREASURY', 'خزينة الشركة'), ('FX', 'حساب الصرافة'), ('PROVIDER', 'مزود الخدمات'), ('EXTERNAL', 'جهة خارجية')], max_length=10, verbose_name='نوع الحساب')),
+                ('account_id', models.BigIntegerField(default=0, verbose_name='معرف الحساب')),
+                ('currency', models.CharField(choices=[('YER', 'ريال يمني'), ('USD', 'دولار أمريكي'), ('SAR', 'ريال سعودي')], max_length=3, verbose_name='العملة')),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=20, verbose_name='الرصيد')),
+                ('last_entry_id', models.BigIntegerField(default=0, verbose_name='آخر قيد')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الإنشاء')),
+            ],
+            options={
+                'verbose_name': 'نقطة حفظ رصيد',
+                'verbose_name_plural': 'نقاط حفظ الأرصدة',
+                'indexes': [models.Index(fields=['account_type', 'account_id', 'currency', '-last_entry_id'], name='wallets_bal_account_8006d3_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('journal_id', models.UUIDField(db_index=True, verbose_name='رقم القيد')),
+                ('account_type', models.CharField(choices=[('WALLET', 'محفظة مستخدم'), ('TREASURY', 'خزينة الشركة'), ('FX', 'حساب الصرافة'), ('PROVIDER', 'مزود الخدمات'), ('EXTERNAL', 'جهة خارجية')], max_length=10, verbose_name='نوع الحساب')),
+                ('account_id', models.BigIntegerField(default=0, verbose_name='معرف الحساب')),
+                ('currency', models.CharField(choices=[('YER', 'ريال يمني'), ('USD', 'دولار أمريكي'), ('SAR', 'ريال سعودي')], max_length=3, verbose_name='العملة')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=20, verbose_name='المبلغ')),
+                ('description', models.CharField(blank=True, max_length=255, verbose_name='الوصف')),
+                ('reference_number', models.CharField(blank=True, max_length=50, verbose_name='الرقم المرجعي')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='التاريخ')),
+            ],
+            options={
+                'verbose_name': 'قيد دفتر الأستاذ',
+                'verbose_name_plural': 'دفتر الأستاذ',
+                'indexes': [models.Index(fields=['account_type', 'account_id', 'currency', 'id'], name='wallets_led_account_bd3160_idx')],
+            },
+        ),
+        migrations.RunPython(create_opening_checkpoints, migrations.RunPython.noop),
+    ]
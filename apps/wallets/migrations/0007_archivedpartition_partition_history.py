@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:54
+
+from django.db import migrations, models
+
+from apps.wallets.partitioning import convert_to_partitioned
+
+
+def partition_history_tables(apps, schema_editor):
+    # PostgreSQL فقط؛ لا شيء على SQLite
+    convert_to_partitioned(schema_editor, 'wallets_transaction')
+    convert_to_partitioned(schema_editor, 'wallets_currencyconversion')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallets', '0006_ledgerentry_balancecheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedPartition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table_name', models.CharField(max_length=100, verbose_name='الجدول')),
+                ('month', models.DateField(verbose_name='الشهر')),
+                ('path', models.CharField(max_length=500, verbose_name='مسار الملف')),
+                ('row_count', models.PositiveIntegerField(default=0, verbose_name='عدد الصفوف')),
+                ('archived_at', models.DateTimeField(auto_now=True, verbose_name='تاريخ الأرشفة')),
+            ],
+            options={
+                'verbose_name': 'شهر مؤرشف',
+                'verbose_name_plural': 'الأشهر المؤرشفة',
+                'ordering': ['table_name', 'month'],
+                'unique_together': {('table_name', 'month')},
+            },
+        ),
+        migrations.RunPython(partition_history_tables, migrations.RunPython.noop),
+    ]
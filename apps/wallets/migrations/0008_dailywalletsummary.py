@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallets', '0007_archivedpartition_partition_history'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyWalletSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(choices=[('YER', 'ريال يمني'), ('USD', 'دولار أمريكي'), ('SAR', 'ريال سعودي')], max_length=3, verbose_name='العملة')),
+                ('day', models.DateField(verbose_name='اليوم')),
+                ('transaction_type', models.CharField(max_length=20, verbose_name='نوع الحركة')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='عدد الحركات')),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=20, verbose_name='المجموع')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_summaries', to=settings.AUTH_USER_MODEL, verbose_name='المستخدم')),
+            ],
+            options={
+                'verbose_name': 'ملخص يومي للمحفظة',
+                'verbose_name_plural': 'الملخصات اليومية للمحافظ',
+                'indexes': [models.Index(fields=['user', 'day'], name='wallets_dai_user_id_1a903b_idx'), models.Index(fields=['day', 'currency'], name='wallets_dai_day_217bab_idx')],
+                'unique_together': {('user', 'currency', 'day', 'transaction_type')},
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations
+from django.db.models import Exists, OuterRef
+
+
+def prune_empty_wallets(apps, schema_editor):
+    """
+    حذف المحافظ المنشأة مسبقاً والتي لم تُستخدم (رصيد صفر وبدون أي قيد في الدفتر)،
+    فالمحافظ أصبحت تُنشأ عند أول إيداع. المحافظ الصفرية التي لها قيود تبقى حتى لا تنفصل قيودها عن حسابها.
+    """
+    Wallet = apps.get_model('wallets', 'Wallet')
+    LedgerEntry = apps.get_model('wallets', 'LedgerEntry')
+
+    has_entries = LedgerEntry.objects.filter(account_type='WALLET', account_id=OuterRef('pk'))
+    empty = Wallet.objects.filter(balance=0).exclude(Exists(has_entries))
+    while True:
+        ids = list(empty.values_list('id', flat=True)[:5000])
+        if not ids:
+            break
+        Wallet.objects.filter(id__in=ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallets', '0008_dailywalletsummary'),
+    ]
+
+    operations = [
+        migrations.RunPython(prune_empty_wallets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:16
+
+import django.core.serializers.json
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallets', '0009_prune_empty_wallets'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('topic', models.CharField(max_length=100, verbose_name='النوع')),
+                ('payload', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='البيانات')),
+                ('status', models.CharField(choices=[('PENDING', 'قيد الانتظار'), ('DONE', 'تم'), ('FAILED', 'فشل')], default='PENDING', max_length=10, verbose_name='الحالة')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='عدد المحاولات')),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='موعد المحاولة التالية')),
+                ('last_error', models.TextField(blank=True, verbose_name='آخر خطأ')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الإنشاء')),
+                ('processed_at', models.DateTimeField(blank=True, null=True, verbose_name='تاريخ التنفيذ')),
+            ],
+            options={
+                'verbose_name': 'حدث صادر',
+                'verbose_name_plural': 'صندوق الأحداث الصادرة',
+                'indexes': [models.Index(fields=['status', 'available_at'], name='wallets_out_status_fec9a0_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallets', '0010_outboxevent'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UsedQuote',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quote_id', models.CharField(max_length=32, unique=True, verbose_name='معرف عرض السعر')),
+                ('reference_number', models.CharField(max_length=50, verbose_name='رقم عملية الصرف')),
+                ('used_at', models.DateTimeField(auto_now_add=True, verbose_name='تاريخ التنفيذ')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='used_quotes', to=settings.AUTH_USER_MODEL, verbose_name='المستخدم')),
+            ],
+            options={
+                'verbose_name': 'عرض سعر منفذ',
+                'verbose_name_plural': 'عروض الأسعار المنفذة',
+            },
+        ),
+    ]
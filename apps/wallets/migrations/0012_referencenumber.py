@@ -0,0 +1,86 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:10
+
+from django.db import migrations, models
+
+from apps.wallets.partitioning import (
+    REFERENCE_NUMBER_TABLES, install_reference_number_triggers, is_partitioning_supported,
+    remove_reference_number_triggers,
+)
+
+
+class SkipOnPartitioned:
+    """على PostgreSQL أنشأ convert_to_partitioned (0007) الفهرس والقيد المركب مسبقاً"""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if not is_partitioning_supported(schema_editor.connection):
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if not is_partitioning_supported(schema_editor.connection):
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class AlterField(SkipOnPartitioned, migrations.AlterField):
+    pass
+
+
+class AddConstraint(SkipOnPartitioned, migrations.AddConstraint):
+    pass
+
+
+def register_existing_references(apps, schema_editor):
+    # المشغلات بعد أي إعادة بناء للجداول في هذا الترحيل (SQLite يحذفها عند إعادة البناء)
+    with schema_editor.connection.cursor() as cursor:
+        for table in REFERENCE_NUMBER_TABLES:
+            cursor.execute(
+                f'INSERT INTO wallets_referencenumber (table_name, reference_number) '
+                f'SELECT %s, reference_number FROM "{table}" WHERE reference_number IS NOT NULL',
+                [table]
+            )
+    install_reference_number_triggers(schema_editor)
+
+
+def drop_triggers(apps, schema_editor):
+    remove_reference_number_triggers(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallets', '0011_usedquote'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReferenceNumber',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table_name', models.CharField(max_length=100, verbose_name='الجدول')),
+                ('reference_number', models.CharField(max_length=50, verbose_name='الرقم المرجعي')),
+            ],
+            options={
+                'verbose_name': 'رقم مرجعي مستخدم',
+                'verbose_name_plural': 'الأرقام المرجعية المستخدمة',
+                'unique_together': {('table_name', 'reference_number')},
+            },
+        ),
+        AlterField(
+            model_name='currencyconversion',
+            name='reference_number',
+            field=models.CharField(blank=True, db_index=True, max_length=50, null=True, verbose_name='الرقم المرجعي'),
+        ),
+        AlterField(
+            model_name='transaction',
+            name='reference_number',
+            field=models.CharField(blank=True, db_index=True, max_length=50, null=True, verbose_name='الرقم المرجعي'),
+        ),
+        AddConstraint(
+            model_name='currencyconversion',
+            constraint=models.UniqueConstraint(fields=('reference_number', 'created_at'), name='wallets_currencyconversion_ref_created_uniq'),
+        ),
+        AddConstraint(
+            model_name='transaction',
+            constraint=models.UniqueConstraint(fields=('reference_number', 'created_at'), name='wallets_transaction_ref_created_uniq'),
+        ),
+        migrations.RunPython(register_existing_references, drop_triggers),
+    ]
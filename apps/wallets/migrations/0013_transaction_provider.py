@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallets', '0012_referencenumber'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='provider',
+            field=models.CharField(blank=True, max_length=50, null=True, verbose_name='مزود الخدمة'),
+        ),
+    ]
@@ -1,6 +1,37 @@
 from django.db import models
 from django.conf import settings
 from django.core.validators import MinValueValidator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+
+def generate_reference_numbers(model, prefix, count=1):
+    """
+    توليد أرقام مرجعية فريدة بالصيغة PREFIX-YYYYMMDD-XXXXXX.
+    يتم التحقق من التكرار لكامل الدفعة باستعلام واحد بدلاً من استعلام لكل رقم.
+    """
+    import datetime
+    import random
+    import string
+
+    date_part = datetime.datetime.now().strftime('%Y%m%d')
+
+    def candidate():
+        return f"{prefix}-{date_part}-{''.join(random.choices(string.digits, k=6))}"
+
+    references = set()
+    while len(references) < count:
+        missing = count - len(references)
+        candidates = {candidate() for _ in range(missing)} - references
+        # سجل الأرقام المستخدمة يشمل الصفوف المؤرشفة وجميع الأقسام
+        taken = set(
+            ReferenceNumber.objects.filter(
+                table_name=model._meta.db_table, reference_number__in=candidates
+            ).values_list('reference_number', flat=True)
+        )
+        references |= candidates - taken
+    return list(references)
+
 
 class Wallet(models.Model):
     CURRENCY_CHOICES = [
@@ -54,27 +85,26 @@ class Transaction(models.Model):
     transaction_type = models.CharField(max_length=20, choices=TRANSACTION_TYPES)
     description = models.TextField(blank=True)
     status = models.CharField(max_length=20, default='SUCCESS')
-    reference_number = models.CharField(max_length=50, unique=True, null=True, blank=True, verbose_name="الرقم المرجعي")
+    # فريد على مستوى الجدول عبر ReferenceNumber (الجدول مقسم حسب created_at على PostgreSQL)
+    reference_number = models.CharField(max_length=50, db_index=True, null=True, blank=True, verbose_name="الرقم المرجعي")
     created_at = models.DateTimeField(auto_now_add=True)
     
     # For P2P
     to_user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='received_transactions')
 
+    # مزود السداد الذي نفذ العملية (WITHDRAW)؛ فارغ للحركات الأقدم (كلها عبر الزاجل)
+    provider = models.CharField(max_length=50, null=True, blank=True, verbose_name="مزود الخدمة")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['reference_number', 'created_at'], name='wallets_transaction_ref_created_uniq'),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.reference_number:
             # Generate unique reference number: TRX-YYYYMMDD-XXXXXX
-            import datetime
-            import random
-            import string
-            date_part = datetime.datetime.now().strftime('%Y%m%d')
-            random_part = ''.join(random.choices(string.digits, k=6))
-            self.reference_number = f"TRX-{date_part}-{random_part}"
-            
-            # Ensure uniqueness
-            while Transaction.objects.filter(reference_number=self.reference_number).exists():
-                random_part = ''.join(random.choices(string.digits, k=6))
-                self.reference_number = f"TRX-{date_part}-{random_part}"
-        
+            self.reference_number = generate_reference_numbers(Transaction, 'TRX')[0]
+
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -118,31 +148,206 @@ class CurrencyConversion(models.Model):
     exchange_rate = models.DecimalField(max_digits=20, decimal_places=6, verbose_name="سعر الصرف المستخدم")
     amount_received = models.DecimalField(max_digits=20, decimal_places=2, verbose_name="المبلغ المستلم")
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING', verbose_name="الحالة")
-    reference_number = models.CharField(max_length=50, unique=True, null=True, blank=True, verbose_name="الرقم المرجعي")
+    # فريد على مستوى الجدول عبر ReferenceNumber (الجدول مقسم حسب created_at على PostgreSQL)
+    reference_number = models.CharField(max_length=50, db_index=True, null=True, blank=True, verbose_name="الرقم المرجعي")
     notes = models.TextField(blank=True, verbose_name="ملاحظات")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="تاريخ الإنشاء")
     
     class Meta:
         ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['reference_number', 'created_at'], name='wallets_currencyconversion_ref_created_uniq'),
+        ]
         verbose_name = "عملية تحويل عملة"
         verbose_name_plural = "عمليات تحويل العملات"
     
     def save(self, *args, **kwargs):
         if not self.reference_number:
             # Generate unique reference number: EXC-YYYYMMDD-XXXXXX
-            import datetime
-            import random
-            import string
-            date_part = datetime.datetime.now().strftime('%Y%m%d')
-            random_part = ''.join(random.choices(string.digits, k=6))
-            self.reference_number = f"EXC-{date_part}-{random_part}"
-            
-            # Ensure uniqueness
-            while CurrencyConversion.objects.filter(reference_number=self.reference_number).exists():
-                random_part = ''.join(random.choices(string.digits, k=6))
-                self.reference_number = f"EXC-{date_part}-{random_part}"
-        
+            self.reference_number = generate_reference_numbers(CurrencyConversion, 'EXC')[0]
+
         super().save(*args, **kwargs)
     
     def __str__(self):
         return f"{self.user.username}: {self.amount_sent} {self.from_currency} → {self.amount_received} {self.to_currency} - {self.reference_number}"
+
+class UsedQuote(models.Model):
+    """
+    عروض الأسعار الموقعة (quotes.py) التي نُفذت؛ quote_id فريد حتى لا يُنفذ العرض نفسه مرتين.
+    جدول صغير غير مقسم لأن القيد الفريد في wallets_currencyconversion يجب أن يحتوي created_at.
+    """
+    quote_id = models.CharField(max_length=32, unique=True, verbose_name="معرف عرض السعر")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='used_quotes', verbose_name="المستخدم")
+    reference_number = models.CharField(max_length=50, verbose_name="رقم عملية الصرف")
+    used_at = models.DateTimeField(auto_now_add=True, verbose_name="تاريخ التنفيذ")
+
+    class Meta:
+        verbose_name = "عرض سعر منفذ"
+        verbose_name_plural = "عروض الأسعار المنفذة"
+
+    def __str__(self):
+        return f"{self.quote_id} -> {self.reference_number}"
+
+class IdempotencyKey(models.Model):
+    """الاستجابات المحفوظة لطلبات POST المالية حسب مفتاح Idempotency-Key"""
+    STATUS_CHOICES = [
+        ('PENDING', 'قيد المعالجة'),
+        ('COMPLETED', 'مكتمل'),
+    ]
+
+    key = models.CharField(max_length=255, verbose_name="المفتاح")
+    scope = models.CharField(max_length=50, verbose_name="النطاق")
+    endpoint = models.CharField(max_length=100, verbose_name="المسار")
+    request_hash = models.CharField(max_length=64, verbose_name="بصمة الطلب")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING', verbose_name="الحالة")
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name="رمز الاستجابة")
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder, verbose_name="محتوى الاستجابة")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="تاريخ الإنشاء")
+    expires_at = models.DateTimeField(db_index=True, verbose_name="تاريخ الانتهاء")
+
+    class Meta:
+        unique_together = ['scope', 'endpoint', 'key']
+        verbose_name = "مفتاح منع التكرار"
+        verbose_name_plural = "مفاتيح منع التكرار"
+
+    def __str__(self):
+        return f"{self.endpoint} - {self.key} ({self.status})"
+
+class LedgerEntry(models.Model):
+    """
+    قيد في دفتر الأستاذ (قيد مزدوج، إضافة فقط).
+    كل عملية مالية هي مجموعة قيود (journal) مجموعها صفر لكل عملة،
+    والرصيد في Wallet و CompanyTreasury هو إسقاط (projection) لهذه القيود.
+    """
+    ACCOUNT_TYPES = [
+        ('WALLET', 'محفظة مستخدم'),
+        ('TREASURY', 'خزينة الشركة'),
+        ('FX', 'حساب الصرافة'),
+        ('PROVIDER', 'مزود الخدمات'),
+        ('EXTERNAL', 'جهة خارجية'),
+    ]
+
+    journal_id = models.UUIDField(db_index=True, verbose_name="رقم القيد")
+    account_type = models.CharField(max_length=10, choices=ACCOUNT_TYPES, verbose_name="نوع الحساب")
+    # معرف المحفظة أو الخزينة، و 0 للحسابات النظامية (FX, PROVIDER, EXTERNAL)
+    account_id = models.BigIntegerField(default=0, verbose_name="معرف الحساب")
+    currency = models.CharField(max_length=3, choices=Wallet.CURRENCY_CHOICES, verbose_name="العملة")
+    # التغير في رصيد الحساب: موجب = زيادة، سالب = نقص
+    amount = models.DecimalField(max_digits=20, decimal_places=2, verbose_name="المبلغ")
+    description = models.CharField(max_length=255, blank=True, verbose_name="الوصف")
+    reference_number = models.CharField(max_length=50, blank=True, verbose_name="الرقم المرجعي")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="التاريخ")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['account_type', 'account_id', 'currency', 'id']),
+        ]
+        verbose_name = "قيد دفتر الأستاذ"
+        verbose_name_plural = "دفتر الأستاذ"
+
+    def __str__(self):
+        return f"{self.account_type}#{self.account_id} {self.amount} {self.currency}"
+
+class BalanceCheckpoint(models.Model):
+    """نقطة حفظ لرصيد حساب حتى قيد معين، لإعادة بناء الرصيد من القيود التالية فقط"""
+    account_type = models.CharField(max_length=10, choices=LedgerEntry.ACCOUNT_TYPES, verbose_name="نوع الحساب")
+    account_id = models.BigIntegerField(default=0, verbose_name="معرف الحساب")
+    currency = models.CharField(max_length=3, choices=Wallet.CURRENCY_CHOICES, verbose_name="العملة")
+    balance = models.DecimalField(max_digits=20, decimal_places=2, verbose_name="الرصيد")
+    last_entry_id = models.BigIntegerField(default=0, verbose_name="آخر قيد")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="تاريخ الإنشاء")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['account_type', 'account_id', 'currency', '-last_entry_id']),
+        ]
+        verbose_name = "نقطة حفظ رصيد"
+        verbose_name_plural = "نقاط حفظ الأرصدة"
+
+    def __str__(self):
+        return f"{self.account_type}#{self.account_id} {self.balance} {self.currency} @ {self.last_entry_id}"
+
+class ArchivedPartition(models.Model):
+    """الأشهر التي تم فصلها من الجداول المقسمة وأرشفتها في ملفات مضغوطة"""
+    table_name = models.CharField(max_length=100, verbose_name="الجدول")
+    month = models.DateField(verbose_name="الشهر")
+    path = models.CharField(max_length=500, verbose_name="مسار الملف")
+    row_count = models.PositiveIntegerField(default=0, verbose_name="عدد الصفوف")
+    archived_at = models.DateTimeField(auto_now=True, verbose_name="تاريخ الأرشفة")
+
+    class Meta:
+        unique_together = ['table_name', 'month']
+        ordering = ['table_name', 'month']
+        verbose_name = "شهر مؤرشف"
+        verbose_name_plural = "الأشهر المؤرشفة"
+
+    def __str__(self):
+        return f"{self.table_name} - {self.month:%Y-%m} ({self.row_count})"
+
+class ReferenceNumber(models.Model):
+    """
+    الأرقام المرجعية المستخدمة في الجداول المقسمة (فريدة لكل جدول).
+    تُضاف بمشغلات قاعدة البيانات (partitioning.install_reference_number_triggers) وتبقى بعد
+    الأرشفة حتى لا يُعاد استخدام رقم مؤرشف.
+    """
+    table_name = models.CharField(max_length=100, verbose_name="الجدول")
+    reference_number = models.CharField(max_length=50, verbose_name="الرقم المرجعي")
+
+    class Meta:
+        unique_together = ['table_name', 'reference_number']
+        verbose_name = "رقم مرجعي مستخدم"
+        verbose_name_plural = "الأرقام المرجعية المستخدمة"
+
+    def __str__(self):
+        return f"{self.table_name}: {self.reference_number}"
+
+class DailyWalletSummary(models.Model):
+    """ملخص يومي مُجمّع لحركات المستخدم حسب العملة والنوع (يُحدث تزايدياً مع كل حركة)"""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='daily_summaries', verbose_name="المستخدم")
+    currency = models.CharField(max_length=3, choices=Wallet.CURRENCY_CHOICES, verbose_name="العملة")
+    day = models.DateField(verbose_name="اليوم")
+    transaction_type = models.CharField(max_length=20, verbose_name="نوع الحركة")
+    count = models.PositiveIntegerField(default=0, verbose_name="عدد الحركات")
+    total = models.DecimalField(max_digits=20, decimal_places=2, default=0, verbose_name="المجموع")
+
+    class Meta:
+        unique_together = ['user', 'currency', 'day', 'transaction_type']
+        indexes = [
+            models.Index(fields=['user', 'day']),
+            models.Index(fields=['day', 'currency']),
+        ]
+        verbose_name = "ملخص يومي للمحفظة"
+        verbose_name_plural = "الملخصات اليومية للمحافظ"
+
+    def __str__(self):
+        return f"{self.user_id} {self.day} {self.transaction_type} {self.currency}: {self.count} / {self.total}"
+
+class OutboxEvent(models.Model):
+    """
+    حدث ينتظر التنفيذ بعد اعتماد المعاملة (إشعار، إبطال كاش، webhook...).
+    يُكتب في نفس معاملة القيود (outbox.publish)، ويُنفذ لاحقاً بأمر dispatch_outbox (مرة واحدة على الأقل).
+    """
+    STATUS_CHOICES = [
+        ('PENDING', 'قيد الانتظار'),
+        ('DONE', 'تم'),
+        ('FAILED', 'فشل'),
+    ]
+
+    topic = models.CharField(max_length=100, verbose_name="النوع")
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder, verbose_name="البيانات")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING', verbose_name="الحالة")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="عدد المحاولات")
+    available_at = models.DateTimeField(default=timezone.now, verbose_name="موعد المحاولة التالية")
+    last_error = models.TextField(blank=True, verbose_name="آخر خطأ")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="تاريخ الإنشاء")
+    processed_at = models.DateTimeField(null=True, blank=True, verbose_name="تاريخ التنفيذ")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'available_at']),
+        ]
+        verbose_name = "حدث صادر"
+        verbose_name_plural = "صندوق الأحداث الصادرة"
+
+    def __str__(self):
+        return f"{self.topic} #{self.id} ({self.status})"
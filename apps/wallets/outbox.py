@@ -0,0 +1,110 @@
+"""
+صندوق الأحداث الصادرة (Transactional Outbox).
+
+الآثار الجانبية للتحويلات (إشعار المستلم، إبطال الكاش، webhooks) لا تُنفذ داخل الطلب:
+- publish يكتب صف OutboxEvent داخل نفس transaction.atomic الذي يكتب القيود،
+  فإما أن يُعتمد الحدث مع التحويل أو يُلغى معه.
+- dispatch_batch (أمر dispatch_outbox) يحجز دفعة بـ SELECT ... FOR UPDATE SKIP LOCKED
+  حتى يعمل أكثر من موزع بالتوازي، وينفذ معالجات النوع (topic) ثم يعلم الحدث كمنفذ.
+- التسليم مرة واحدة على الأقل: الحدث قد يُنفذ مرتين (مثلاً توقف الموزع قبل الاعتماد)،
+  فيجب أن تتحمل المعالجات التكرار.
+- فشل المعالج: إعادة المحاولة بتأخير متزايد حتى OUTBOX_MAX_ATTEMPTS ثم الحالة FAILED.
+
+المعالجات تُسجل بـ @handler('topic') في أي تطبيق (apps/wallets/handlers.py مثال).
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboxEvent
+from .ledger import to_amount
+
+_handlers = {}
+
+
+def handler(topic):
+    """تسجيل دالة معالجة لنوع حدث: func(payload, event)"""
+    def register(func):
+        _handlers.setdefault(topic, []).append(func)
+        return func
+    return register
+
+
+def handlers_for(topic):
+    return list(_handlers.get(topic, []))
+
+
+def publish(topic, payload):
+    """إضافة حدث (يُستدعى داخل معاملة العملية نفسها)"""
+    return OutboxEvent.objects.create(topic=topic, payload=payload)
+
+
+def publish_many(events):
+    """events: قائمة (topic, payload) بجملة INSERT واحدة"""
+    return OutboxEvent.objects.bulk_create([OutboxEvent(topic=t, payload=p) for t, p in events])
+
+
+TRANSFER_RECEIVED = 'transfer.received'
+
+
+def transfer_received(user_id, amount, currency, sender, reference_number=''):
+    """حدث استلام حوالة: (topic, payload) لـ publish أو publish_many"""
+    return TRANSFER_RECEIVED, {
+        'user_id': user_id,
+        'amount': str(to_amount(amount)),
+        'currency': currency,
+        'sender': sender,
+        'reference_number': reference_number,
+    }
+
+
+def _backoff(attempts):
+    base = getattr(settings, 'OUTBOX_RETRY_BASE_SECONDS', 5)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), getattr(settings, 'OUTBOX_RETRY_MAX_SECONDS', 3600)))
+
+
+def dispatch_batch(batch_size=100):
+    """تنفيذ دفعة من الأحداث المستحقة. تُرجع (المنفذة، الفاشلة)"""
+    max_attempts = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 10)
+    done = failed = 0
+
+    with transaction.atomic():
+        events = list(
+            OutboxEvent.objects.select_for_update(skip_locked=True)
+            .filter(status='PENDING', available_at__lte=timezone.now())
+            .order_by('id')[:batch_size]
+        )
+        for event in events:
+            event.attempts += 1
+            try:
+                # نقطة حفظ لكل حدث: فشل معالج يلغي آثاره فقط وليس آثار باقي الدفعة
+                with transaction.atomic():
+                    for func in handlers_for(event.topic):
+                        func(event.payload, event)
+            except Exception as e:
+                print(f"❌ Outbox {event.topic} #{event.id}: {e}")
+                event.last_error = f"{type(e).__name__}: {e}"[:2000]
+                if event.attempts >= max_attempts:
+                    event.status = 'FAILED'
+                else:
+                    event.available_at = timezone.now() + _backoff(event.attempts)
+                failed += 1
+            else:
+                event.status = 'DONE'
+                event.processed_at = timezone.now()
+                event.last_error = ''
+                done += 1
+
+        OutboxEvent.objects.bulk_update(
+            events, ['status', 'attempts', 'available_at', 'last_error', 'processed_at']
+        )
+    return done, failed
+
+
+def purge_processed(days):
+    """حذف الأحداث المنفذة الأقدم من days يوماً"""
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = OutboxEvent.objects.filter(status='DONE', processed_at__lt=cutoff).delete()
+    return deleted
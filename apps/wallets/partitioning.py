@@ -0,0 +1,290 @@
+"""
+تقسيم جداول السجلات الكبيرة شهرياً حسب created_at وأرشفة الأشهر القديمة.
+
+- على PostgreSQL: الجداول مقسمة تقسيماً تصريحياً (PARTITION BY RANGE) بقسم لكل شهر،
+  والأرشفة تفصل القسم (DETACH) وتكتبه إلى ملف مضغوط ثم تحذفه.
+- على قواعد البيانات الأخرى (SQLite في التطوير): لا يوجد تقسيم فعلي، والأرشفة تنقل صفوف الشهر
+  إلى ملف مضغوط ثم تحذفها من الجدول.
+
+الملفات بصيغة JSON Lines مضغوطة (gzip) في ARCHIVE_ROOT/<table>/<YYYY-MM>.jsonl.gz
+
+القيد الفريد في جدول مقسم يجب أن يحتوي مفتاح التقسيم، فـ reference_number فريد مع created_at
+فقط في الجدول نفسه، وتفرده على مستوى الجدول كله في جدول غير مقسم (ReferenceNumber) تملؤه
+مشغلات قاعدة البيانات (install_reference_number_triggers).
+"""
+import datetime
+import gzip
+import json
+import os
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils import timezone
+
+# مواصفات الجداول المقسمة: المفاتيح الأجنبية والفهارس والقيود (بأسمائها في نماذج Django)
+# التي يجب إعادة إنشائها على الجدول الأب.
+# referenced_by: قيود المفاتيح الأجنبية في جداول أخرى التي تشير إلى الجدول [(الجدول، اسم القيد)]؛
+# تُحذف بالاسم قبل حذف الجدول القديم، وأي قيد غير مذكور يوقف الترحيل بدلاً من حذفه بصمت.
+PARTITIONED_TABLES = {
+    'wallets_transaction': {
+        'foreign_keys': {'user_id': 'authentication_user', 'to_user_id': 'authentication_user'},
+        'indexes': [('user_id', 'created_at'), ('to_user_id',), ('reference_number',)],
+        'unique': {'wallets_transaction_ref_created_uniq': ('reference_number', 'created_at')},
+        'referenced_by': [],
+    },
+    'wallets_currencyconversion': {
+        'foreign_keys': {'user_id': 'authentication_user'},
+        'indexes': [('user_id', 'created_at'), ('reference_number',)],
+        'unique': {'wallets_currencyconversion_ref_created_uniq': ('reference_number', 'created_at')},
+        'referenced_by': [],
+    },
+    'financials_companytransaction': {
+        'foreign_keys': {'treasury_id': 'financials_companytreasury'},
+        'indexes': [('treasury_id', 'created_at')],
+        'unique': {},
+        'referenced_by': [],
+    },
+}
+
+# الجداول التي تُسجل أرقامها المرجعية في wallets_referencenumber
+REFERENCE_NUMBER_TABLES = ('wallets_transaction', 'wallets_currencyconversion')
+
+
+def is_partitioning_supported(conn=None):
+    return (conn or connection).vendor == 'postgresql'
+
+
+def month_start(value):
+    return datetime.date(value.year, value.month, 1)
+
+
+def next_month(value):
+    return datetime.date(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    return f"{table}_p{month:%Y_%m}"
+
+
+def create_partitions(cursor, table, start, end):
+    """إنشاء الأقسام الشهرية من start حتى end (شاملاً) إن لم تكن موجودة"""
+    month = month_start(start)
+    created = []
+    while month <= end:
+        name = partition_name(table, month)
+        cursor.execute(
+            f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{table}" '
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month(month).isoformat()}')"
+        )
+        created.append(name)
+        month = next_month(month)
+    return created
+
+
+def convert_to_partitioned(schema_editor, table, months_ahead=3):
+    """
+    تحويل جدول عادي إلى جدول مقسم شهرياً (PostgreSQL فقط) مع نسخ البيانات الحالية.
+    المفتاح الأساسي يصبح (id, created_at) لأن PostgreSQL يشترط احتواءه على مفتاح التقسيم،
+    والتسلسل (sequence) يضمن بقاء id فريداً على مستوى الجدول.
+    """
+    if not is_partitioning_supported(schema_editor.connection):
+        return
+
+    spec = PARTITIONED_TABLES[table]
+    legacy = f"{table}_legacy"
+    sequence = f"{table}_part_id_seq"
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE "{table}" RENAME TO "{legacy}"')
+        cursor.execute(
+            f'CREATE TABLE "{table}" (LIKE "{legacy}" INCLUDING DEFAULTS EXCLUDING IDENTITY) '
+            f'PARTITION BY RANGE (created_at)'
+        )
+        cursor.execute(f'CREATE SEQUENCE "{sequence}" OWNED BY "{table}".id')
+        cursor.execute(f'SELECT setval(\'"{sequence}"\', COALESCE((SELECT MAX(id) FROM "{legacy}"), 0) + 1, false)')
+        cursor.execute(f'ALTER TABLE "{table}" ALTER COLUMN id SET DEFAULT nextval(\'"{sequence}"\')')
+        cursor.execute(f'ALTER TABLE "{table}" ADD PRIMARY KEY (id, created_at)')
+
+        for column, target in spec['foreign_keys'].items():
+            cursor.execute(
+                f'ALTER TABLE "{table}" ADD FOREIGN KEY ({column}) REFERENCES "{target}" (id) '
+                f'DEFERRABLE INITIALLY DEFERRED'
+            )
+        for columns in spec['indexes']:
+            cursor.execute(f'CREATE INDEX ON "{table}" ({", ".join(columns)})')
+        for name, columns in spec['unique'].items():
+            cursor.execute(f'ALTER TABLE "{table}" ADD CONSTRAINT "{name}" UNIQUE ({", ".join(columns)})')
+
+        cursor.execute(f'SELECT MIN(created_at) FROM "{legacy}"')
+        oldest = cursor.fetchone()[0]
+        today = timezone.now().date()
+        end = today
+        for _ in range(months_ahead):
+            end = next_month(end)
+        create_partitions(cursor, table, oldest.date() if oldest else today, end)
+        cursor.execute(f'CREATE TABLE IF NOT EXISTS "{table}_default" PARTITION OF "{table}" DEFAULT')
+
+        cursor.execute(f'INSERT INTO "{table}" SELECT * FROM "{legacy}"')
+        for referencing_table, constraint in spec['referenced_by']:
+            cursor.execute(f'ALTER TABLE "{referencing_table}" DROP CONSTRAINT "{constraint}"')
+        # بدون CASCADE: إذا بقي قيد يشير إلى الجدول القديم يفشل الترحيل ويُذكر القيد في الخطأ
+        cursor.execute(f'DROP TABLE "{legacy}"')
+
+
+def install_reference_number_triggers(schema_editor):
+    """
+    مشغلات تسجل reference_number لكل صف جديد (أو معدل) في wallets_referencenumber، فيفشل
+    الإدراج بـ IntegrityError إذا كان الرقم مستخدماً في نفس الجدول (ولو في قسم آخر أو مؤرشف).
+    PostgreSQL و SQLite فقط. آمنة للتكرار: يجب استدعاؤها مجدداً بعد أي ترحيل يعيد بناء
+    الجدول على SQLite لأن إعادة البناء تحذف المشغلات.
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute("""
+            CREATE OR REPLACE FUNCTION wallets_register_reference_number() RETURNS trigger AS $$
+            BEGIN
+                IF NEW.reference_number IS NULL THEN
+                    RETURN NULL;
+                END IF;
+                IF TG_OP = 'UPDATE' THEN
+                    IF NEW.reference_number IS NOT DISTINCT FROM OLD.reference_number THEN
+                        RETURN NULL;
+                    END IF;
+                END IF;
+                -- TG_TABLE_NAME هو اسم القسم، لذا يُمرر اسم الجدول الأب كمعامل
+                INSERT INTO wallets_referencenumber (table_name, reference_number)
+                VALUES (TG_ARGV[0], NEW.reference_number);
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+        """)
+        for table in REFERENCE_NUMBER_TABLES:
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS "{table}_reference_number" ON "{table}"')
+            schema_editor.execute(
+                f'CREATE TRIGGER "{table}_reference_number" AFTER INSERT OR UPDATE OF reference_number '
+                f'ON "{table}" FOR EACH ROW EXECUTE FUNCTION wallets_register_reference_number(\'{table}\')'
+            )
+    elif vendor == 'sqlite':
+        for table in REFERENCE_NUMBER_TABLES:
+            register = (
+                f"INSERT INTO wallets_referencenumber (table_name, reference_number) "
+                f"VALUES ('{table}', NEW.reference_number);"
+            )
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS "{table}_reference_number_insert"')
+            schema_editor.execute(
+                f'CREATE TRIGGER "{table}_reference_number_insert" AFTER INSERT ON "{table}" '
+                f'WHEN NEW.reference_number IS NOT NULL BEGIN {register} END'
+            )
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS "{table}_reference_number_update"')
+            schema_editor.execute(
+                f'CREATE TRIGGER "{table}_reference_number_update" AFTER UPDATE OF reference_number ON "{table}" '
+                f'WHEN NEW.reference_number IS NOT NULL AND NEW.reference_number IS NOT OLD.reference_number '
+                f'BEGIN {register} END'
+            )
+
+
+def remove_reference_number_triggers(schema_editor):
+    vendor = schema_editor.connection.vendor
+    for table in REFERENCE_NUMBER_TABLES:
+        if vendor == 'postgresql':
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS "{table}_reference_number" ON "{table}"')
+        elif vendor == 'sqlite':
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS "{table}_reference_number_insert"')
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS "{table}_reference_number_update"')
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP FUNCTION IF EXISTS wallets_register_reference_number()')
+
+
+def archive_path(table, month):
+    root = getattr(settings, 'ARCHIVE_ROOT', os.path.join(settings.BASE_DIR, 'archive'))
+    return os.path.join(root, table, f"{month:%Y-%m}.jsonl.gz")
+
+
+def _write_rows(path, columns, rows):
+    """كتابة الصفوف إلى ملف مؤقت ثم إعادة تسميته، حتى لا يبقى ملف ناقص عند الفشل"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    count = 0
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+        for row in rows:
+            f.write(json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder, ensure_ascii=False))
+            f.write('\n')
+            count += 1
+    os.replace(tmp_path, path)
+    return count
+
+
+def _fetch_rows(cursor, batch_size=2000):
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield from rows
+
+
+def archive_month(model, month):
+    """
+    أرشفة شهر كامل من جدول مقسم. يتم كل شيء داخل معاملة واحدة:
+    إذا فشلت الكتابة يتم التراجع عن الفصل/الحذف ويبقى الشهر في قاعدة البيانات.
+    """
+    from .models import ArchivedPartition
+
+    table = model._meta.db_table
+    month = month_start(month)
+    path = archive_path(table, month)
+    columns = [f.column for f in model._meta.concrete_fields]
+
+    with transaction.atomic():
+        if is_partitioning_supported():
+            name = partition_name(table, month)
+            with connection.cursor() as cursor:
+                cursor.execute(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"')
+                cursor.execute(f'SELECT {", ".join(columns)} FROM "{name}" ORDER BY created_at')
+                count = _write_rows(path, columns, _fetch_rows(cursor))
+                cursor.execute(f'DROP TABLE "{name}"')
+        else:
+            # نفس حدود أقسام PostgreSQL (بداية الشهر بتوقيت UTC)
+            start = datetime.datetime.combine(month, datetime.time.min, tzinfo=datetime.timezone.utc)
+            end = datetime.datetime.combine(next_month(month), datetime.time.min, tzinfo=datetime.timezone.utc)
+            rows = model.objects.filter(created_at__gte=start, created_at__lt=end).order_by('created_at')
+            count = _write_rows(path, columns, rows.values_list(*columns).iterator(chunk_size=2000))
+            rows.delete()
+
+        ArchivedPartition.objects.update_or_create(
+            table_name=table,
+            month=month,
+            defaults={'path': path, 'row_count': count}
+        )
+    return count
+
+
+def archived_months(table, start_date, end_date=None):
+    """الأشهر المؤرشفة التي تتقاطع مع الفترة المطلوبة (جدول صغير، استعلام واحد)"""
+    from .models import ArchivedPartition
+
+    months = ArchivedPartition.objects.filter(table_name=table, month__gte=month_start(start_date))
+    if end_date:
+        months = months.filter(month__lte=end_date)
+    return list(months.order_by('month'))
+
+
+def iter_archived_rows(table, start_date, end_date=None, **filters):
+    """
+    قراءة الصفوف المؤرشفة للفترة المطلوبة مع تصفية بسيطة بالمساواة (مثل user_id=5).
+    يتم فتح ملفات الأشهر المتقاطعة مع الفترة فقط.
+    """
+    for partition in archived_months(table, start_date, end_date):
+        if not os.path.exists(partition.path):
+            continue
+        with gzip.open(partition.path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                row = json.loads(line)
+                if any(row.get(k) != v for k, v in filters.items()):
+                    continue
+                created = datetime.datetime.fromisoformat(row['created_at'])
+                day = timezone.localtime(created).date()
+                if day < start_date or (end_date and day > end_date):
+                    continue
+                row['created_at'] = created
+                yield row
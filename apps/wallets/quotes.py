@@ -0,0 +1,112 @@
+"""
+عروض أسعار الصرف الموقعة (Quote Tokens).
+
+- GET quote/ يحسب السعر من مصفوفة الأسعار في الذاكرة (rate_matrix) ويعيد رمزاً موقعاً
+  (django.core.signing) يحمل: المستخدم، الزوج، المبلغ، السعر، المبلغ المستلم، الانتهاء.
+  لا يُكتب شيء في قاعدة البيانات؛ التوقيع هو الضمان.
+- convert/ مع quote يتحقق من التوقيع والمدة (FX_QUOTE_TTL_SECONDS) وينفذ بالسعر المثبت
+  دون قراءة ExchangeRate. quote_id يُسجل في UsedQuote (فريد) فلا يُنفذ العرض مرتين.
+
+المصفوفة لكل عملية (process): تُبطل عند حفظ/حذف ExchangeRate في نفس العملية (signals.py)،
+ويُتحقق من ختم النسخة (أكبر updated_at وعدد الصفوف) كل FX_RATE_MATRIX_TTL_SECONDS
+حتى تظهر تعديلات العمليات الأخرى.
+"""
+import threading
+import time
+import uuid
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import Count, Max
+
+from .ledger import to_amount
+from .models import ExchangeRate
+
+SALT = 'wallets.fx-quote'
+
+_matrix = {'stamp': None, 'checked_at': 0.0, 'rates': {}}
+_matrix_lock = threading.Lock()
+
+
+class QuoteError(ValueError):
+    """عرض غير صالح: code للعميل ورسالة عربية"""
+
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+def _ttl():
+    return getattr(settings, 'FX_QUOTE_TTL_SECONDS', 30)
+
+
+def _version_stamp():
+    version = ExchangeRate.objects.aggregate(last=Max('updated_at'), count=Count('id'))
+    return f"{version['last']}|{version['count']}"
+
+
+def invalidate_matrix():
+    with _matrix_lock:
+        _matrix['stamp'] = None
+        _matrix['checked_at'] = 0.0
+
+
+def rate_matrix():
+    """{(من، إلى): سعر الشراء} للأسعار النشطة"""
+    now = time.monotonic()
+    with _matrix_lock:
+        if _matrix['stamp'] is not None and now - _matrix['checked_at'] < getattr(settings, 'FX_RATE_MATRIX_TTL_SECONDS', 5):
+            return _matrix['rates']
+
+    stamp = _version_stamp()
+    with _matrix_lock:
+        if stamp != _matrix['stamp']:
+            _matrix['rates'] = {
+                (r['from_currency'], r['to_currency']): r['buy_rate']
+                for r in ExchangeRate.objects.filter(is_active=True).values('from_currency', 'to_currency', 'buy_rate')
+            }
+            _matrix['stamp'] = stamp
+        _matrix['checked_at'] = now
+        return _matrix['rates']
+
+
+def issue_quote(user, from_currency, to_currency, amount):
+    """رمز موقع لعرض صرف المبلغ بالسعر الحالي. تُرجع (الرمز، بيانات العرض)"""
+    try:
+        amount = to_amount(amount)
+    except (InvalidOperation, TypeError, ValueError):
+        raise QuoteError('invalid_amount', 'المبلغ غير صالح')
+    if amount <= 0:
+        raise QuoteError('invalid_amount', 'المبلغ غير صالح')
+
+    rate = rate_matrix().get((from_currency, to_currency))
+    if rate is None:
+        raise QuoteError('rate_unavailable', 'سعر الصرف غير متوفر')
+
+    quote = {
+        'quote_id': uuid.uuid4().hex,
+        'user_id': user.pk,
+        'from_currency': from_currency,
+        'to_currency': to_currency,
+        'amount': str(amount),
+        'exchange_rate': str(rate),
+        'amount_received': str(to_amount(amount * rate)),
+        'expires_at': int(time.time()) + _ttl(),
+    }
+    return signing.dumps(quote, salt=SALT), quote
+
+
+def verify_quote(token, user):
+    """بيانات العرض بعد التحقق من التوقيع والمدة والمستخدم (المبالغ Decimal)"""
+    try:
+        quote = signing.loads(token, salt=SALT, max_age=_ttl())
+    except signing.SignatureExpired:
+        raise QuoteError('quote_expired', 'انتهت صلاحية عرض السعر، يرجى طلب عرض جديد')
+    except signing.BadSignature:
+        raise QuoteError('invalid_quote', 'عرض السعر غير صالح')
+    if quote.get('user_id') != user.pk:
+        raise QuoteError('invalid_quote', 'عرض السعر غير صالح')
+    for key in ('amount', 'exchange_rate', 'amount_received'):
+        quote[key] = Decimal(quote[key])
+    return quote
@@ -0,0 +1,205 @@
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Wallet, Transaction, generate_reference_numbers
+from .ledger import post_journal, wallet_posting, materialize_wallets, to_amount
+from .summaries import record_transactions
+from .outbox import publish_many, transfer_received
+from apps.authentication.models import User
+
+
+
+def normalize_phone(phone):
+    """إرجاع أرقام الهاتف فقط (بدون مسافات أو رموز)"""
+    return ''.join([c for c in str(phone) if c.isdigit()])
+
+
+def resolve_recipients(sender, items):
+    """
+    تحديد المستلمين لمجموعة تحويلات دفعة واحدة.
+    يتم البحث بالمعرفات بالاستعلام الأول، وبأرقام الهواتف (مطابقة تامة أو آخر 9 أرقام) بالاستعلام الثاني
+    بدلاً من استعلام أو اثنين لكل مستلم.
+    """
+    ids = set()
+    phones = set()
+    for item in items:
+        if item.get('phone'):
+            phones.add(normalize_phone(item['phone']))
+        elif item.get('recipient_id'):
+            try:
+                ids.add(int(item['recipient_id']))
+            except (TypeError, ValueError):
+                pass
+
+    by_id = {u.id: u for u in User.objects.filter(id__in=ids)} if ids else {}
+
+    by_phone = {}
+    if phones:
+        query = Q(phone_number__in=phones)
+        for digits in phones:
+            if len(digits) >= 9:
+                query |= Q(phone_number__endswith=digits[-9:])
+        candidates = list(User.objects.filter(query))
+
+        exact = {u.phone_number: u for u in candidates}
+        for digits in phones:
+            recipient = exact.get(digits)
+            if not recipient:
+                last9 = digits[-9:] if len(digits) >= 9 else digits
+                recipient = next(
+                    (u for u in candidates if u.id != sender.id and u.phone_number.endswith(last9)),
+                    None
+                )
+            if recipient:
+                by_phone[digits] = recipient
+
+    resolved = []
+    for item in items:
+        if item.get('phone'):
+            resolved.append(by_phone.get(normalize_phone(item['phone'])))
+        elif item.get('recipient_id'):
+            try:
+                resolved.append(by_id.get(int(item['recipient_id'])))
+            except (TypeError, ValueError):
+                resolved.append(None)
+        else:
+            resolved.append(None)
+    return resolved
+
+
+class BatchTransferError(Exception):
+    """فشل تحويل دفعة كاملة في وضع الكل أو لا شيء"""
+
+    def __init__(self, results):
+        super().__init__('batch_failed')
+        self.results = results
+
+
+def execute_batch_transfer(sender, currency, items, atomic=True):
+    """
+    تنفيذ تحويلات P2P متعددة من مرسل واحد إلى عدة مستلمين.
+
+    - يتم قفل محفظة المرسل مرة واحدة فقط.
+    - جميع قيود الدفعة تُسجل في قيد مزدوج واحد، والحركات تُنشأ بعملية جماعية (bulk) داخل معاملة واحدة.
+    - atomic=True: أي خطأ في أي بند يلغي الدفعة كاملة (BatchTransferError).
+    - atomic=False: يتم تنفيذ البنود الصالحة فقط وإرجاع نتيجة كل بند.
+    """
+    results = [{'index': i, 'status': 'PENDING'} for i in range(len(items))]
+    amounts = []
+    for i, item in enumerate(items):
+        try:
+            amount = Decimal(str(item.get('amount')))
+        except (InvalidOperation, TypeError, ValueError):
+            amount = None
+        if amount is None or not amount.is_finite() or amount <= 0:
+            results[i].update(status='FAILED', error='المبلغ يجب أن يكون أكبر من صفر')
+            amount = None
+        elif amount != to_amount(amount):
+            # قيود المستلمين تُقرب لخانتين (wallet_posting) فيختل توازن القيد مع خصم المرسل
+            results[i].update(status='FAILED', error='المبلغ يجب ألا يتجاوز خانتين عشريتين')
+            amount = None
+        amounts.append(amount)
+
+    recipients = resolve_recipients(sender, items)
+    for i, recipient in enumerate(recipients):
+        if results[i]['status'] == 'FAILED':
+            continue
+        if not items[i].get('phone') and not items[i].get('recipient_id'):
+            results[i].update(status='FAILED', error='يجب تحديد رقم الهاتف أو معرف المستخدم')
+        elif recipient is None:
+            results[i].update(status='FAILED', error='المستخدم المستلم غير موجود')
+        elif recipient.id == sender.id:
+            results[i].update(status='FAILED', error='لا يمكن التحويل إلى نفسك')
+
+    if atomic and any(r['status'] == 'FAILED' for r in results):
+        raise BatchTransferError(results)
+
+    with transaction.atomic():
+        sender_wallet = (
+            Wallet.objects.select_for_update()
+            .filter(user=sender, currency=currency)
+            .order_by('-balance')
+            .first()
+        )
+        if not sender_wallet:
+            # لا توجد محفظة = رصيد صفر (كما في التحويل الفردي)
+            for r in results:
+                if r['status'] == 'PENDING':
+                    r.update(status='FAILED', error='insufficient_funds')
+            raise BatchTransferError(results)
+
+        # Allocate the sender balance in request order
+        available = sender_wallet.balance
+        accepted = []
+        for i, r in enumerate(results):
+            if r['status'] != 'PENDING':
+                continue
+            if available < amounts[i]:
+                r.update(status='FAILED', error='insufficient_funds')
+                continue
+            available -= amounts[i]
+            accepted.append(i)
+
+        if atomic and len(accepted) != len(items):
+            raise BatchTransferError(results)
+
+        if not accepted:
+            return sender_wallet, results
+
+        credits = {}
+        for i in accepted:
+            credits[recipients[i].id] = credits.get(recipients[i].id, Decimal('0')) + amounts[i]
+
+        recipient_wallets = materialize_wallets(credits, currency)
+
+        references = generate_reference_numbers(Transaction, 'TRX', count=len(accepted) * 2)
+        postings = [wallet_posting(sender_wallet, available - sender_wallet.balance)]
+        postings += [wallet_posting(recipient_wallets[uid], total) for uid, total in credits.items()]
+        post_journal(
+            postings,
+            description=f"تحويل دفعة P2P من {sender.username} ({len(accepted)} مستلم)",
+            reference_number=references[0]
+        )
+        sender_wallet.balance = available
+
+        rows = []
+        for n, i in enumerate(accepted):
+            recipient = recipients[i]
+            sender_ref, recipient_ref = references[2 * n], references[2 * n + 1]
+            rows.append(Transaction(
+                user=sender,
+                amount=amounts[i],
+                currency=currency,
+                transaction_type='TRANSFER',
+                to_user=recipient,
+                description=f"تحويل إلى {recipient.username}",
+                status='SUCCESS',
+                reference_number=sender_ref
+            ))
+            rows.append(Transaction(
+                user=recipient,
+                amount=amounts[i],
+                currency=currency,
+                transaction_type='TRANSFER',
+                to_user=sender,
+                description=f"استلام من {sender.username}",
+                status='SUCCESS',
+                reference_number=recipient_ref
+            ))
+            results[i].update(
+                status='SUCCESS',
+                amount=float(amounts[i]),
+                recipient_id=recipient.id,
+                reference_number=sender_ref
+            )
+        Transaction.objects.bulk_create(rows)
+        # bulk_create لا يطلق إشارة post_save
+        record_transactions(rows)
+        publish_many([
+            transfer_received(recipients[i].id, amounts[i], currency, sender.username, references[2 * n])
+            for n, i in enumerate(accepted)
+        ])
+
+    return sender_wallet, results
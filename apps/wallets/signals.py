@@ -1,17 +1,25 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from django.conf import settings
-from .models import Wallet
+from .models import Transaction, ExchangeRate
+from .summaries import record_transactions, record_company_transactions
+from apps.financials.models import CompanyTransaction
 
-@receiver(post_save, sender=settings.AUTH_USER_MODEL)
-def create_user_wallet(sender, instance, created, **kwargs):
+# لا تُنشأ محافظ عند إنشاء المستخدم: المحفظة تُنشأ عند أول إيداع (ledger.materialize_wallets)
+
+@receiver(post_save, sender=Transaction)
+def summarize_transaction(sender, instance, created, **kwargs):
+    # تحديث الملخص اليومي في نفس معاملة كتابة الحركة
+    if created:
+        record_transactions([instance])
+
+@receiver(post_save, sender=CompanyTransaction)
+def summarize_company_transaction(sender, instance, created, **kwargs):
     if created:
-        # إنشاء محافظ بجميع العملات عند إنشاء المستخدم
-        currencies = ['YER', 'USD', 'SAR']
-        for currency in currencies:
-            Wallet.objects.create(
-                user=instance, 
-                currency=currency, 
-                balance=0,
-                is_active=True
-            )
+        record_company_transactions([instance])
+
+@receiver(post_save, sender=ExchangeRate)
+@receiver(post_delete, sender=ExchangeRate)
+def invalidate_rate_matrix(sender, **kwargs):
+    # العمليات الأخرى تلتقط التغيير عند التحقق الدوري من ختم النسخة (quotes.rate_matrix)
+    from .quotes import invalidate_matrix
+    invalidate_matrix()
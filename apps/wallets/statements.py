@@ -0,0 +1,221 @@
+"""
+محرك كشوف الحساب: دمج الحركات (Transaction) وعمليات الصرف (CurrencyConversion) في تدفق واحد
+مرتب زمنياً، بما في ذلك الأشهر المؤرشفة، مع كتابته بصيغة CSV أو JSON Lines ومضغوطاً اختيارياً.
+كل شيء يعمل كمولدات (generators) حتى تبقى الذاكرة ثابتة مهما كان حجم الكشف.
+"""
+import csv
+import datetime
+import heapq
+import io
+import json
+import zlib
+from itertools import chain
+from types import SimpleNamespace
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Transaction, CurrencyConversion, ArchivedPartition
+from .partitioning import iter_archived_rows
+from apps.authentication.models import User
+
+STATEMENT_COLUMNS = [
+    'created_at', 'reference_number', 'type', 'direction', 'amount', 'currency',
+    'target_amount', 'target_currency', 'exchange_rate', 'description', 'status',
+    'other_party_name', 'other_party_phone',
+]
+
+
+def day_start(day):
+    """
+    بداية اليوم بالتوقيت المحلي. تصفية الفترات بحدود نصف مفتوحة
+    (created_at >= بداية أول يوم، created_at < بداية اليوم التالي لآخر يوم) بدلاً من created_at__date
+    حتى يبقى العمود بدون تحويل فيُستخدم الفهرس وتُستبعد الأقسام خارج الفترة.
+    """
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def day_end(day):
+    """بداية اليوم التالي (الحد الأعلى غير الشامل)"""
+    return day_start(day + datetime.timedelta(days=1))
+
+
+def transaction_row(t, to_user):
+    """تنسيق حركة واحدة لسجل الحركات (t قد تكون Transaction أو صفاً مؤرشفاً)"""
+    ref_no = t.reference_number or f"TRX-{t.id}"
+    other_party_name = ""
+    other_party_phone = ""
+    if to_user:
+        other_party_phone = to_user.phone_number or ""
+        other_party_name = f"{to_user.first_name} {to_user.last_name}".strip()
+        if not other_party_name:
+            other_party_name = to_user.username
+
+    direction = "IN"
+    if t.transaction_type == 'DEPOSIT':
+        direction = "IN"
+    elif t.transaction_type == 'WITHDRAW':
+        direction = "OUT"
+    elif t.transaction_type == 'TRANSFER':
+        direction = "OUT" if "إلى" in (t.description or "") else "IN"
+
+    return {
+        'id': t.id,
+        'reference_number': ref_no,
+        'type': t.transaction_type,
+        'direction': direction,
+        'amount': float(t.amount),
+        'currency': t.currency,
+        'description': t.description,
+        'created_at': t.created_at.isoformat(),
+        'status': t.status,
+        'other_party_name': other_party_name,
+        'other_party_phone': other_party_phone,
+    }
+
+
+def conversion_row(c):
+    """تنسيق عملية صرف واحدة لسجل الحركات (c قد تكون CurrencyConversion أو صفاً مؤرشفاً)"""
+    return {
+        'id': f"conv_{c.id}",
+        'reference_number': c.reference_number,
+        'type': 'EXCHANGE',
+        'direction': 'EXCHANGE',
+        'amount': float(c.amount_sent),
+        'currency': c.from_currency,
+        'target_amount': float(c.amount_received),
+        'target_currency': c.to_currency,
+        'exchange_rate': float(c.exchange_rate),
+        'description': f"صارفة من {c.from_currency} إلى {c.to_currency}",
+        'created_at': c.created_at.isoformat(),
+        'status': 'SUCCESS' if c.status == 'COMPLETED' else c.status,
+        'other_party_name': "",
+        'other_party_phone': "",
+    }
+
+
+def archived_transaction_rows(user, start_date, end_date, currency=None, trx_type=None, chunk_size=1000):
+    """الحركات المؤرشفة للمستخدم في الفترة المطلوبة (إن وجدت أشهر مؤرشفة فيها)"""
+    def format_chunk(chunk):
+        to_users = User.objects.in_bulk({r.to_user_id for r in chunk if r.to_user_id})
+        return [transaction_row(r, to_users.get(r.to_user_id)) for r in chunk]
+
+    chunk = []
+    for row in iter_archived_rows(Transaction._meta.db_table, start_date, end_date, user_id=user.id):
+        if row['transaction_type'] == 'EXCHANGE':
+            continue
+        if currency and currency != 'all' and row['currency'] != currency:
+            continue
+        if trx_type and trx_type != 'all' and row['transaction_type'] != trx_type:
+            continue
+        chunk.append(SimpleNamespace(**row))
+        if len(chunk) >= chunk_size:
+            yield from format_chunk(chunk)
+            chunk = []
+    if chunk:
+        yield from format_chunk(chunk)
+
+
+def archived_conversion_rows(user, start_date, end_date, currency=None):
+    """عمليات الصرف المؤرشفة للمستخدم في الفترة المطلوبة"""
+    for row in iter_archived_rows(CurrencyConversion._meta.db_table, start_date, end_date, user_id=user.id):
+        if currency and currency != 'all' and currency not in (row['from_currency'], row['to_currency']):
+            continue
+        yield conversion_row(SimpleNamespace(**row))
+
+
+def statement_rows(user, start_date=None, end_date=None, currency=None, chunk_size=2000):
+    """
+    تدفق كشف الحساب مرتباً تصاعدياً حسب التاريخ.
+    الاستعلامات تُقرأ بـ iterator() على دفعات والدمج يتم بـ heapq.merge دون تحميل الكشف في الذاكرة.
+    """
+    transactions = (
+        Transaction.objects.filter(user=user)
+        .exclude(transaction_type='EXCHANGE')
+        .select_related('to_user')
+        .order_by('created_at', 'id')
+    )
+    conversions = CurrencyConversion.objects.filter(user=user).order_by('created_at', 'id')
+
+    if currency and currency != 'all':
+        transactions = transactions.filter(currency=currency)
+        conversions = conversions.filter(Q(from_currency=currency) | Q(to_currency=currency))
+    if start_date:
+        transactions = transactions.filter(created_at__gte=day_start(start_date))
+        conversions = conversions.filter(created_at__gte=day_start(start_date))
+    if end_date:
+        transactions = transactions.filter(created_at__lt=day_end(end_date))
+        conversions = conversions.filter(created_at__lt=day_end(end_date))
+
+    live = heapq.merge(
+        (transaction_row(t, t.to_user) for t in transactions.iterator(chunk_size=chunk_size)),
+        (conversion_row(c) for c in conversions.iterator(chunk_size=chunk_size)),
+        key=lambda row: row['created_at']
+    )
+
+    # الأشهر المؤرشفة أقدم دائماً من البيانات الحية، لذا تأتي أولاً
+    archive_from = start_date or _oldest_archived_month()
+    if archive_from is None:
+        return live
+    archived = heapq.merge(
+        archived_transaction_rows(user, archive_from, end_date, currency),
+        archived_conversion_rows(user, archive_from, end_date, currency),
+        key=lambda row: row['created_at']
+    )
+    return chain(archived, live)
+
+
+def _oldest_archived_month():
+    return ArchivedPartition.objects.order_by('month').values_list('month', flat=True).first()
+
+
+def csv_chunks(rows, batch_size=500):
+    """تحويل الصفوف إلى CSV على دفعات نصية"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=STATEMENT_COLUMNS, extrasaction='ignore')
+    writer.writeheader()
+    for n, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if n % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def jsonl_chunks(rows, batch_size=500):
+    """تحويل الصفوف إلى JSON Lines على دفعات نصية"""
+    lines = []
+    for row in rows:
+        lines.append(json.dumps({k: row.get(k) for k in STATEMENT_COLUMNS}, ensure_ascii=False))
+        if len(lines) >= batch_size:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def encode_chunks(chunks, compress=False):
+    """ترميز الدفعات النصية إلى bytes مع ضغط gzip متدفق اختيارياً"""
+    if not compress:
+        for chunk in chunks:
+            yield chunk.encode('utf-8')
+        return
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+FORMATS = {
+    'csv': (csv_chunks, 'text/csv; charset=utf-8', 'csv'),
+    'jsonl': (jsonl_chunks, 'application/x-ndjson; charset=utf-8', 'jsonl'),
+}
+
+
+def export_statement(user, fmt='csv', compress=False, start_date=None, end_date=None, currency=None):
+    """إرجاع مولد bytes لكشف حساب المستخدم بالصيغة المطلوبة"""
+    formatter = FORMATS[fmt][0]
+    return encode_chunks(formatter(statement_rows(user, start_date, end_date, currency)), compress=compress)
@@ -0,0 +1,128 @@
+"""
+الملخصات اليومية (DailyWalletSummary / DailyTreasurySummary).
+
+تُحدث تزايدياً عند كتابة الحركات (إشارات post_save ومسار التحويل الجماعي)، وتُعاد بناؤها
+بالأمر backfill_daily_summaries. التقارير تقرأ منها بتكلفة تتناسب مع عدد الأيام وليس عدد الحركات.
+"""
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Transaction, DailyWalletSummary
+
+
+def _increment(model, keys, count, total):
+    updated = model.objects.filter(**keys).update(count=F('count') + count, total=F('total') + total)
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(count=count, total=total, **keys)
+    except IntegrityError:
+        # أنشأه طلب متزامن بين الـ UPDATE والـ INSERT
+        model.objects.filter(**keys).update(count=F('count') + count, total=F('total') + total)
+
+
+def _apply(model, buckets):
+    # ترتيب ثابت لتجنب الـ deadlock بين الدفعات المتزامنة
+    for key in sorted(buckets, key=lambda k: tuple(str(v) for v in k)):
+        keys, count, total = buckets[key]
+        _increment(model, keys, count, total)
+
+
+def record_transactions(transactions):
+    """إضافة حركات المستخدمين (Transaction) إلى الملخصات اليومية"""
+    buckets = {}
+    for t in transactions:
+        day = timezone.localdate(t.created_at) if t.created_at else timezone.localdate()
+        key = (t.user_id, t.currency, day, t.transaction_type)
+        keys, count, total = buckets.get(key, (
+            {'user_id': t.user_id, 'currency': t.currency, 'day': day, 'transaction_type': t.transaction_type},
+            0,
+            Decimal('0')
+        ))
+        buckets[key] = (keys, count + 1, total + Decimal(str(t.amount)))
+    _apply(DailyWalletSummary, buckets)
+
+
+def record_company_transactions(company_transactions):
+    """إضافة حركات الخزائن (CompanyTransaction) إلى الملخصات اليومية"""
+    from apps.financials.models import DailyTreasurySummary
+
+    buckets = {}
+    for ct in company_transactions:
+        day = timezone.localdate(ct.created_at) if ct.created_at else timezone.localdate()
+        amount = Decimal(str(ct.amount))
+        direction = 'IN' if amount >= 0 else 'OUT'
+        key = (ct.treasury_id, day, direction)
+        keys, count, total = buckets.get(key, (
+            {'treasury_id': ct.treasury_id, 'currency': ct.treasury.currency, 'day': day, 'direction': direction},
+            0,
+            Decimal('0')
+        ))
+        buckets[key] = (keys, count + 1, total + amount)
+    _apply(DailyTreasurySummary, buckets)
+
+
+def _live_from(model, start_date):
+    """أول يوم ما زالت حركاته في الجدول الحي (بعد آخر شهر مؤرشف)"""
+    from .models import ArchivedPartition
+    from .partitioning import next_month
+
+    last_archived = (
+        ArchivedPartition.objects.filter(table_name=model._meta.db_table)
+        .order_by('-month').values_list('month', flat=True).first()
+    )
+    if last_archived is None:
+        return start_date
+    floor = next_month(last_archived)
+    return max(start_date, floor) if start_date else floor
+
+
+def backfill(start_date=None, end_date=None):
+    """
+    إعادة بناء الملخصات للفترة المطلوبة من الجداول الخام (تجميع واحد لكل جدول).
+    أيام الأشهر المؤرشفة لا تُمس لأن حركاتها لم تعد في الجداول الحية.
+    """
+    from apps.financials.models import CompanyTransaction, DailyTreasurySummary
+
+    def in_range(qs, start):
+        if start:
+            qs = qs.filter(day__gte=start)
+        if end_date:
+            qs = qs.filter(day__lte=end_date)
+        return qs
+
+    wallet_start = _live_from(Transaction, start_date)
+    treasury_start = _live_from(CompanyTransaction, start_date)
+
+    wallet_rows = (
+        in_range(Transaction.objects.annotate(day=TruncDate('created_at')), wallet_start)
+        .values('user_id', 'currency', 'day', 'transaction_type')
+        .annotate(count=Count('id'), total=Sum('amount'))
+        .order_by()
+    )
+    treasury_rows = (
+        in_range(CompanyTransaction.objects.annotate(
+            day=TruncDate('created_at'),
+            direction=Case(When(amount__gte=0, then=Value('IN')), default=Value('OUT'))
+        ), treasury_start)
+        .values('treasury_id', 'day', 'direction')
+        .annotate(currency=F('treasury__currency'), count=Count('id'), total=Sum('amount'))
+        .order_by()
+    )
+
+    with transaction.atomic():
+        in_range(DailyWalletSummary.objects.all(), wallet_start).delete()
+        in_range(DailyTreasurySummary.objects.all(), treasury_start).delete()
+        wallets = DailyWalletSummary.objects.bulk_create(
+            [DailyWalletSummary(**row) for row in wallet_rows], batch_size=1000
+        )
+        treasuries = DailyTreasurySummary.objects.bulk_create(
+            [DailyTreasurySummary(**row) for row in treasury_rows], batch_size=1000
+        )
+
+    return len(wallets), len(treasuries)
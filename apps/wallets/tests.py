@@ -1,3 +1,583 @@
-from django.test import TestCase
+from decimal import Decimal
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from apps.authentication.models import User
+from .models import Wallet, Transaction, LedgerEntry
 
-# Create your tests here.
+
+class P2PBatchTransferTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.sender = User.objects.create_user(username='sender', password='pass', phone_number='777000001')
+        self.alice = User.objects.create_user(username='alice', password='pass', phone_number='777000002')
+        self.bob = User.objects.create_user(username='bob', password='pass', phone_number='777000003')
+        Wallet.objects.create(user=self.sender, currency='YER', balance=Decimal('1000'))
+        self.client.force_authenticate(self.sender)
+        self.url = reverse('transfer-p2p-batch')
+
+    def balance(self, user):
+        return Wallet.objects.get(user=user, currency='YER').balance
+
+    def test_atomic_batch_moves_all_funds(self):
+        data = {'transfers': [
+            {'phone': '777000002', 'amount': 300},
+            {'recipient_id': self.bob.id, 'amount': 200},
+        ]}
+        response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['succeeded'], 2)
+        self.assertEqual(self.balance(self.sender), Decimal('500'))
+        self.assertEqual(self.balance(self.alice), Decimal('300'))
+        self.assertEqual(self.balance(self.bob), Decimal('200'))
+        self.assertEqual(Transaction.objects.filter(transaction_type='TRANSFER').count(), 4)
+
+    def test_atomic_batch_rolls_back_on_any_failure(self):
+        data = {'transfers': [
+            {'phone': '777000002', 'amount': 300},
+            {'phone': '777000003', 'amount': 800},
+        ]}
+        response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['results'][1]['error'], 'insufficient_funds')
+        self.assertEqual(self.balance(self.sender), Decimal('1000'))
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_partial_batch_skips_failed_items(self):
+        data = {'mode': 'partial', 'transfers': [
+            {'phone': '777000002', 'amount': 300},
+            {'phone': '777999999', 'amount': 100},
+            {'phone': '777000003', 'amount': 800},
+            {'phone': '777000003', 'amount': 100},
+        ]}
+        response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['status'] for r in response.data['results']], ['SUCCESS', 'FAILED', 'FAILED', 'SUCCESS'])
+        self.assertEqual(self.balance(self.sender), Decimal('600'))
+        self.assertEqual(self.balance(self.bob), Decimal('100'))
+
+    def test_sub_cent_amounts_fail_per_item(self):
+        data = {'mode': 'partial', 'transfers': [
+            {'phone': '777000002', 'amount': '100.005'},
+            {'phone': '777000003', 'amount': '0.25'},
+        ]}
+        response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['status'] for r in response.data['results']], ['FAILED', 'SUCCESS'])
+        self.assertEqual(self.balance(self.sender), Decimal('999.75'))
+
+    def test_sender_without_wallet_gets_insufficient_funds(self):
+        self.client.force_authenticate(self.alice)
+        response = self.client.post(self.url, {'transfers': [{'phone': '777000003', 'amount': 10}]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['results'][0]['error'], 'insufficient_funds')
+
+
+class IdempotencyKeyTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.sender = User.objects.create_user(username='sender', password='pass', phone_number='777000001')
+        self.recipient = User.objects.create_user(username='alice', password='pass', phone_number='777000002')
+        Wallet.objects.create(user=self.sender, currency='YER', balance=Decimal('1000'))
+        self.client.force_authenticate(self.sender)
+        self.url = reverse('transfer-p2p')
+
+    def test_duplicate_request_is_replayed(self):
+        data = {'phone': '777000002', 'amount': 100}
+        first = self.client.post(self.url, data, format='json', HTTP_IDEMPOTENCY_KEY='abc-1')
+        second = self.client.post(self.url, data, format='json', HTTP_IDEMPOTENCY_KEY='abc-1')
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(Wallet.objects.get(user=self.sender, currency='YER').balance, Decimal('900'))
+
+    def test_key_reuse_with_different_payload_is_rejected(self):
+        self.client.post(self.url, {'phone': '777000002', 'amount': 100}, format='json', HTTP_IDEMPOTENCY_KEY='abc-2')
+        response = self.client.post(self.url, {'phone': '777000002', 'amount': 200}, format='json', HTTP_IDEMPOTENCY_KEY='abc-2')
+
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Wallet.objects.get(user=self.sender, currency='YER').balance, Decimal('900'))
+
+    def test_stale_pending_key_is_taken_over_after_lease(self):
+        import datetime
+        from django.utils import timezone
+        from .models import IdempotencyKey
+        data = {'phone': '777000002', 'amount': 100}
+        # عامل توقف بعد حجز المفتاح وقبل التنفيذ
+        stale = IdempotencyKey.objects.create(
+            scope=f'user:{self.sender.id}', endpoint='transfer-p2p', key='abc-3', request_hash='x',
+            expires_at=timezone.now() - datetime.timedelta(seconds=1)
+        )
+
+        response = self.client.post(self.url, data, format='json', HTTP_IDEMPOTENCY_KEY='abc-3')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        record = IdempotencyKey.objects.get(key='abc-3')
+        self.assertNotEqual(record.pk, stale.pk)
+        self.assertEqual(record.status, 'COMPLETED')
+        self.assertGreater(record.expires_at, timezone.now() + datetime.timedelta(hours=1))
+
+    def test_admin_p2p_transfer_is_idempotent(self):
+        data = {'sender_phone': '777000001', 'recipient_phone': '777000002', 'amount': 100}
+        first = APIClient().post(reverse('p2p-transfer'), data, format='json', HTTP_IDEMPOTENCY_KEY='adm-1')
+        second = APIClient().post(reverse('p2p-transfer'), data, format='json', HTTP_IDEMPOTENCY_KEY='adm-1')
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(Wallet.objects.get(user=self.sender, currency='YER').balance, Decimal('900'))
+
+    def test_anonymous_keys_are_scoped_by_client(self):
+        data = {'sender_phone': '777000001', 'recipient_phone': '777000002', 'amount': 100}
+        APIClient().post(reverse('p2p-transfer'), data, format='json', HTTP_IDEMPOTENCY_KEY='adm-2', REMOTE_ADDR='10.0.0.1')
+        other = APIClient().post(reverse('p2p-transfer'), data, format='json', HTTP_IDEMPOTENCY_KEY='adm-2', REMOTE_ADDR='10.0.0.2')
+
+        self.assertNotIn('Idempotent-Replayed', other)
+        self.assertEqual(Wallet.objects.get(user=self.sender, currency='YER').balance, Decimal('800'))
+
+
+class LedgerTests(TestCase):
+    def setUp(self):
+        from apps.financials.models import CompanyTreasury
+        self.user = User.objects.create_user(username='alice', password='pass', phone_number='777000002')
+        self.wallet = Wallet.objects.create(user=self.user, currency='YER')
+        self.treasury = CompanyTreasury.objects.create(name='Main', type='CASH', currency='YER')
+
+    def test_unbalanced_journal_is_rejected(self):
+        from .ledger import post_journal, wallet_posting, UnbalancedJournal
+        with self.assertRaises(UnbalancedJournal):
+            post_journal([wallet_posting(self.wallet, 100)])
+        self.assertFalse(LedgerEntry.objects.exists())
+
+    def test_debit_without_funds_is_rejected(self):
+        from .ledger import post_journal, wallet_posting, treasury_posting, InsufficientFunds
+        with self.assertRaises(InsufficientFunds):
+            post_journal([treasury_posting(self.treasury, -100), wallet_posting(self.wallet, 100)])
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal('0'))
+
+    def test_balances_rebuild_from_checkpoint(self):
+        from .ledger import post_journal, wallet_posting, treasury_posting, system_posting, create_checkpoints, rebuild_balance, find_drift
+        post_journal([treasury_posting(self.treasury, 1000), system_posting('EXTERNAL', 'YER', -1000)])
+        post_journal([treasury_posting(self.treasury, -400), wallet_posting(self.wallet, 400)])
+        self.assertEqual(create_checkpoints(settle_seconds=0), 3)
+        post_journal([wallet_posting(self.wallet, -150), system_posting('PROVIDER', 'YER', 150)])
+
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal('250'))
+        self.assertEqual(rebuild_balance('WALLET', self.wallet.id, 'YER'), Decimal('250'))
+        self.assertEqual(rebuild_balance('TREASURY', self.treasury.id, 'YER'), Decimal('600'))
+        self.assertEqual(find_drift(), [])
+
+    def test_transfer_to_wallet_posts_balanced_journal(self):
+        from .ledger import post_journal, treasury_posting, system_posting
+        post_journal([treasury_posting(self.treasury, 1000), system_posting('EXTERNAL', 'YER', -1000)])
+        response = APIClient().post(reverse('transfer-to-wallet'), {
+            'treasury_id': self.treasury.id, 'user_id': self.user.id, 'amount': 300
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['treasury_balance'], 700.0)
+        self.assertEqual(response.data['wallet_balance'], 300.0)
+        entries = LedgerEntry.objects.exclude(account_type='EXTERNAL')
+        self.assertEqual(entries.count(), 3)
+        self.assertEqual(sum(e.amount for e in entries.filter(account_type__in=['WALLET', 'TREASURY'])), Decimal('1000'))
+
+
+class TreasuryShardTests(TestCase):
+    def setUp(self):
+        from apps.financials.models import CompanyTreasury
+        from apps.financials.sharding import set_shard_count
+        from .ledger import post_journal, treasury_posting, system_posting
+        self.user = User.objects.create_user(username='alice', password='pass', phone_number='777000002')
+        self.treasury = CompanyTreasury.objects.create(name='Main', type='CASH', currency='YER')
+        post_journal([treasury_posting(self.treasury, 1000), system_posting('EXTERNAL', 'YER', -1000)])
+        set_shard_count(self.treasury.id, 4)
+
+    def payout(self, amount):
+        return APIClient().post(reverse('transfer-to-wallet'), {
+            'treasury_id': self.treasury.id, 'user_id': self.user.id, 'amount': amount
+        }, format='json')
+
+    def test_enabling_spreads_balance_across_shards(self):
+        self.treasury.refresh_from_db()
+        self.assertEqual(self.treasury.balance, Decimal('0'))
+        self.assertEqual(sorted(self.treasury.shards.values_list('balance', flat=True)), [Decimal('250')] * 4)
+        self.assertEqual(self.treasury.total_balance(), Decimal('1000'))
+
+    def test_payout_debits_one_shard_and_keeps_ledger_in_sync(self):
+        from .ledger import find_drift
+        response = self.payout(200)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['treasury_balance'], 800.0)
+        self.assertEqual(sorted(self.treasury.shards.values_list('balance', flat=True)), [Decimal('50')] + [Decimal('250')] * 3)
+        self.assertEqual(find_drift(), [])
+
+    def test_payout_larger_than_any_shard_spans_shards(self):
+        from apps.financials.sharding import rebalance
+        self.assertEqual(self.payout(900).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.payout(200).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(rebalance(self.treasury.id), Decimal('100'))
+        self.assertEqual(sorted(self.treasury.shards.values_list('balance', flat=True)), [Decimal('25')] * 4)
+
+    def test_balance_sheet_and_unsharding_use_total(self):
+        from apps.financials.sharding import set_shard_count
+        self.payout(300)
+        sheet = APIClient().get(reverse('balance-sheet')).data
+        self.assertEqual(sheet['report'][0]['assets'], 700.0)
+
+        set_shard_count(self.treasury.id, 1)
+        self.treasury.refresh_from_db()
+        self.assertEqual(self.treasury.balance, Decimal('700'))
+        self.assertFalse(self.treasury.shards.exists())
+
+
+class ArchivedHistoryTests(TestCase):
+    def setUp(self):
+        import datetime
+        import tempfile
+        from django.test import override_settings
+        self.archive_dir = tempfile.TemporaryDirectory()
+        self.override = override_settings(ARCHIVE_ROOT=self.archive_dir.name)
+        self.override.enable()
+
+        self.user = User.objects.create_user(username='alice', password='pass', phone_number='777000002')
+        old = Transaction.objects.create(user=self.user, amount=50, currency='YER', transaction_type='DEPOSIT')
+        Transaction.objects.filter(id=old.id).update(
+            created_at=datetime.datetime(2024, 1, 15, 10, 0, tzinfo=datetime.timezone.utc)
+        )
+        self.old_reference = old.reference_number
+        Transaction.objects.create(user=self.user, amount=70, currency='YER', transaction_type='DEPOSIT')
+
+    def tearDown(self):
+        self.override.disable()
+        self.archive_dir.cleanup()
+
+    def test_archived_months_are_read_only_for_old_dates(self):
+        from django.core.management import call_command
+        from .models import ArchivedPartition
+        call_command('archive_partitions', before='2024-02', table=['transaction'], stdout=open('/dev/null', 'w'))
+
+        self.assertEqual(Transaction.objects.count(), 1)
+        self.assertEqual(ArchivedPartition.objects.get().row_count, 1)
+
+        url = reverse('transactions')
+        recent = APIClient().get(url, {'user_id': self.user.id})
+        self.assertEqual([t['amount'] for t in recent.data], [70.0])
+
+        history = APIClient().get(url, {'user_id': self.user.id, 'start_date': '2024-01-01'})
+        self.assertEqual([t['amount'] for t in history.data], [70.0, 50.0])
+        self.assertEqual(history.data[1]['reference_number'], self.old_reference)
+
+    def test_archived_reference_number_is_not_reused(self):
+        from django.core.management import call_command
+        from django.db import IntegrityError, transaction
+        call_command('archive_partitions', before='2024-02', table=['transaction'], stdout=open('/dev/null', 'w'))
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Transaction.objects.create(
+                user=self.user, amount=10, currency='YER', transaction_type='DEPOSIT', reference_number=self.old_reference
+            )
+
+    def test_end_date_includes_the_whole_local_day(self):
+        import datetime
+        from django.utils import timezone
+        late = Transaction.objects.create(user=self.user, amount=30, currency='YER', transaction_type='DEPOSIT')
+        Transaction.objects.filter(id=late.id).update(
+            created_at=timezone.make_aware(datetime.datetime(2024, 3, 10, 23, 30))
+        )
+
+        response = APIClient().get(reverse('transactions'), {
+            'user_id': self.user.id, 'start_date': '2024-03-10', 'end_date': '2024-03-10'
+        })
+        self.assertEqual([t['amount'] for t in response.data], [30.0])
+
+
+class StatementExportTests(TestCase):
+    def setUp(self):
+        from .models import CurrencyConversion
+        self.user = User.objects.create_user(username='alice', password='pass', phone_number='777000002')
+        Transaction.objects.create(user=self.user, amount=100, currency='YER', transaction_type='DEPOSIT')
+        CurrencyConversion.objects.create(
+            user=self.user, from_currency='YER', to_currency='USD',
+            amount_sent=50, exchange_rate=Decimal('0.002'), amount_received=Decimal('0.10'), status='COMPLETED'
+        )
+        Transaction.objects.create(user=self.user, amount=20, currency='USD', transaction_type='WITHDRAW')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_csv_export_streams_merged_history(self):
+        response = self.client.get(reverse('transactions-export'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertTrue(lines[0].startswith('created_at,reference_number,type'))
+        self.assertEqual([line.split(',')[2] for line in lines[1:]], ['DEPOSIT', 'EXCHANGE', 'WITHDRAW'])
+
+    def test_gzip_jsonl_export_with_currency_filter(self):
+        import gzip
+        import json
+        response = self.client.get(reverse('transactions-export'), {'output': 'jsonl', 'gzip': '1', 'currency': 'USD'})
+
+        rows = [json.loads(line) for line in gzip.decompress(b''.join(response.streaming_content)).splitlines()]
+        self.assertEqual([r['type'] for r in rows], ['EXCHANGE', 'WITHDRAW'])
+
+
+class DailySummaryTests(TestCase):
+    def setUp(self):
+        self.sender = User.objects.create_user(username='sender', password='pass', phone_number='777000010')
+        self.recipient = User.objects.create_user(username='recipient', password='pass', phone_number='777000011')
+        Wallet.objects.create(user=self.sender, currency='YER', balance=1000)
+        self.client = APIClient()
+        self.client.force_authenticate(self.sender)
+
+    def snapshot(self):
+        from .models import DailyWalletSummary
+        return sorted(DailyWalletSummary.objects.values_list('user_id', 'currency', 'day', 'transaction_type', 'count', 'total'))
+
+    def test_rollups_follow_writes_and_match_backfill(self):
+        from .summaries import backfill
+        self.client.post(reverse('transfer-p2p'), {'recipient_id': self.recipient.id, 'amount': 100, 'currency': 'YER'}, format='json')
+        self.client.post(reverse('transfer-p2p-batch'), {
+            'currency': 'YER',
+            'transfers': [{'recipient_id': self.recipient.id, 'amount': 50}, {'recipient_id': self.recipient.id, 'amount': 25}]
+        }, format='json')
+
+        incremental = self.snapshot()
+        sender_rows = [r for r in incremental if r[0] == self.sender.id]
+        self.assertEqual([(r[3], r[4], r[5]) for r in sender_rows], [('TRANSFER', 3, Decimal('175'))])
+
+        backfill()
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_summary_endpoint_serves_period_totals(self):
+        Transaction.objects.create(user=self.sender, amount=40, currency='USD', transaction_type='DEPOSIT')
+        Transaction.objects.create(user=self.sender, amount=60, currency='USD', transaction_type='DEPOSIT')
+
+        response = self.client.get(reverse('wallet-summary'), {'currency': 'USD'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['totals'], [{'currency': 'USD', 'type': 'DEPOSIT', 'count': 2, 'total': 100.0}])
+        self.assertEqual(len(response.data['daily']), 1)
+
+
+class ThrottlingTests(TestCase):
+    def setUp(self):
+        from .throttling import get_backend
+        self.backend = get_backend()
+        self.backend.reset()
+        self.addCleanup(self.backend.reset)
+        self.sender = User.objects.create_user(username='sender', password='pass', phone_number='777000020')
+        self.recipient = User.objects.create_user(username='recipient', password='pass', phone_number='777000021')
+        Wallet.objects.create(user=self.sender, currency='YER', balance=1000)
+        self.client = APIClient()
+        self.client.force_authenticate(self.sender)
+        self.data = {'recipient_id': self.recipient.id, 'amount': 10, 'currency': 'YER'}
+
+    @override_settings(THROTTLE_RATES={'money': {'user': '2/min', 'ip': '100/min'}})
+    def test_user_bucket_sheds_excess_requests(self):
+        codes = [self.client.post(reverse('transfer-p2p'), self.data, format='json').status_code for _ in range(3)]
+
+        self.assertEqual(codes, [200, 200, 429])
+        response = self.client.post(reverse('transfer-p2p'), self.data, format='json')
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+        self.assertEqual(Wallet.objects.get(user=self.sender, currency='YER').balance, Decimal('980'))
+
+    @override_settings(THROTTLE_RATES={'money': {'user': '100/min', 'ip': '1/min'}})
+    def test_ip_bucket_rejects_before_authentication(self):
+        self.client.post(reverse('transfer-p2p'), self.data, format='json')
+
+        with self.assertNumQueries(0):
+            response = APIClient().post(reverse('transfer-p2p'), self.data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+
+    @override_settings(MAX_INFLIGHT_PER_USER=1)
+    def test_inflight_limit_per_user(self):
+        self.backend.acquire(f"inflight:{self.sender.pk}", 1, 60)
+
+        response = self.client.post(reverse('transfer-p2p'), self.data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+        self.backend.release(f"inflight:{self.sender.pk}")
+        response = self.client.post(reverse('transfer-p2p'), self.data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_memory_inflight_slot_expires_after_ttl(self):
+        from .throttling import MemoryBackend
+        backend = MemoryBackend()
+
+        # حجز لم يُحرر (عامل توقف) ينتهي بعد ttl
+        self.assertTrue(backend.acquire('inflight:leaked', 1, 0))
+        self.assertTrue(backend.acquire('inflight:leaked', 1, 60))
+        self.assertFalse(backend.acquire('inflight:leaked', 1, 60))
+        backend.release('inflight:leaked')
+        self.assertTrue(backend.acquire('inflight:leaked', 1, 60))
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='poller', password='pass', phone_number='777000030')
+        self.other = User.objects.create_user(username='other', password='pass', phone_number='777000031')
+        Wallet.objects.create(user=self.user, currency='YER', balance=500)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_unchanged_balance_returns_304_without_body(self):
+        first = self.client.get(reverse('wallet-balance'))
+        etag = first['ETag']
+
+        # استعلام الختم فقط
+        with self.assertNumQueries(1):
+            again = self.client.get(reverse('wallet-balance'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(again.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(again.content, b'')
+
+        self.client.post(reverse('transfer-p2p'), {'recipient_id': self.other.id, 'amount': 100, 'currency': 'YER'}, format='json')
+        changed = self.client.get(reverse('wallet-balance'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(changed['ETag'], etag)
+        self.assertEqual(changed.data['YER'], 400.0)
+
+    def test_sparse_fields(self):
+        response = self.client.get(reverse('wallet-balance'), {'fields': 'YER,USD'})
+        self.assertEqual(response.data, {'YER': 500.0, 'USD': 0.0})
+
+        full = self.client.get(reverse('wallet-balance'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(full.status_code, status.HTTP_200_OK)
+
+
+class LazyWalletTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='alice', password='pass', phone_number='777000002')
+        self.other = User.objects.create_user(username='bob', password='pass', phone_number='777000003')
+        self.client.force_authenticate(self.user)
+
+    def test_missing_wallets_read_as_zero(self):
+        response = self.client.get(reverse('wallet-balance'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual({c: response.data[c] for c in ('YER', 'USD', 'SAR')}, {'YER': 0.0, 'USD': 0.0, 'SAR': 0.0})
+        self.assertFalse(Wallet.objects.exists())
+
+    def test_debit_without_wallet_is_insufficient_and_creates_nothing(self):
+        response = self.client.post(reverse('transfer-p2p'), {'phone': '777000003', 'amount': 10}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'], 'insufficient_funds')
+        self.assertFalse(Wallet.objects.exists())
+
+    def test_credit_materializes_wallet_once(self):
+        from .ledger import materialize_wallets
+        first = materialize_wallets([self.user.id, self.other.id], 'USD')
+        again = materialize_wallets([self.user.id], 'USD')
+        self.assertEqual(again[self.user.id].id, first[self.user.id].id)
+        self.assertEqual(Wallet.objects.filter(currency='USD').count(), 2)
+
+
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.sender = User.objects.create_user(username='sender', password='pass', phone_number='777000001')
+        self.recipient = User.objects.create_user(username='alice', password='pass', phone_number='777000002')
+        Wallet.objects.create(user=self.sender, currency='YER', balance=Decimal('1000'))
+        self.client.force_authenticate(self.sender)
+
+    def test_transfer_notifies_recipient_after_dispatch(self):
+        from apps.authentication.models import Notification
+        from .models import OutboxEvent
+        from .outbox import dispatch_batch
+        response = self.client.post(reverse('transfer-p2p'), {'phone': '777000002', 'amount': 100}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        event = OutboxEvent.objects.get()
+        self.assertEqual((event.topic, event.payload['user_id']), ('transfer.received', self.recipient.id))
+        self.assertFalse(Notification.objects.exists())
+
+        self.assertEqual(dispatch_batch(), (1, 0))
+        notification = Notification.objects.get(user=self.recipient)
+        self.assertIn('100.00 YER', notification.message)
+        event.refresh_from_db()
+        self.assertEqual(event.status, 'DONE')
+        self.assertEqual(dispatch_batch(), (0, 0))
+
+    def test_failing_handler_is_retried_later(self):
+        from . import outbox
+        from .models import OutboxEvent
+
+        @outbox.handler('test.fail')
+        def fail(payload, event):
+            raise RuntimeError('down')
+        self.addCleanup(outbox._handlers.pop, 'test.fail')
+
+        outbox.publish('test.fail', {'n': 1})
+        self.assertEqual(outbox.dispatch_batch(), (0, 1))
+        event = OutboxEvent.objects.get()
+        self.assertEqual((event.status, event.attempts), ('PENDING', 1))
+        self.assertIn('down', event.last_error)
+        # لم يحن موعد المحاولة التالية
+        self.assertEqual(outbox.dispatch_batch(), (0, 0))
+
+        with override_settings(OUTBOX_MAX_ATTEMPTS=2):
+            OutboxEvent.objects.update(available_at=event.created_at)
+            self.assertEqual(outbox.dispatch_batch(), (0, 1))
+        event.refresh_from_db()
+        self.assertEqual(event.status, 'FAILED')
+
+
+class ExchangeQuoteTests(TestCase):
+    def setUp(self):
+        from .models import ExchangeRate
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='trader', password='pass', phone_number='777000020')
+        self.client.force_authenticate(self.user)
+        Wallet.objects.create(user=self.user, currency='USD', balance=Decimal('500.00'))
+        self.rate = ExchangeRate.objects.create(from_currency='USD', to_currency='YER', buy_rate=Decimal('530'), sell_rate=Decimal('535'))
+
+    def _quote(self, amount=100):
+        response = self.client.get(reverse('exchange-quote'), {'from_currency': 'USD', 'to_currency': 'YER', 'amount': amount})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_convert_executes_at_quoted_rate_once(self):
+        from .models import UsedQuote
+        quote = self._quote()
+        self.assertEqual(quote['amount_received'], 53000.0)
+        self.rate.buy_rate = Decimal('540')
+        self.rate.save()
+
+        response = self.client.post(reverse('convert-currency'), {'quote': quote['quote']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['amount_received'], 53000.0)
+        self.assertEqual(UsedQuote.objects.get(quote_id=quote['quote_id']).reference_number, response.data['reference_number'])
+
+        response = self.client.post(reverse('convert-currency'), {'quote': quote['quote']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(Wallet.objects.get(user=self.user, currency='USD').balance, Decimal('400.00'))
+
+    def test_quote_uses_refreshed_matrix_after_rate_change(self):
+        self.assertEqual(self._quote()['exchange_rate'], 530.0)
+        self.rate.buy_rate = Decimal('540')
+        self.rate.save()
+        self.assertEqual(self._quote()['exchange_rate'], 540.0)
+
+    def test_rejects_tampered_expired_and_foreign_quotes(self):
+        token = self._quote()['quote']
+        response = self.client.post(reverse('convert-currency'), {'quote': token[:-2] + 'xx'}, format='json')
+        self.assertEqual(response.data['error'], 'invalid_quote')
+
+        with override_settings(FX_QUOTE_TTL_SECONDS=-1):
+            response = self.client.post(reverse('convert-currency'), {'quote': token}, format='json')
+        self.assertEqual(response.data['error'], 'quote_expired')
+
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user(username='other', password='pass', phone_number='777000021'))
+        response = other.post(reverse('convert-currency'), {'quote': token}, format='json')
+        self.assertEqual((response.status_code, response.data['error']), (status.HTTP_400_BAD_REQUEST, 'invalid_quote'))
@@ -0,0 +1,265 @@
+"""
+تحديد معدل الطلبات (Token Bucket) لنقاط المال ومزود الخدمة.
+
+- كل واجهة تحدد مجموعتها بالخاصية throttle_scope (مثل 'money' أو 'provider')،
+  والمعدلات في settings.THROTTLE_RATES لكل مجموعة: حد للمستخدم وحد لعنوان IP.
+- حد الـ IP يُطبق في IPThrottleMiddleware قبل المصادقة وقبل أي استعلام لقاعدة البيانات.
+- حد المستخدم يُطبق في UserTokenBucketThrottle (ضمن DEFAULT_THROTTLE_CLASSES).
+- limit_inflight يحد عدد العمليات المالية المتزامنة لكل مستخدم.
+
+المخزن قابل للتبديل عبر settings.THROTTLE_BACKEND: MemoryBackend (داخل العملية)
+أو RedisBackend (سكربتات Lua ذرية، مشتركة بين العمليات).
+"""
+import functools
+import math
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.http import JsonResponse
+from django.utils.module_loading import import_string
+from rest_framework import response, status
+from rest_framework.throttling import BaseThrottle
+
+THROTTLED_MESSAGE = 'تم تجاوز عدد الطلبات المسموح، يرجى المحاولة لاحقاً'
+INFLIGHT_MESSAGE = 'لديك عمليات قيد التنفيذ، يرجى الانتظار حتى تكتمل'
+
+PERIODS = {'s': 1, 'sec': 1, 'm': 60, 'min': 60, 'h': 3600, 'hour': 3600, 'd': 86400, 'day': 86400}
+
+
+def parse_rate(rate):
+    """'10/min' -> (السعة، عدد الرموز المضافة في الثانية)"""
+    if not rate:
+        return None
+    num, period = rate.split('/')
+    capacity = int(num)
+    return capacity, capacity / PERIODS[period]
+
+
+def rate_for(scope, kind):
+    if not scope:
+        return None
+    rates = getattr(settings, 'THROTTLE_RATES', {}).get(scope, {})
+    return parse_rate(rates.get(kind))
+
+
+class MemoryBackend:
+    """مخزن داخل العملية (كل عامل له عداداته)، مناسب للتطوير والخادم الواحد"""
+
+    PRUNE_EVERY = 1000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._inflight = {}
+        self._ops = 0
+
+    def consume(self, key, capacity, rate, cost=1):
+        now = time.monotonic()
+        with self._lock:
+            self._ops += 1
+            if self._ops % self.PRUNE_EVERY == 0:
+                self._prune(now)
+            tokens, last = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - last) * rate)
+            if tokens >= cost:
+                self._buckets[key] = (tokens - cost, now)
+                return True, 0
+            self._buckets[key] = (tokens, now)
+            return False, (cost - tokens) / rate
+
+    def _prune(self, now):
+        # الدلو الممتلئ مكافئ للدلو غير الموجود، فلا داعي للاحتفاظ به
+        idle = [k for k, (_, last) in self._buckets.items() if now - last > 3600]
+        for key in idle:
+            del self._buckets[key]
+        for key in list(self._inflight):
+            self._live_slots(key, now)
+
+    def _live_slots(self, key, now):
+        """مواعيد انتهاء الحجوزات غير المنتهية للمفتاح (الحجز المتسرب من عامل توقف ينتهي بعد ttl)"""
+        slots = [deadline for deadline in self._inflight.get(key, ()) if deadline > now]
+        if slots:
+            self._inflight[key] = slots
+        else:
+            self._inflight.pop(key, None)
+        return slots
+
+    def acquire(self, key, limit, ttl):
+        now = time.monotonic()
+        with self._lock:
+            slots = self._live_slots(key, now)
+            if len(slots) >= limit:
+                return False
+            self._inflight[key] = slots + [now + ttl]
+            return True
+
+    def release(self, key):
+        with self._lock:
+            slots = self._live_slots(key, time.monotonic())
+            if slots:
+                slots.remove(min(slots))
+                if not slots:
+                    self._inflight.pop(key, None)
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+            self._inflight.clear()
+
+
+class RedisBackend:
+    """مخزن مشترك في Redis؛ كل عملية تُنفذ بسكربت Lua واحد حتى تبقى ذرية بين العمال"""
+
+    CONSUME_SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local cost = tonumber(ARGV[4])
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    local allowed = 0
+    local wait = 0
+    if tokens >= cost then
+        tokens = tokens - cost
+        allowed = 1
+    else
+        wait = (cost - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+    return {allowed, tostring(wait)}
+    """
+
+    # الحجوزات ZSET بموعد انتهاء كل حجز (مثل MemoryBackend): الحجز المتسرب ينتهي بعد ttl
+    # حتى لو استمر المستخدم في الطلب؛ مدة المفتاح نفسه للتنظيف فقط
+    ACQUIRE_SCRIPT = """
+    local now = tonumber(ARGV[3])
+    redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+    if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[1]) then
+        return 0
+    end
+    redis.call('ZADD', KEYS[1], now + tonumber(ARGV[2]), ARGV[4])
+    redis.call('EXPIRE', KEYS[1], math.ceil(tonumber(ARGV[2])) + 1)
+    return 1
+    """
+
+    RELEASE_SCRIPT = """
+    redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', tonumber(ARGV[1]))
+    redis.call('ZPOPMIN', KEYS[1])
+    return redis.call('ZCARD', KEYS[1])
+    """
+
+    def __init__(self):
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured('RedisBackend يتطلب تثبيت الحزمة redis')
+        self.client = redis.Redis.from_url(getattr(settings, 'THROTTLE_REDIS_URL', 'redis://localhost:6379/0'))
+        self._consume = self.client.register_script(self.CONSUME_SCRIPT)
+        self._acquire = self.client.register_script(self.ACQUIRE_SCRIPT)
+        self._release = self.client.register_script(self.RELEASE_SCRIPT)
+
+    def consume(self, key, capacity, rate, cost=1):
+        allowed, wait = self._consume(keys=[key], args=[capacity, rate, time.time(), cost])
+        return bool(allowed), float(wait)
+
+    def acquire(self, key, limit, ttl):
+        return bool(self._acquire(keys=[key], args=[limit, ttl, time.time(), uuid.uuid4().hex]))
+
+    def release(self, key):
+        self._release(keys=[key], args=[time.time()])
+
+    def reset(self):
+        for key in self.client.scan_iter('throttle:*'):
+            self.client.delete(key)
+        for key in self.client.scan_iter('inflight:*'):
+            self.client.delete(key)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                path = getattr(settings, 'THROTTLE_BACKEND', 'apps.wallets.throttling.MemoryBackend')
+                _backend = import_string(path)()
+    return _backend
+
+
+class UserTokenBucketThrottle(BaseThrottle):
+    """حد المستخدم لمجموعة الواجهة؛ الواجهات بدون throttle_scope لا تتأثر"""
+
+    def allow_request(self, request, view):
+        self.wait_seconds = None
+        rule = rate_for(getattr(view, 'throttle_scope', None), 'user')
+        if rule is None or not request.user or not request.user.is_authenticated:
+            return True
+        allowed, self.wait_seconds = get_backend().consume(f"throttle:{view.throttle_scope}:user:{request.user.pk}", *rule)
+        return allowed
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class IPThrottleMiddleware:
+    """
+    حد عنوان IP لمجموعة الواجهة. يعمل في process_view أي بعد تحديد الواجهة وقبل المصادقة،
+    فيتم رفض الطلبات المسيئة دون أي استعلام لقاعدة البيانات.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.ident = BaseThrottle()
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'view_class', None)
+        scope = getattr(view_class, 'throttle_scope', None)
+        rule = rate_for(scope, 'ip')
+        if rule is None:
+            return None
+        allowed, wait = get_backend().consume(f"throttle:{scope}:ip:{self.ident.get_ident(request)}", *rule)
+        if allowed:
+            return None
+        throttled = JsonResponse({'error': THROTTLED_MESSAGE}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+        throttled['Retry-After'] = str(max(1, math.ceil(wait)))
+        return throttled
+
+
+def limit_inflight(view_method):
+    """
+    مزخرف لدوال post في الواجهات المالية: يرفض الطلب (429) إذا كان للمستخدم
+    MAX_INFLIGHT_PER_USER عمليات قيد التنفيذ. كل حجز له مدة صلاحية حتى لا يبقى محجوزاً إذا توقف العامل.
+    """
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        limit = getattr(settings, 'MAX_INFLIGHT_PER_USER', 0)
+        user = request.user
+        if not limit or not user.is_authenticated:
+            return view_method(self, request, *args, **kwargs)
+
+        backend = get_backend()
+        key = f"inflight:{user.pk}"
+        if not backend.acquire(key, limit, getattr(settings, 'INFLIGHT_TTL_SECONDS', 60)):
+            return response.Response(
+                {'error': INFLIGHT_MESSAGE},
+                status=status.HTTP_429_TOO_MANY_REQUESTS,
+                headers={'Retry-After': '1'}
+            )
+        try:
+            return view_method(self, request, *args, **kwargs)
+        finally:
+            backend.release(key)
+
+    return wrapper
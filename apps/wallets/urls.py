@@ -4,7 +4,11 @@ from .views import (
     ExchangeRateView, 
     ExchangeRateManageView,
     TransactionListView, 
+    StatementExportView,
+    WalletSummaryView,
     P2PTransferView, 
+    P2PBatchTransferView,
+    ExchangeQuoteView,
     ConvertCurrencyView,
     ConversionHistoryView
 )
@@ -14,7 +18,11 @@ urlpatterns = [
     path('rates/', ExchangeRateView.as_view(), name='exchange-rates'),
     path('rates/manage/', ExchangeRateManageView.as_view(), name='exchange-rates-manage'),
     path('transactions/', TransactionListView.as_view(), name='transactions'),
+    path('transactions/export/', StatementExportView.as_view(), name='transactions-export'),
+    path('summary/', WalletSummaryView.as_view(), name='wallet-summary'),
     path('transfer-p2p/', P2PTransferView.as_view(), name='transfer-p2p'),
+    path('transfer-p2p/batch/', P2PBatchTransferView.as_view(), name='transfer-p2p-batch'),
+    path('quote/', ExchangeQuoteView.as_view(), name='exchange-quote'),
     path('convert/', ConvertCurrencyView.as_view(), name='convert-currency'),
     path('conversions/', ConversionHistoryView.as_view(), name='conversion-history'),
 ]
@@ -1,12 +1,24 @@
 from rest_framework import views, response, permissions, status, generics
-from django.db.models import Sum
-from django.db import transaction
-from .models import Wallet, Transaction, ExchangeRate, CurrencyConversion
+from django.utils.dateparse import parse_date
+from django.db.models import Sum, Max, Count
+from django.db import transaction, IntegrityError
+from .models import Wallet, Transaction, ExchangeRate, CurrencyConversion, DailyWalletSummary, UsedQuote
+from .idempotency import idempotent
+from .throttling import limit_inflight
+from .conditional import ConditionalGetMixin
+from .outbox import publish, transfer_received
+from .statements import transaction_row, conversion_row, archived_transaction_rows, archived_conversion_rows, day_start, day_end
+from .ledger import post_journal, wallet_posting, system_posting, to_amount, materialize_wallet, InsufficientFunds
+from .quotes import issue_quote, verify_quote, QuoteError
 from apps.authentication.models import User
 
-class WalletBalanceView(views.APIView):
+class WalletBalanceView(ConditionalGetMixin, views.APIView):
     permission_classes = [permissions.IsAuthenticated]
 
+    def get_version(self, request):
+        version = Wallet.objects.filter(user=request.user).aggregate(last=Max('updated_at'), count=Count('id'))
+        return f"{version['last']}|{version['count']}", version['last']
+
     def get(self, request):
         user = request.user
         print(f" طلب الأرصدة من المستخدم: {user.username}")
@@ -29,9 +41,13 @@ class WalletBalanceView(views.APIView):
         print(f"✅ Returning wallets: {balances}")
         return response.Response(balances)
 
-class ExchangeRateView(views.APIView):
+class ExchangeRateView(ConditionalGetMixin, views.APIView):
     permission_classes = [permissions.AllowAny]
 
+    def get_version(self, request):
+        version = ExchangeRate.objects.aggregate(last=Max('updated_at'), count=Count('id'))
+        return f"{version['last']}|{version['count']}", version['last']
+
     def get(self, request):
         rates = ExchangeRate.objects.filter(is_active=True)
         data = [
@@ -131,16 +147,14 @@ class TransactionListView(views.APIView):
                 queryset = queryset.filter(transaction_type=trx_type)
 
         if start_date:
-            from django.utils.dateparse import parse_date
             sd = parse_date(start_date)
             if sd:
-                queryset = queryset.filter(created_at__date__gte=sd)
+                queryset = queryset.filter(created_at__gte=day_start(sd))
 
         if end_date:
-            from django.utils.dateparse import parse_date
             ed = parse_date(end_date)
             if ed:
-                queryset = queryset.filter(created_at__date__lte=ed)
+                queryset = queryset.filter(created_at__lt=day_end(ed))
 
         # Fetch CurrencyConversions if relevant
         conversions_data = []
@@ -153,69 +167,32 @@ class TransactionListView(views.APIView):
                 conv_qs = conv_qs.filter(Q(from_currency=currency) | Q(to_currency=currency))
             
             if start_date:
-                from django.utils.dateparse import parse_date
                 sd = parse_date(start_date)
                 if sd:
-                    conv_qs = conv_qs.filter(created_at__date__gte=sd)
+                    conv_qs = conv_qs.filter(created_at__gte=day_start(sd))
             
             if end_date:
-                from django.utils.dateparse import parse_date
                 ed = parse_date(end_date)
                 if ed:
-                    conv_qs = conv_qs.filter(created_at__date__lte=ed)
+                    conv_qs = conv_qs.filter(created_at__lt=day_end(ed))
             
             # Convert to standardized format
             for c in conv_qs[:offset + limit]: # Fetch enough to merge
-                conversions_data.append({
-                    'id': f"conv_{c.id}",
-                    'reference_number': c.reference_number,
-                    'type': 'EXCHANGE',
-                    'direction': 'EXCHANGE',
-                    'amount': float(c.amount_sent),
-                    'currency': c.from_currency,
-                    'target_amount': float(c.amount_received),
-                    'target_currency': c.to_currency,
-                    'exchange_rate': float(c.exchange_rate),
-                    'description': f"صارفة من {c.from_currency} إلى {c.to_currency}",
-                    'created_at': c.created_at.isoformat(),
-                    'status': 'SUCCESS' if c.status == 'COMPLETED' else c.status,
-                    'other_party_name': "",
-                    'other_party_phone': "",
-                })
+                conversions_data.append(conversion_row(c))
 
         # Fetch Transactions
         transactions_data = []
         for t in queryset[:offset + limit]:
-            ref_no = t.reference_number or f"TRX-{t.id}"
-            other_party_name = ""
-            other_party_phone = ""
-            if t.to_user:
-                other_party_phone = t.to_user.phone_number or ""
-                other_party_name = f"{t.to_user.first_name} {t.to_user.last_name}".strip()
-                if not other_party_name:
-                    other_party_name = t.to_user.username
-
-            direction = "IN"
-            if t.transaction_type == 'DEPOSIT':
-                direction = "IN"
-            elif t.transaction_type == 'WITHDRAW':
-                direction = "OUT"
-            elif t.transaction_type == 'TRANSFER':
-                direction = "OUT" if "إلى" in (t.description or "") else "IN"
-
-            transactions_data.append({
-                'id': t.id,
-                'reference_number': ref_no,
-                'type': t.transaction_type,
-                'direction': direction,
-                'amount': float(t.amount),
-                'currency': t.currency,
-                'description': t.description,
-                'created_at': t.created_at.isoformat(),
-                'status': t.status,
-                'other_party_name': other_party_name,
-                'other_party_phone': other_party_phone,
-            })
+            transactions_data.append(transaction_row(t, t.to_user))
+
+        # Archived (cold) history is only read when the requested range reaches archived months
+        if start_date and parse_date(start_date):
+            sd = parse_date(start_date)
+            ed = parse_date(end_date) if end_date else None
+            if trx_type != 'EXCHANGE':
+                transactions_data += archived_transaction_rows(user, sd, ed, currency, trx_type)
+            if not trx_type or trx_type == 'all' or trx_type == 'EXCHANGE':
+                conversions_data += archived_conversion_rows(user, sd, ed, currency)
 
         # Merge and Sort
         all_data = transactions_data + conversions_data
@@ -226,10 +203,95 @@ class TransactionListView(views.APIView):
         
         return response.Response(final_data)
 
+class StatementExportView(views.APIView):
+    """
+    تصدير كشف حساب كامل بشكل متدفق (CSV أو JSON Lines) مع ضغط gzip اختياري.
+    المعاملات: start_date, end_date, currency, output=csv|jsonl, gzip=1
+    (لا نستخدم format لأن DRF يحجزه لاختيار الـ renderer)
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        from django.http import StreamingHttpResponse
+        from .statements import FORMATS, export_statement
+
+        user = request.user
+        target_user_id = request.GET.get('user_id')
+        if target_user_id and request.user.is_staff:
+            try:
+                user = User.objects.get(id=target_user_id)
+            except (User.DoesNotExist, ValueError):
+                return response.Response({'error': 'المستخدم غير موجود'}, status=status.HTTP_404_NOT_FOUND)
+
+        fmt = request.GET.get('output', 'csv')
+        if fmt not in FORMATS:
+            return response.Response({'error': 'الصيغة غير مدعومة (csv أو jsonl)'}, status=status.HTTP_400_BAD_REQUEST)
+
+        start_date = parse_date(request.GET.get('start_date') or '')
+        end_date = parse_date(request.GET.get('end_date') or '')
+        currency = request.GET.get('currency')
+        compress = request.GET.get('gzip') in ('1', 'true')
+
+        _, content_type, extension = FORMATS[fmt]
+        filename = f"statement-{user.id}.{extension}" + ('.gz' if compress else '')
+
+        stream = StreamingHttpResponse(
+            export_statement(user, fmt, compress, start_date, end_date, currency),
+            content_type='application/gzip' if compress else content_type
+        )
+        stream['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return stream
+
+class WalletSummaryView(views.APIView):
+    """
+    إجماليات الفترة حسب العملة ونوع الحركة + سلسلة يومية، من جدول الملخصات اليومية
+    (التكلفة تتناسب مع عدد الأيام وليس عدد الحركات).
+    المعاملات: start_date, end_date, currency
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        summaries = DailyWalletSummary.objects.filter(user=request.user)
+
+        start_date = parse_date(request.GET.get('start_date') or '')
+        end_date = parse_date(request.GET.get('end_date') or '')
+        currency = request.GET.get('currency')
+        if start_date:
+            summaries = summaries.filter(day__gte=start_date)
+        if end_date:
+            summaries = summaries.filter(day__lte=end_date)
+        if currency and currency != 'all':
+            summaries = summaries.filter(currency=currency)
+
+        totals = (
+            summaries.values('currency', 'transaction_type')
+            .annotate(count=Sum('count'), total=Sum('total'))
+            .order_by('currency', 'transaction_type')
+        )
+        daily = (
+            summaries.values('day', 'currency')
+            .annotate(count=Sum('count'), total=Sum('total'))
+            .order_by('day', 'currency')
+        )
+
+        return response.Response({
+            'totals': [
+                {'currency': r['currency'], 'type': r['transaction_type'], 'count': r['count'], 'total': float(r['total'])}
+                for r in totals
+            ],
+            'daily': [
+                {'day': r['day'].isoformat(), 'currency': r['currency'], 'count': r['count'], 'total': float(r['total'])}
+                for r in daily
+            ],
+        })
+
 class P2PTransferView(views.APIView):
     """تحويل بين محفظتين (نفس العملة أو مختلفة)"""
     permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = 'money'
 
+    @limit_inflight
+    @idempotent
     def post(self, request):
         sender = request.user
         phone = request.data.get('phone')
@@ -269,7 +331,8 @@ class P2PTransferView(views.APIView):
             # Get sender wallet - prioritize wallet with balance if duplicates exist
             sender_wallet = Wallet.objects.filter(user=sender, currency=currency).order_by('-balance').first()
             if not sender_wallet:
-                return response.Response({'error': 'محفظة المرسل غير موجودة'}, status=status.HTTP_400_BAD_REQUEST)
+                # لا توجد محفظة = رصيد صفر
+                return response.Response({'error': 'insufficient_funds'}, status=status.HTTP_400_BAD_REQUEST)
 
             from decimal import Decimal
             bal_dec = Decimal(str(sender_wallet.balance))
@@ -278,18 +341,9 @@ class P2PTransferView(views.APIView):
             if bal_dec < amt_dec:
                 return response.Response({'error': 'insufficient_funds'}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Get or create recipient wallet
-            recipient_wallet, _ = Wallet.objects.get_or_create(
-                user=recipient,
-                currency=currency,
-                defaults={'balance': 0, 'is_active': True}
-            )
-
             with transaction.atomic():
-                # Deduct from sender
-                sender_wallet.balance = Decimal(str(sender_wallet.balance)) - Decimal(str(amount))
-                sender_wallet.save()
-                
+                # محفظة المستلم تُنشأ عند أول إيداع
+                recipient_wallet = materialize_wallet(recipient, currency)
                 sender_transaction = Transaction.objects.create(
                     user=sender,
                     amount=Decimal(str(amount)),
@@ -300,10 +354,13 @@ class P2PTransferView(views.APIView):
                     status='SUCCESS'
                 )
 
-                # Add to recipient
-                recipient_wallet.balance = Decimal(str(recipient_wallet.balance)) + Decimal(str(amount))
-                recipient_wallet.save()
-                
+                # Deduct from sender & add to recipient (double-entry)
+                post_journal(
+                    [wallet_posting(sender_wallet, -amt_dec), wallet_posting(recipient_wallet, amt_dec)],
+                    description=f"تحويل P2P من {sender.username} إلى {recipient.username}",
+                    reference_number=sender_transaction.reference_number
+                )
+
                 Transaction.objects.create(
                     user=recipient,
                     amount=Decimal(str(amount)),
@@ -314,6 +371,12 @@ class P2PTransferView(views.APIView):
                     status='SUCCESS'
                 )
 
+                # إشعار المستلم بعد الاعتماد (dispatch_outbox)
+                publish(*transfer_received(
+                    recipient.id, amt_dec, currency, sender.username, sender_transaction.reference_number
+                ))
+
+            sender_wallet.refresh_from_db(fields=['balance'])
             return response.Response({
                 'message': 'تم التحويل بنجاح',
                 'new_balance': float(sender_wallet.balance),
@@ -321,24 +384,125 @@ class P2PTransferView(views.APIView):
                 'id': sender_transaction.id
             })
 
+        except InsufficientFunds:
+            return response.Response({'error': 'insufficient_funds'}, status=status.HTTP_400_BAD_REQUEST)
         except User.DoesNotExist:
             return response.Response({'error': 'المستخدم المستلم غير موجود'}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
             return response.Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+class P2PBatchTransferView(views.APIView):
+    """
+    تحويل دفعة من مرسل واحد إلى عدة مستلمين.
+    mode=atomic: الكل أو لا شيء. mode=partial: تنفيذ البنود الصالحة فقط.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = 'money'
+
+    @limit_inflight
+    @idempotent
+    def post(self, request):
+        from django.conf import settings
+        from .services import execute_batch_transfer, BatchTransferError
+
+        sender = request.user
+        currency = request.data.get('currency', 'YER')
+        mode = request.data.get('mode', 'atomic')
+        items = request.data.get('transfers')
+
+        if mode not in ('atomic', 'partial'):
+            return response.Response({'error': 'وضع التنفيذ غير صحيح (atomic أو partial)'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not isinstance(items, list) or not items or not all(isinstance(i, dict) for i in items):
+            return response.Response({'error': 'يجب إرسال قائمة التحويلات'}, status=status.HTTP_400_BAD_REQUEST)
+
+        max_items = getattr(settings, 'P2P_BATCH_MAX_ITEMS', 500)
+        if len(items) > max_items:
+            return response.Response({'error': f'الحد الأقصى لعدد التحويلات في الدفعة هو {max_items}'}, status=status.HTTP_400_BAD_REQUEST)
+
+        print(f"🔁 طلب تحويل دفعة P2P من: {sender.username} | عدد البنود: {len(items)} | الوضع: {mode}")
+        try:
+            sender_wallet, results = execute_batch_transfer(sender, currency, items, atomic=(mode == 'atomic'))
+        except BatchTransferError as e:
+            return response.Response({
+                'error': 'فشل تنفيذ الدفعة',
+                'results': e.results
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return response.Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        succeeded = [r for r in results if r['status'] == 'SUCCESS']
+        return response.Response({
+            'message': 'تم تنفيذ الدفعة',
+            'mode': mode,
+            'succeeded': len(succeeded),
+            'failed': len(results) - len(succeeded),
+            'total_amount': sum(r['amount'] for r in succeeded),
+            'new_balance': float(sender_wallet.balance),
+            'results': results
+        })
+
+class ExchangeQuoteView(views.APIView):
+    """
+    عرض سعر صرف موقع وقصير الأجل (quotes.py) يُرسل كما هو إلى convert/ في حقل quote.
+    GET ?from_currency=USD&to_currency=YER&amount=100
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        from_currency = request.query_params.get('from_currency')
+        to_currency = request.query_params.get('to_currency')
+        amount = request.query_params.get('amount')
+        if not all([from_currency, to_currency, amount]):
+            return response.Response({'error': 'بيانات غير مكتملة'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            token, quote = issue_quote(request.user, from_currency, to_currency, amount)
+        except QuoteError as e:
+            return response.Response({'error': e.code, 'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return response.Response({
+            'quote': token,
+            'quote_id': quote['quote_id'],
+            'from_currency': from_currency,
+            'to_currency': to_currency,
+            'amount': float(quote['amount']),
+            'exchange_rate': float(quote['exchange_rate']),
+            'amount_received': float(quote['amount_received']),
+            'expires_at': quote['expires_at'],
+        }, headers={'Cache-Control': 'private, no-store'})
+
 class ConvertCurrencyView(views.APIView):
-    """تحويل عملة (صرافة) للمستخدم نفسه"""
+    """
+    تحويل عملة (صرافة) للمستخدم نفسه.
+    مع quote (من quote/) يُنفذ بالسعر والمبلغ المثبتين في العرض دون قراءة ExchangeRate،
+    وبدونه بسعر الشراء الحالي.
+    """
     permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = 'money'
 
+    @limit_inflight
+    @idempotent
     def post(self, request):
         user = request.user
         print(f"\n{'='*60}")
         print(f" طلب تحويل عملة من المستخدم: {user.username}")
         print(f" البيانات المستلمة: {request.data}")
         
-        from_currency = request.data.get('from_currency')
-        to_currency = request.data.get('to_currency')
-        amount = request.data.get('amount')
+        quote_token = request.data.get('quote')
+        quote_id = None
+        if quote_token:
+            try:
+                quote = verify_quote(quote_token, user)
+            except QuoteError as e:
+                return response.Response({'error': e.code, 'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            quote_id = quote['quote_id']
+            from_currency, to_currency = quote['from_currency'], quote['to_currency']
+            amount = quote['amount']
+        else:
+            from_currency = request.data.get('from_currency')
+            to_currency = request.data.get('to_currency')
+            amount = request.data.get('amount')
 
         print(f"   من عملة: {from_currency}")
         print(f"   إلى عملة: {to_currency}")
@@ -351,40 +515,33 @@ class ConvertCurrencyView(views.APIView):
         try:
             amount = float(amount)
             print(f" المبلغ بعد التحويل: {amount}")
-            
-            # Get exchange rate
-            rate_obj = ExchangeRate.objects.filter(
-                from_currency=from_currency,
-                to_currency=to_currency,
-                is_active=True
-            ).first()
 
-            if not rate_obj:
-                return response.Response({'error': 'سعر الصرف غير متوفر'}, status=status.HTTP_400_BAD_REQUEST)
+            if quote_id:
+                # السعر والمبلغ المستلم مثبتان في العرض الموقع
+                exchange_rate = float(quote['exchange_rate'])
+                amount_received = float(quote['amount_received'])
+            else:
+                # Get exchange rate
+                rate_obj = ExchangeRate.objects.filter(
+                    from_currency=from_currency,
+                    to_currency=to_currency,
+                    is_active=True
+                ).first()
+
+                if not rate_obj:
+                    return response.Response({'error': 'سعر الصرف غير متوفر'}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Calculate received amount
-            exchange_rate = float(rate_obj.buy_rate)
-            amount_received = amount * exchange_rate
+                # Calculate received amount
+                exchange_rate = float(rate_obj.buy_rate)
+                amount_received = float(to_amount(amount * exchange_rate))
 
             # Get sender wallet
             from_wallet = Wallet.objects.filter(user=user, currency=from_currency).first()
             if not from_wallet or from_wallet.balance < amount:
                 return response.Response({'error': 'insufficient_funds'}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Get or create recipient wallet
-            to_wallet, _ = Wallet.objects.get_or_create(
-                user=user,
-                currency=to_currency,
-                defaults={'balance': 0, 'is_active': True}
-            )
-
-            from decimal import Decimal
-            
             with transaction.atomic():
-                # Deduct from source currency
-                from_wallet.balance = from_wallet.balance - Decimal(str(amount))
-                from_wallet.save()
-                
+                to_wallet = materialize_wallet(user, to_currency)
                 Transaction.objects.create(
                     user=user,
                     amount=amount,
@@ -394,10 +551,6 @@ class ConvertCurrencyView(views.APIView):
                     status='SUCCESS'
                 )
 
-                # Add to target currency
-                to_wallet.balance = to_wallet.balance + Decimal(str(amount_received))
-                to_wallet.save()
-                
                 Transaction.objects.create(
                     user=user,
                     amount=amount_received,
@@ -417,7 +570,24 @@ class ConvertCurrencyView(views.APIView):
                     amount_received=amount_received,
                     status='COMPLETED'
                 )
+                if quote_id:
+                    # فريد: التنفيذ الثاني لنفس العرض يفشل هنا ويُلغى كل ما سبق في المعاملة
+                    UsedQuote.objects.create(quote_id=quote_id, user=user, reference_number=conversion.reference_number)
+
+                # Source wallet -> FX desk (from currency), FX desk -> target wallet (to currency)
+                post_journal(
+                    [
+                        wallet_posting(from_wallet, -to_amount(amount)),
+                        system_posting('FX', from_currency, to_amount(amount)),
+                        system_posting('FX', to_currency, -to_amount(amount_received)),
+                        wallet_posting(to_wallet, to_amount(amount_received)),
+                    ],
+                    description=f"صرف من {from_currency} إلى {to_currency}",
+                    reference_number=conversion.reference_number
+                )
 
+            from_wallet.refresh_from_db(fields=['balance'])
+            to_wallet.refresh_from_db(fields=['balance'])
             return response.Response({
                 'message': 'تمت عملية الصرف بنجاح',
                 'amount_received': amount_received,
@@ -427,13 +597,25 @@ class ConvertCurrencyView(views.APIView):
                 'id': conversion.id
             })
 
+        except InsufficientFunds:
+            return response.Response({'error': 'insufficient_funds'}, status=status.HTTP_400_BAD_REQUEST)
+        except IntegrityError:
+            if quote_id and UsedQuote.objects.filter(quote_id=quote_id).exists():
+                return response.Response({'error': 'quote_already_used'}, status=status.HTTP_409_CONFLICT)
+            return response.Response({'error': 'تعذر تنفيذ العملية'}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return response.Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-class ConversionHistoryView(views.APIView):
+class ConversionHistoryView(ConditionalGetMixin, views.APIView):
     """سجل عمليات صرف العملات"""
     permission_classes = [permissions.IsAuthenticated]
 
+    def get_version(self, request):
+        version = CurrencyConversion.objects.filter(user=request.user).aggregate(
+            last_id=Max('id'), last=Max('created_at'), count=Count('id')
+        )
+        return f"{version['last_id']}|{version['count']}", version['last']
+
     def get(self, request):
         conversions = CurrencyConversion.objects.filter(user=request.user)[:50]
         data = [
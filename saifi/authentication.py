@@ -0,0 +1,146 @@
+"""
+مصادقة JWT مع تخزين المستخدم مؤقتاً، حتى لا يتم الاستعلام من جدول المستخدمين في كل طلب.
+
+- LRU داخل كل عملية بمدة قصيرة (AUTH_USER_CACHE_TTL)، مفتاحه رقم المستخدم وقيمته (النسخة، المستخدم).
+- رقم نسخة لكل مستخدم في الكاش المشترك (AUTH_USER_CACHE_ALIAS) يُقرأ في كل طلب (قراءة مفتاح واحد
+  بدلاً من جلب المستخدم). invalidate_user (عند حفظ المستخدم) يزيد النسخة، فيعيد كل العمال تحميل
+  المستخدم في الطلب التالي (تعطيل الحساب، تغيير كلمة المرور) بدلاً من انتظار انتهاء المدة.
+- بدون كاش مشترك (AUTH_USER_CACHE_ALIAS = None) أو عند تعذر قراءته يعتمد كل عامل على المدة فقط:
+  العمال الآخرون يرون التعديل بعد AUTH_USER_CACHE_TTL على الأكثر.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+def _ttl():
+    return getattr(settings, 'AUTH_USER_CACHE_TTL', 10)
+
+
+class _LRU:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_local = _LRU(getattr(settings, 'AUTH_USER_CACHE_SIZE', 1024))
+
+
+def _shared():
+    alias = getattr(settings, 'AUTH_USER_CACHE_ALIAS', None)
+    return caches[alias] if alias else None
+
+
+def _version_key(key):
+    return f"auth:user:{key}:version"
+
+
+def _version(key):
+    """نسخة المستخدم في الكاش المشترك (None بدون كاش مشترك: الاعتماد على المدة فقط)"""
+    shared = _shared()
+    if shared is None:
+        return None
+    try:
+        return shared.get(_version_key(key), 0)
+    except Exception as e:
+        print(f"⚠️ Auth user version read failed: {e}")
+        return None
+
+
+def _bump(key):
+    shared = _shared()
+    if shared is None:
+        return
+    try:
+        shared.incr(_version_key(key))
+    except ValueError:
+        # لا توجد نسخة مخزنة (0)؛ أي قيمة مختلفة تكفي لإبطال نسخ العمال
+        shared.set(_version_key(key), 1, None)
+    except Exception as e:
+        print(f"⚠️ Auth user version bump failed: {e}")
+
+
+def invalidate_user(user_id):
+    """حذف المستخدم المخزن في هذه العملية وزيادة نسخته في الكاش المشترك لباقي العمال"""
+    key = str(user_id)
+    _local.delete(key)
+    _bump(key)
+
+
+def clear_local_cache():
+    _local.clear()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication مع تحميل المستخدم من الكاش بدلاً من قاعدة البيانات"""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        user = self.load_user(user_id)
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return user
+
+    def load_user(self, user_id):
+        # رقم المستخدم في الرمز نص، وعند الحفظ عدد
+        key = str(user_id)
+        version = _version(key)
+        cached = _local.get(key)
+        if cached is not None and cached[0] == version:
+            user = cached[1]
+        else:
+            try:
+                user = self.user_model.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist as e:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found") from e
+            _local.set(key, (version, user), _ttl())
+
+        # نسخة مستقلة لكل طلب حتى لا تنتقل تعديلات الواجهة على request.user إلى الكاش
+        return copy.copy(user)
@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
+
+
+class JobsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'saifi.jobs'
+    label = 'jobs'
+    verbose_name = 'المهام الخلفية'
+
+    def ready(self):
+        # تسجيل المهام المعرفة في ملفات jobs.py لكل تطبيق
+        autodiscover_modules('jobs')
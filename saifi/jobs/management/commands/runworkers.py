@@ -0,0 +1,44 @@
+import multiprocessing
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from saifi.jobs.worker import Worker
+
+
+def _run(threads, poll_interval, burst):
+    return Worker(threads=threads, poll_interval=poll_interval, burst=burst).run()
+
+
+class Command(BaseCommand):
+    help = 'تشغيل عمال المهام الخلفية (طابور قاعدة البيانات، بدون وسيط خارجي)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4, help='عدد الخيوط في كل عملية')
+        parser.add_argument('--processes', type=int, default=1, help='عدد العمليات (للمهام كثيفة المعالجة)')
+        parser.add_argument('--poll', type=float, default=1.0, help='ثوان الانتظار عندما يكون الطابور فارغاً')
+        parser.add_argument('--burst', action='store_true', help='الخروج عند فراغ الطابور')
+
+    def handle(self, *args, **options):
+        threads, poll, burst = options['threads'], options['poll'], options['burst']
+        self.stdout.write(f"بدء {options['processes']} عملية × {threads} خيط")
+
+        if options['processes'] <= 1:
+            counters = _run(threads, poll, burst)
+            self.stdout.write(self.style.SUCCESS(f"نجحت {counters['succeeded']}، فشلت {counters['failed']}"))
+            return
+
+        # لا تُورث اتصالات قاعدة البيانات للعمليات الفرعية
+        connections.close_all()
+        ctx = multiprocessing.get_context('fork')
+        processes = [ctx.Process(target=_run, args=(threads, poll, burst)) for _ in range(options['processes'])]
+        for p in processes:
+            p.start()
+        try:
+            for p in processes:
+                p.join()
+        except KeyboardInterrupt:
+            for p in processes:
+                p.terminate()
+                p.join()
+        self.stdout.write(self.style.SUCCESS('تم إيقاف العمال'))
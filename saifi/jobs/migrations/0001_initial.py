@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:18
+
+import django.core.serializers.json
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, verbose_name='المهمة')),
+                ('args', models.JSONField(default=list, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='المعاملات')),
+                ('kwargs', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='المعاملات المسماة')),
+                ('status', models.CharField(choices=[('QUEUED', 'في الانتظار'), ('RUNNING', 'قيد التنفيذ'), ('DONE', 'تمت'), ('FAILED', 'فشلت')], default='QUEUED', max_length=10, verbose_name='الحالة')),
+                ('priority', models.SmallIntegerField(default=0, verbose_name='الأولوية')),
+                ('run_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='موعد التنفيذ')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='عدد المحاولات')),
+                ('max_attempts', models.PositiveIntegerField(default=5, verbose_name='أقصى عدد محاولات')),
+                ('locked_by', models.CharField(blank=True, max_length=100, verbose_name='العامل')),
+                ('locked_until', models.DateTimeField(blank=True, null=True, verbose_name='محجوزة حتى')),
+                ('last_error', models.TextField(blank=True, verbose_name='آخر خطأ')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الإنشاء')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='تاريخ الانتهاء')),
+            ],
+            options={
+                'verbose_name': 'مهمة خلفية',
+                'verbose_name_plural': 'المهام الخلفية',
+                'indexes': [models.Index(fields=['status', 'run_at', 'priority'], name='jobs_job_status_7be836_idx'), models.Index(fields=['status', 'locked_until'], name='jobs_job_status_715db5_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """مهمة خلفية في طابور قاعدة البيانات (تُنفذ بأمر runworkers)"""
+    STATUS_CHOICES = [
+        ('QUEUED', 'في الانتظار'),
+        ('RUNNING', 'قيد التنفيذ'),
+        ('DONE', 'تمت'),
+        ('FAILED', 'فشلت'),
+    ]
+
+    name = models.CharField(max_length=200, verbose_name="المهمة")
+    args = models.JSONField(default=list, encoder=DjangoJSONEncoder, verbose_name="المعاملات")
+    kwargs = models.JSONField(default=dict, encoder=DjangoJSONEncoder, verbose_name="المعاملات المسماة")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='QUEUED', verbose_name="الحالة")
+    priority = models.SmallIntegerField(default=0, verbose_name="الأولوية")  # الأصغر أولاً
+    run_at = models.DateTimeField(default=timezone.now, verbose_name="موعد التنفيذ")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="عدد المحاولات")
+    max_attempts = models.PositiveIntegerField(default=5, verbose_name="أقصى عدد محاولات")
+    # مهلة الرؤية: إذا لم ينته العامل قبل locked_until تعود المهمة متاحة لعامل آخر
+    locked_by = models.CharField(max_length=100, blank=True, verbose_name="العامل")
+    locked_until = models.DateTimeField(null=True, blank=True, verbose_name="محجوزة حتى")
+    last_error = models.TextField(blank=True, verbose_name="آخر خطأ")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="تاريخ الإنشاء")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="تاريخ الانتهاء")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at', 'priority']),
+            models.Index(fields=['status', 'locked_until']),
+        ]
+        verbose_name = "مهمة خلفية"
+        verbose_name_plural = "المهام الخلفية"
+
+    def __str__(self):
+        return f"{self.name} #{self.id} ({self.status})"
@@ -0,0 +1,75 @@
+"""
+تسجيل المهام الخلفية وإضافتها إلى الطابور.
+
+    # apps/<app>/jobs.py
+    from saifi.jobs.tasks import task
+
+    @task(max_attempts=3, timeout=600)
+    def fan_out_broadcast(broadcast_id):
+        ...
+
+    fan_out_broadcast.enqueue(broadcast.id)              # الآن
+    fan_out_broadcast.enqueue(broadcast.id, delay=60)    # بعد دقيقة
+
+enqueue يكتب صف Job في المعاملة الحالية، فالمهمة لا تظهر للعمال إلا بعد اعتماد العملية التي أنشأتها.
+المعاملات يجب أن تكون قابلة للتحويل إلى JSON (أرقام معرفات وليس كائنات).
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+_registry = {}
+
+
+class Task:
+    def __init__(self, func, name, max_attempts, timeout, priority):
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self.priority = priority
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def enqueue(self, *args, run_at=None, delay=None, priority=None, **kwargs):
+        return enqueue(self.name, *args, run_at=run_at, delay=delay, priority=priority, **kwargs)
+
+
+def task(name=None, max_attempts=None, timeout=None, priority=0):
+    """تسجيل دالة كمهمة خلفية باسم module.function (أو name)"""
+    def register(func):
+        task_name = name or f"{func.__module__}.{func.__name__}"
+        _registry[task_name] = Task(
+            func,
+            task_name,
+            max_attempts or getattr(settings, 'JOBS_MAX_ATTEMPTS', 5),
+            timeout or getattr(settings, 'JOBS_VISIBILITY_TIMEOUT', 300),
+            priority,
+        )
+        return _registry[task_name]
+    return register
+
+
+def get_task(name):
+    return _registry.get(name)
+
+
+def enqueue(name, *args, run_at=None, delay=None, priority=None, **kwargs):
+    """إضافة مهمة إلى الطابور. run_at أو delay (ثوان) للجدولة"""
+    from .models import Job
+
+    registered = get_task(name)
+    if registered is None:
+        raise KeyError(f'مهمة غير مسجلة: {name}')
+    if run_at is None:
+        run_at = timezone.now() + timedelta(seconds=delay or 0)
+    return Job.objects.create(
+        name=name,
+        args=list(args),
+        kwargs=kwargs,
+        run_at=run_at,
+        priority=registered.priority if priority is None else priority,
+        max_attempts=registered.max_attempts,
+    )
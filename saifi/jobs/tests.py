@@ -0,0 +1,62 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from .models import Job
+from .tasks import task, enqueue
+from .worker import claim, run_pending
+
+calls = []
+
+
+@task(name='tests.record')
+def record(value):
+    calls.append(value)
+
+
+@task(name='tests.fail', max_attempts=2)
+def fail():
+    raise RuntimeError('down')
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueued_job_runs_once(self):
+        job = record.enqueue(7)
+        self.assertEqual(run_pending(), (1, 0))
+        self.assertEqual(calls, [7])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('DONE', 1))
+        self.assertEqual(run_pending(), (0, 0))
+
+    def test_scheduled_job_waits_until_due(self):
+        job = enqueue('tests.record', 1, delay=60)
+        self.assertEqual(run_pending(), (0, 0))
+        Job.objects.filter(id=job.id).update(run_at=timezone.now())
+        self.assertEqual(run_pending(), (1, 0))
+
+    def test_failure_is_retried_with_backoff_then_failed(self):
+        job = fail.enqueue()
+        self.assertEqual(run_pending(), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('QUEUED', 1))
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn('down', job.last_error)
+
+        Job.objects.filter(id=job.id).update(run_at=timezone.now())
+        self.assertEqual(run_pending(), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'FAILED')
+
+    def test_expired_lease_is_reclaimed_by_another_worker(self):
+        job = record.enqueue(3)
+        self.assertEqual([j.id for j in claim('worker-a')], [job.id])
+        self.assertEqual(claim('worker-b'), [])
+
+        Job.objects.filter(id=job.id).update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(run_pending('worker-b'), (1, 0))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by, job.attempts), ('DONE', 'worker-b', 2))
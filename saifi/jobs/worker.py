@@ -0,0 +1,155 @@
+"""
+تنفيذ المهام الخلفية من طابور قاعدة البيانات بدون وسيط خارجي.
+
+- الحجز: SELECT ... FOR UPDATE SKIP LOCKED لمهام QUEUED المستحقة (run_at <= الآن)
+  أو مهام RUNNING انتهت مهلة رؤيتها (locked_until) لأن عاملها توقف؛ تُعلم RUNNING
+  مع locked_by و locked_until = الآن + مهلة المهمة.
+- النجاح: DONE. الفشل: إعادة إلى QUEUED بتأخير متزايد، أو FAILED بعد max_attempts.
+- التحديث بعد التنفيذ مشروط بـ locked_by حتى لا يكتب عامل فقد الحجز فوق عامل آخر.
+- SQLite يتجاهل FOR UPDATE، لذلك يُؤكد الحجز بتحديث مشروط على الحالة قبل التنفيذ.
+"""
+import os
+import socket
+import threading
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+from .tasks import get_task
+
+
+def make_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+def _backoff(attempts):
+    base = getattr(settings, 'JOBS_RETRY_BASE_SECONDS', 10)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), getattr(settings, 'JOBS_RETRY_MAX_SECONDS', 3600)))
+
+
+def claim(worker_id, limit=1):
+    """حجز حتى limit مهمة مستحقة لهذا العامل"""
+    now = timezone.now()
+    due = Q(status='QUEUED', run_at__lte=now) | Q(status='RUNNING', locked_until__lt=now)
+    claimed = []
+    with transaction.atomic():
+        candidates = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(due)
+            .order_by('priority', 'run_at', 'id')
+            .values_list('id', 'name', 'status', 'locked_until', 'attempts', 'max_attempts')[:limit]
+        )
+        for job_id, name, job_status, locked_until, attempts, max_attempts in candidates:
+            rows = Job.objects.filter(id=job_id, status=job_status, locked_until=locked_until)
+            if job_status == 'RUNNING' and attempts >= max_attempts:
+                # توقف العامل أثناء المحاولة الأخيرة
+                rows.update(status='FAILED', last_error='انتهت مهلة التنفيذ', locked_until=None, finished_at=now)
+                continue
+            registered = get_task(name)
+            timeout = registered.timeout if registered else getattr(settings, 'JOBS_VISIBILITY_TIMEOUT', 300)
+            if rows.update(
+                status='RUNNING',
+                locked_by=worker_id,
+                locked_until=now + timedelta(seconds=timeout),
+                attempts=F('attempts') + 1,
+            ):
+                claimed.append(job_id)
+    return list(Job.objects.filter(id__in=claimed).order_by('priority', 'run_at', 'id'))
+
+
+def execute(job, worker_id):
+    """تنفيذ مهمة محجوزة وتسجيل النتيجة. تُرجع True عند النجاح"""
+    registered = get_task(job.name)
+    mine = Job.objects.filter(id=job.id, locked_by=worker_id, status='RUNNING')
+    try:
+        if registered is None:
+            raise LookupError(f'مهمة غير مسجلة: {job.name}')
+        registered.func(*job.args, **job.kwargs)
+    except Exception as e:
+        print(f"❌ Job {job.name} #{job.id} (محاولة {job.attempts}): {e}")
+        error = f"{type(e).__name__}: {e}"[:2000]
+        if job.attempts >= job.max_attempts:
+            mine.update(status='FAILED', last_error=error, locked_until=None, finished_at=timezone.now())
+        else:
+            mine.update(
+                status='QUEUED', last_error=error, locked_until=None, locked_by='',
+                run_at=timezone.now() + _backoff(job.attempts)
+            )
+        return False
+    mine.update(status='DONE', last_error='', locked_until=None, finished_at=timezone.now())
+    return True
+
+
+def run_pending(worker_id=None, limit=100):
+    """تنفيذ المهام المستحقة الآن في هذا الخيط (للاختبارات وتشغيل cron). تُرجع (نجحت، فشلت)"""
+    worker_id = worker_id or make_worker_id()
+    succeeded = failed = 0
+    while True:
+        jobs = claim(worker_id, limit=min(10, limit - succeeded - failed))
+        if not jobs:
+            return succeeded, failed
+        for job in jobs:
+            if execute(job, worker_id):
+                succeeded += 1
+            else:
+                failed += 1
+        if succeeded + failed >= limit:
+            return succeeded, failed
+
+
+class Worker:
+    """مجموعة خيوط تنفذ المهام حتى يُطلب الإيقاف (أو حتى يفرغ الطابور في وضع burst)"""
+
+    def __init__(self, threads=4, poll_interval=1.0, burst=False):
+        self.threads = threads
+        self.poll_interval = poll_interval
+        self.burst = burst
+        self.stopping = threading.Event()
+        self.counters = {'succeeded': 0, 'failed': 0}
+        self._lock = threading.Lock()
+
+    def _loop(self):
+        worker_id = make_worker_id()
+        try:
+            while not self.stopping.is_set():
+                close_old_connections()
+                try:
+                    jobs = claim(worker_id, limit=1)
+                except DatabaseError as e:
+                    # تعارض أقفال (database is locked في SQLite) أو انقطاع الاتصال: المحاولة لاحقاً
+                    print(f"⚠️ Job worker {worker_id}: {e}")
+                    self.stopping.wait(self.poll_interval)
+                    continue
+                if not jobs:
+                    if self.burst:
+                        return
+                    self.stopping.wait(self.poll_interval)
+                    continue
+                for job in jobs:
+                    ok = execute(job, worker_id)
+                    with self._lock:
+                        self.counters['succeeded' if ok else 'failed'] += 1
+        finally:
+            connection.close()
+
+    def run(self):
+        pool = [threading.Thread(target=self._loop, name=f'job-worker-{i}', daemon=True) for i in range(self.threads)]
+        for t in pool:
+            t.start()
+        try:
+            while any(t.is_alive() for t in pool):
+                for t in pool:
+                    t.join(timeout=0.5)
+        except KeyboardInterrupt:
+            self.stopping.set()
+            for t in pool:
+                t.join()
+        return self.counters
+
+    def stop(self):
+        self.stopping.set()
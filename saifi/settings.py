@@ -45,11 +45,19 @@ INSTALLED_APPS = [
     'apps.wallets',
     'apps.financials',
     'apps.recharge_and_payment',
+    'saifi.jobs',
 ]
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'saifi.authentication.CachedJWTAuthentication',
+    ),
+    'DEFAULT_THROTTLE_CLASSES': (
+        'apps.wallets.throttling.UserTokenBucketThrottle',
+    ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'saifi.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
     )
 }
 
@@ -61,6 +69,12 @@ SIMPLE_JWT = {
 
 AUTH_USER_MODEL = 'authentication.User'
 
+# Authenticated user cache (saifi.authentication.CachedJWTAuthentication)
+AUTH_USER_CACHE_TTL = 10 # seconds: أقصى مدة لبيانات قديمة إذا تعذر الكاش المشترك
+AUTH_USER_CACHE_SIZE = 1024 # per-process LRU entries
+AUTH_USER_CACHE_ALIAS = 'default' # رقم نسخة المستخدم المشترك بين العمال (يُفضل Redis/Memcached)؛ None = المدة فقط
+USER_SEARCH_MAX_RESULTS = 200 # أقصى عدد نتائج مرتبة لبحث المستخدمين
+
 LANGUAGE_CODE = 'ar'
 TIME_ZONE = 'Asia/Aden'
 
@@ -75,6 +89,7 @@ MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'apps.wallets.throttling.IPThrottleMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
@@ -111,10 +126,36 @@ DATABASES = {
     }
 }
 
+# Shared cache
+# مشترك بين كل العمليات (عمال gunicorn والأوامر الدورية مثل poll_agent_balance)، بعكس LocMem الافتراضي
+# الجدول يُنشأ مع migrate (recharge_and_payment 0003_cache_table) أو يدوياً: python manage.py createcachetable
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'saifi_cache',
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
+AUTHENTICATION_BACKENDS = [
+    'apps.authentication.backends.UsernameOrPhoneBackend',
+]
+
+# The first hasher is used for new passwords; older hashes are upgraded on the next successful login.
+# To use Argon2 install argon2-cffi and put 'apps.authentication.hashers.TunedArgon2PasswordHasher' first.
+PASSWORD_HASHERS = [
+    'apps.authentication.hashers.TunedScryptPasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+PASSWORD_SCRYPT_PARAMS = {'work_factor': 2 ** 14, 'block_size': 8, 'parallelism': 1}
+PASSWORD_ARGON2_PARAMS = {'time_cost': 2, 'memory_cost': 102400, 'parallelism': 8}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -144,3 +185,70 @@ ALZAJIL_TOKEN = '36499242' # In many implementations, Password acts as the Secur
 ALZAJIL_AGENT_USER_ID = 'alsaifitest' # USR parameter, usually same as Username or provided ID
 ALZAJIL_REPORT_USERNAME = 'alsaifitest'
 ALZAJIL_REPORT_PASSWORD = '36499242'
+ALZAJIL_TIMEOUT = (5, 30) # (connect, read) seconds
+# Circuit breaker / bulkhead (per worker process)
+ALZAJIL_MAX_CONCURRENT = 10 # أقصى عدد طلبات متزامنة للمزود في العامل الواحد
+ALZAJIL_BULKHEAD_WAIT_SECONDS = 0.5
+ALZAJIL_BREAKER_WINDOW_SECONDS = 60
+ALZAJIL_BREAKER_MIN_CALLS = 10 # لا يتم تقييم النسب قبل هذا العدد من الطلبات في النافذة
+ALZAJIL_BREAKER_FAILURE_RATE = 0.5
+ALZAJIL_SLOW_CALL_SECONDS = 10
+ALZAJIL_BREAKER_SLOW_RATE = 0.5
+ALZAJIL_BREAKER_OPEN_SECONDS = 30
+ALZAJIL_BREAKER_HALF_OPEN_CALLS = 2
+# Provider reconciliation (reconcile_provider command, AC 1003)
+RECONCILIATION_CONCURRENCY = 4 # طلبات متوازية (لا تتجاوز ALZAJIL_MAX_CONCURRENT)
+RECONCILIATION_SETTLE_MINUTES = 10
+# Agent balance cache (poll_agent_balance command, AC 7400)
+ALZAJIL_AGENT_BALANCE_CACHE_ALIAS = 'default' # يجب أن يكون مشتركاً بين العمليات (CACHES)
+ALZAJIL_AGENT_BALANCE_MAX_AGE = 300 # ثوان: القيمة الأقدم لا تُستخدم لرفض السداد
+ALZAJIL_AGENT_BALANCE_POLL_SECONDS = 60
+ALZAJIL_AGENT_BALANCE_RESERVE = 0 # هامش يُترك من الرصيد عند الفحص المسبق
+# Offer catalog (sync_offer_catalog command, AC 4005)
+ALZAJIL_OFFER_CATALOG_SUBSCRIBERS = {} # {SC: رقم مشترك نموذجي} لاستعلام قائمة العروض العامة
+# Session recording for the stub server (alzajil_stub --replay)
+ALZAJIL_RECORD_PATH = None # مسار ملف JSONL لتسجيل طلبات واستجابات المزود؛ None لإيقاف التسجيل
+# Recharge provider routing (router.py). الأول هو الافتراضي لرصيد الوكيل وحالة العمليات
+RECHARGE_PROVIDERS = {
+    'alzajil': {'class': 'apps.recharge_and_payment.providers.AlzajilProvider', 'cost': 0},
+    # 'stub': {'class': 'apps.recharge_and_payment.providers.StubProvider', 'url': 'http://127.0.0.1:8765/api/tp/v1', 'cost': 5},
+}
+RECHARGE_HEDGE_AFTER_MS = 800 # إرسال نسخة من استعلام القراءة للمزود الثاني بعد هذه المدة
+RECHARGE_HEDGE_WORKERS = 16
+RECHARGE_LATENCY_WINDOW = 200 # عدد آخر الطلبات لحساب p95 لكل مزود
+RECHARGE_LATENCY_MIN_SAMPLES = 20
+RECHARGE_DEFAULT_LATENCY_MS = 1000 # قبل توفر عينات كافية
+RECHARGE_COST_WEIGHT_MS = 100 # كل وحدة كلفة تعادل 100ms في الترتيب
+RECHARGE_HALF_OPEN_PENALTY_MS = 5000
+
+# Wallets
+P2P_BATCH_MAX_ITEMS = 500 # الحد الأقصى لعدد البنود في تحويل الدفعة الواحدة
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24) # مدة الاحتفاظ بالاستجابة المحفوظة لمفتاح Idempotency-Key
+IDEMPOTENCY_WAIT_SECONDS = 5 # مدة انتظار الطلب المكرر المتزامن حتى يكتمل الطلب الأصلي
+IDEMPOTENCY_PENDING_LEASE = timedelta(minutes=2) # بعدها يُعتبر الطلب PENDING متوقفاً ويمكن لإعادة المحاولة أخذ المفتاح (أطول من مهلة عامل gunicorn)
+# Transactional outbox (dispatch_outbox command)
+OUTBOX_MAX_ATTEMPTS = 10 # بعدها يصبح الحدث FAILED
+OUTBOX_RETRY_BASE_SECONDS = 5 # تأخير إعادة المحاولة يتضاعف مع كل فشل
+OUTBOX_RETRY_MAX_SECONDS = 3600
+# Signed exchange quotes (quote/ endpoint, convert/ with quote)
+FX_QUOTE_TTL_SECONDS = 30 # مدة صلاحية عرض السعر
+FX_RATE_MATRIX_TTL_SECONDS = 5 # كل كم ثانية يُتحقق من تغير الأسعار في العمليات الأخرى
+
+# Archived (cold) history written by the archive_partitions command
+ARCHIVE_ROOT = os.path.join(BASE_DIR, 'archive')
+
+# Rate limiting (token bucket) per endpoint group: 'user' and 'ip' limits as "<count>/<s|min|hour|day>"
+THROTTLE_BACKEND = 'apps.wallets.throttling.MemoryBackend' # أو RedisBackend للمشاركة بين العمال
+THROTTLE_REDIS_URL = 'redis://localhost:6379/0'
+THROTTLE_RATES = {
+    'money': {'user': '30/min', 'ip': '120/min'},
+    'provider': {'user': '30/min', 'ip': '120/min'},
+}
+MAX_INFLIGHT_PER_USER = 2 # عدد العمليات المالية المتزامنة المسموح بها لكل مستخدم
+INFLIGHT_TTL_SECONDS = 60
+
+# Background jobs (runworkers command, database queue)
+JOBS_MAX_ATTEMPTS = 5
+JOBS_VISIBILITY_TIMEOUT = 300 # ثوان؛ بعدها تعود المهمة المحجوزة متاحة لعامل آخر
+JOBS_RETRY_BASE_SECONDS = 10 # تأخير إعادة المحاولة يتضاعف مع كل فشل
+JOBS_RETRY_MAX_SECONDS = 3600